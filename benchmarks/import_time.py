@@ -0,0 +1,88 @@
+'''
+Import-time budget check for the entry points.
+
+Each module is imported in a fresh interpreter with `python -X importtime` (best of --repeat
+runs) and compared against its budget. It also fails if a heavy dependency (langchain,
+langgraph, IPython) was imported, since those should only load once a graph or LLM is used.
+
+    python benchmarks/import_time.py              # exits 1 if a budget is blown
+    python benchmarks/import_time.py --scale 2    # slower machine / CI, double every budget
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> budget in ms (cumulative import time, a dev laptop measures 3-5x below these)
+BUDGETS_MS = {
+    "src.config": 60,
+    "src.tools": 20,
+    "src.hn_tool": 350,
+    "src.chain_of_agents": 400,
+    "src.batch": 100,
+    "src.service": 250,
+}
+
+# should only be imported when a graph is built or an LLM is called
+HEAVY_MODULES = ("langchain_core", "langgraph", "langchain_google_genai", "langchain_ollama", "IPython")
+
+_PROBE = "import sys, json, {module}; print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+
+
+def measure(module: str) -> tuple[float, list[str]]:
+    # -> (cumulative import time of module in ms, heavy modules it pulled in)
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    # lines look like "import time:  self [us] | cumulative | imported package", top level unindented
+    cumulative_us = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.rstrip() == f" {module}":
+            cumulative_us = int(cumulative)
+
+    if cumulative_us is None:
+        raise RuntimeError(f"no importtime line for {module}")
+    return cumulative_us / 1000, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check entry-point import times against their budgets")
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS_MS), help="modules to check (default: all budgeted)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per module, the fastest counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<20} {'import ms':>10} {'budget ms':>10}  result")
+    for module in args.modules:
+        runs = [measure(module) for _ in range(max(1, args.repeat))]
+        ms = min(r[0] for r in runs)
+        heavy = sorted({m for r in runs for m in r[1]})
+        budget = BUDGETS_MS.get(module, 0) * args.scale
+
+        problems = []
+        if budget and ms > budget:
+            problems.append("over budget")
+        if heavy:
+            problems.append(f"imports {', '.join(heavy)}")
+        failed |= bool(problems)
+
+        print(f"{module:<20} {ms:>10.1f} {budget:>10.0f}  {'; '.join(problems) or 'ok'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
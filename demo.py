@@ -1,8 +1,9 @@
+import os
 import sys
-sys.path.append('src')
+sys.path.append(os.path.dirname(os.path.abspath(__file__))) # so `python demo.py` works from any folder
 
-from chain_of_agents import analyse_hn_trends, visualize_graph
-from config import ChainConfig
+from src.chain_of_agents import stream_hn_trends, visualize_graph
+from src.config import ChainConfig
 
 def main():
     print("\nEnter a topic to analyse, or 'quit' to exit:")
@@ -15,13 +16,26 @@ def main():
             break
 
         print(f"\nAnalyzing Hacker News trends for: {user_input}\n")
-        final_answer = analyse_hn_trends(user_input)
-        
-        print("\n" + "="*60)
-        print("FINAL ANALYSIS:")
-        print("="*60)
-        print(final_answer)
-        print("\n" + "="*60 + "\n")
+
+        # progress per agent, then the final answer token by token as it's generated
+        streamed = False
+        for event in stream_hn_trends(user_input):
+            if event["type"] == "progress":
+                print(f"\n>> [{event['node']}] {event['message']}")
+            elif event["type"] == "token":
+                if not streamed:
+                    print("\n" + "="*60)
+                    print("FINAL ANALYSIS:")
+                    print("="*60)
+                    streamed = True
+                print(event["content"], end="", flush=True)
+            elif event["type"] == "final":
+                if not streamed: # cached answers arrive in one piece
+                    print("\n" + "="*60)
+                    print("FINAL ANALYSIS:")
+                    print("="*60)
+                    print(event["answer"])
+                print("\n" + "="*60 + "\n")
 
         continue_choice = input("Do you want to analyse another topic? (y/n): ").strip().lower()
         if continue_choice not in ['y', 'yes']:
@@ -0,0 +1,27 @@
+'''
+Lazy package exports: `from src.tools import search_web` imports the module that defines it on
+first access only, so importing one submodule doesn't pull in its siblings' dependencies.
+
+    __all__, __getattr__, __dir__ = lazy_exports(__name__, {"search_web": "src.tools.brave_search"})
+'''
+
+import importlib
+import sys
+from typing import Any, Callable
+
+
+def lazy_exports(package: str, exports: dict[str, str]) -> tuple[list[str], Callable[[str], Any], Callable[[], list[str]]]:
+    # exports: name -> module defining it. Returns the package's (__all__, __getattr__, __dir__)
+    names = list(exports)
+
+    def __getattr__(name: str):
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(exports[name]), name)
+        setattr(sys.modules[package], name, value) # next access skips __getattr__
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted(set(vars(sys.modules[package])) | set(names))
+
+    return names, __getattr__, __dir__
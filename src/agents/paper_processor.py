@@ -1,47 +1,54 @@
 import json
 import re
+from contextlib import closing
+from typing import Optional
 
 from src.llm.provider import get_llm
+from src.llm.resilience import call_llm, run_deadline
 from src.schemas.extraction import Extraction 
-from src.tools.pdf_processor import process_arxiv_pdf
+from src.tools.pdf_processor import iter_arxiv_chunks
 from src.prompts.extraction import build_extraction_prompt, build_repair_prompt
 
-def process_paper(arxiv_id: str) -> Extraction: 
+def process_paper(arxiv_id: str, deadline_seconds: Optional[float] = None) -> Extraction: 
     
-    llm = get_llm()
+    llm = get_llm(cache_namespace="extraction") # re-processing a paper hits the LLM cache
+    deadline = run_deadline(deadline_seconds) # for the whole paper, None = no deadline
 
-    chunks = process_arxiv_pdf(arxiv_id)
+    # chunks arrive while later pages are still being extracted, the first LLM call doesn't wait for the whole PDF
+    chunks = iter_arxiv_chunks(arxiv_id)
 
     # Define empty extraction first 
     # This won't work, cause "..." in Field means must be filled
     running_extraction = Extraction(source_id = arxiv_id) 
 
-    for chunk in chunks: 
-        prompt = build_extraction_prompt(
-            chunk_text=chunk.text,
-            running_extraction=running_extraction
-        )
-
-        response = llm.invoke(prompt)
-        response_text = getattr(response, "content", "") or ""
-
-        # Parse the response into an Extraction dataclass
-        try:
-            parsed = _parse_llm_json(response_text)
-        except ValueError:
-            repair_prompt = build_repair_prompt(response_text)
-            repair_response = llm.invoke(repair_prompt)
-            repair_text = getattr(repair_response, "content", "") or ""
-            parsed = _parse_llm_json(repair_text)
-        normalized = _normalize_extraction_dict(parsed)
-        new_extraction = Extraction.model_validate(normalized)
-
-        # Merge with running extraction
-        # This might be redundant, since the LLM already edits off of 
-        # previous extraction *** 
-        running_extraction = running_extraction.merge(new_extraction)
-
-        running_extraction = _filter_top_entities(running_extraction, max_per_type=20)
+    # if a chunk fails, closing stops the background stages (and deletes a temp PDF) right away
+    with closing(chunks):
+        for chunk in chunks: 
+            prompt = build_extraction_prompt(
+                chunk_text=chunk.text,
+                running_extraction=running_extraction
+            )
+
+            response = call_llm(lambda: llm.ainvoke(prompt), label="extraction", deadline=deadline)
+            response_text = getattr(response, "content", "") or ""
+
+            # Parse the response into an Extraction dataclass
+            try:
+                parsed = _parse_llm_json(response_text)
+            except ValueError:
+                repair_prompt = build_repair_prompt(response_text)
+                repair_response = call_llm(lambda: llm.ainvoke(repair_prompt), label="extraction_repair", deadline=deadline)
+                repair_text = getattr(repair_response, "content", "") or ""
+                parsed = _parse_llm_json(repair_text)
+            normalized = _normalize_extraction_dict(parsed)
+            new_extraction = Extraction.model_validate(normalized)
+
+            # Merge with running extraction
+            # This might be redundant, since the LLM already edits off of 
+            # previous extraction *** 
+            running_extraction = running_extraction.merge(new_extraction)
+
+            running_extraction = _filter_top_entities(running_extraction, max_per_type=20)
 
     return running_extraction
 
@@ -0,0 +1,216 @@
+'''
+Small asyncio helpers so sync graph nodes can fan out concurrent I/O, plus process-wide
+concurrency limits and single-flight dedupe that work across threads and event loops alike
+(sync callers, the async entry points and the service each run their own loops, so asyncio
+primitives alone can't be shared),
+and `prefetch` to run the stages of an iterator pipeline in their own threads.
+'''
+
+import asyncio
+import concurrent.futures
+import queue
+import threading
+from typing import Awaitable, Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+_loop_lock = threading.Lock()
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    # one event loop for the whole process, running forever in a daemon thread
+    global _loop
+
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="aio-loop", daemon=True).start()
+        return _loop
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    '''
+    Runs a coroutine to completion from sync code, from any thread (also one already running
+    an event loop, e.g. inside ainvoke or a notebook).
+    Every call runs on the same long-lived background loop, so what is bound to a loop (the
+    shared async HTTP client and its keep-alive connections) is reused across calls.
+    '''
+    loop = _background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_sync called from a coroutine on its own background loop, await it instead")
+
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel() # e.g. KeyboardInterrupt, don't leave it running
+        raise
+
+
+async def gather_bounded(
+        fn: Callable[[T], Awaitable[R]],
+        items: Iterable[T],
+        max_concurrency: int
+    ) -> list[R]:
+    # like asyncio.gather(*map(fn, items)) but with at most max_concurrency in flight, keeps input order
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _run(item: T) -> R:
+        async with semaphore:
+            return await fn(item)
+
+    return await asyncio.gather(*(_run(item) for item in items))
+
+
+class ConcurrencyLimit:
+    '''
+    A process-wide cap on work in flight: `with limit:` from threads, `async with limit:` from
+    any event loop. Async waiters poll instead of blocking their loop.
+    '''
+
+    def __init__(self, max_concurrency: int):
+        self.resize(max_concurrency)
+
+    def resize(self, max_concurrency: int) -> None:
+        # only call while nothing holds a slot (e.g. at the start of a batch)
+        self.max_concurrency = max(1, max_concurrency)
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        # for callers that have to give up waiting: False if no slot freed up within timeout
+        return self._semaphore.acquire(timeout=timeout)
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+    def __enter__(self) -> "ConcurrencyLimit":
+        self._semaphore.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._semaphore.release()
+
+    async def __aenter__(self) -> "ConcurrencyLimit":
+        delay = 0.005
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._semaphore.release()
+
+
+class SingleFlight:
+    '''
+    Concurrent calls with the same key share one execution: the first caller runs it,
+    everyone arriving while it's in flight gets the same result (or exception).
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, concurrent.futures.Future] = {}
+
+    def _claim(self, key: str) -> tuple[concurrent.futures.Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = concurrent.futures.Future()
+            return future, True
+
+    def _settle(self, key: str, future: concurrent.futures.Future, result=None, error=None) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn: Callable[[], R]) -> R:
+        future, leader = self._claim(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result=result)
+        return result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[R]]) -> R:
+        future, leader = self._claim(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result=result)
+        return result
+
+
+_DONE = object()
+
+
+def prefetch(items: Iterable[T], maxsize: int, name: str = "prefetch") -> Iterator[T]:
+    '''
+    Iterates `items` in a producer thread, up to maxsize items ahead of the consumer (a bounded
+    queue between the two), so a slow consumer and the stage feeding it overlap.
+    The producer's exceptions are re-raised to the consumer at the point they happened.
+    Closing the returned generator early (break, an exception, .close()) stops the producer
+    and waits for it, so whatever it reads from can be cleaned up right after.
+    '''
+
+    buffer: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        # blocks while the buffer is full, gives up once the consumer is gone
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce() -> None:
+        try:
+            for item in items:
+                if not _put((item, None)):
+                    break
+        except BaseException as e:
+            _put((_DONE, e))
+            return
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None and stop.is_set():
+                close() # consumer left early, let a generator stage run its own cleanup
+        _put((_DONE, None))
+
+    thread = threading.Thread(target=_produce, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,97 @@
+'''
+Persistent per-(query, period) worker outputs, so a tracked topic can be extended
+with new periods instead of re-analysed from the start.
+
+Every completed worker step (sequential, or all periods at once after a parallel / tree run)
+is saved with the running summary after it and a link to the period before it. The newest
+step of each query is the "head" of its chain: walking the links back gives the periods
+already analysed, in order.
+
+There is one head per query, whatever the date span: a run over a different span starts a
+new chain and moves the head to it. The older chain's steps stay stored, but "extend" only
+continues from the newest chain.
+'''
+
+import hashlib
+import json
+import threading
+from typing import Optional
+
+from src.cache.store import SQLiteCache
+from src.config import ANALYSIS_STORE_PATH
+
+MAX_CHAIN_LENGTH = 1000 # guards against a corrupted link loop
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _key(query: str, period_key: str) -> str:
+    return hashlib.sha256(f"{_normalize_query(query)}\x00{period_key}".encode("utf-8")).hexdigest()
+
+
+def _head_key(query: str) -> str:
+    return _key(query, "__head__")
+
+
+def _period_key(period: dict) -> str:
+    return f"{period['start']}:{period['end']}"
+
+
+class AnalysisStore:
+
+    def __init__(self, store: SQLiteCache):
+        self.store = store
+
+    def save_period(self, query: str, period: dict, period_analysis: str, running_summary: str, prev_period: Optional[dict]) -> None:
+        '''Records one worker step and makes it the head of the query's chain.'''
+
+        entry = {
+            "period": {k: period[k] for k in ("start", "end", "label")},
+            "period_analysis": period_analysis,
+            "running_summary": running_summary,
+            "prev": _period_key(prev_period) if prev_period else None,
+        }
+        self.store.set(_key(query, _period_key(period)), json.dumps(entry).encode("utf-8"))
+        self.store.set(_head_key(query), _period_key(period).encode("utf-8"))
+
+    def _get(self, query: str, period_key: str) -> Optional[dict]:
+        value = self.store.get(_key(query, period_key))
+        return json.loads(value) if value is not None else None
+
+    def load_chain(self, query: str) -> list[dict]:
+        '''Every stored step of the query's latest chain, oldest period first ([] if none).'''
+
+        head = self.store.get(_head_key(query))
+        if head is None:
+            return []
+
+        chain = []
+        period_key = head.decode("utf-8")
+        while period_key is not None and len(chain) < MAX_CHAIN_LENGTH:
+            entry = self._get(query, period_key)
+            if entry is None:
+                break # link to a step that was cleared, keep what we have
+            chain.append(entry)
+            period_key = entry["prev"]
+
+        chain.reverse()
+        return chain
+
+    def forget(self, query: str) -> None:
+        # the next extend run starts the topic from scratch
+        self.store.delete(_head_key(query))
+
+
+_lock = threading.Lock()
+_analysis_store: Optional[AnalysisStore] = None
+
+
+def get_analysis_store() -> AnalysisStore:
+    global _analysis_store
+
+    with _lock:
+        if _analysis_store is None:
+            _analysis_store = AnalysisStore(SQLiteCache(ANALYSIS_STORE_PATH, namespace="analyses"))
+    return _analysis_store
@@ -0,0 +1,187 @@
+'''
+Batch analysis: many queries through the chain of agents at once.
+
+Queries run concurrently (BATCH_MAX_CONCURRENCY at a time) while every run shares the
+process-wide limits on Algolia requests (HN_HTTP_MAX_CONCURRENCY) and LLM calls
+(LLM_MAX_CONCURRENCY). Identical fetches from overlapping topics go out once (single-flight
+plus the HN cache), identical jobs run once. Results are written as each query finishes.
+
+    python -m src.batch queries.jsonl -o results.jsonl --concurrency 8
+
+Input is JSONL: {"query": "AI agents", "start_date": "2024-01-01", "end_date": "2024-12-31",
+"mode": "parallel", "id": "ai-agents"} (only query is required), or one plain query per line.
+'''
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from typing import Callable, Iterable, Optional
+
+from src.config import BATCH_MAX_CONCURRENCY, COA_MODES
+
+JOB_FIELDS = ("query", "start_date", "end_date", "mode", "time_periods")
+
+
+def read_jobs(lines: Iterable[str]) -> list[dict]:
+    jobs = []
+    for n, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            if line.startswith(("{", "[", '"')):
+                raise ValueError(f"Line {n}: invalid JSON ({e})")
+            job = line # a plain-text query
+        if isinstance(job, str):
+            job = {"query": job}
+        if not isinstance(job, dict):
+            raise ValueError(f"Line {n}: expected a query string or an object with a 'query' field")
+        try:
+            validate_job(job)
+        except ValueError as e:
+            raise ValueError(f"Line {n}: {e}")
+        job.setdefault("id", str(len(jobs) + 1))
+        jobs.append(job)
+    return jobs
+
+
+def _check_date(value, name: str) -> None:
+    if not isinstance(value, str):
+        raise ValueError(f"'{name}' must be a YYYY-MM-DD string")
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be a YYYY-MM-DD string, got {value!r}")
+
+
+def validate_job(job: dict) -> None:
+    # raises ValueError (with a message for the user) unless the job's fields have the types analyse_hn_trends expects
+    query = job.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("'query' must be a non-empty string")
+
+    for name in ("start_date", "end_date"):
+        if job.get(name):
+            _check_date(job[name], name)
+
+    mode = job.get("mode")
+    if mode and mode not in COA_MODES:
+        raise ValueError(f"'mode' must be one of {', '.join(COA_MODES)}")
+
+    periods = job.get("time_periods")
+    if periods:
+        if not isinstance(periods, list):
+            raise ValueError("'time_periods' must be a list of {start, end, label} objects")
+        for i, period in enumerate(periods):
+            if not isinstance(period, dict) or not isinstance(period.get("label"), str):
+                raise ValueError(f"time_periods[{i}] must be an object with start, end and label")
+            _check_date(period.get("start"), f"time_periods[{i}].start")
+            _check_date(period.get("end"), f"time_periods[{i}].end")
+
+
+def job_key(job: dict) -> str:
+    # jobs asking for the same analysis run once
+    args = {k: job[k] for k in JOB_FIELDS if job.get(k)}
+    args["query"] = " ".join(args["query"].lower().split())
+    return json.dumps(args, sort_keys=True)
+
+
+def _run_job(job: dict) -> dict:
+    from src.chain_of_agents import analyse_hn_trends
+
+    started = time.perf_counter()
+    kwargs = {k: job[k] for k in JOB_FIELDS if job.get(k)}
+    try:
+        return {"final_answer": analyse_hn_trends(**kwargs), "elapsed_seconds": round(time.perf_counter() - started, 2)}
+    except Exception as e:
+        return {"error": str(e), "elapsed_seconds": round(time.perf_counter() - started, 2)}
+
+
+def run_batch(
+        jobs: list[dict],
+        max_concurrency: int = BATCH_MAX_CONCURRENCY,
+        on_result: Optional[Callable[[dict], None]] = None,
+        quiet: bool = False
+    ) -> list[dict]:
+    '''
+    Runs every job (dicts with "query" and optionally start_date, end_date, mode, time_periods, id),
+    calling on_result as each one finishes. Returns the results in job order.
+    quiet: hide the agents' own progress output (it interleaves badly when runs overlap)
+    '''
+
+    groups: dict[str, list[dict]] = {}
+    for job in jobs:
+        groups.setdefault(job_key(job), []).append(job)
+
+    results: dict[int, dict] = {}
+    lock = threading.Lock()
+
+    stdout = contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+    with stdout, ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="batch") as pool:
+        futures = {pool.submit(_run_job, group[0]): group for group in groups.values()}
+
+        for future in as_completed(futures):
+            outcome = future.result()
+            for job in futures[future]:
+                result = {"id": job.get("id"), "query": job["query"], **outcome}
+                with lock:
+                    results[id(job)] = result
+                if on_result is not None:
+                    on_result(result)
+
+    return [results[id(job)] for job in jobs]
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Analyse many HN topics concurrently")
+    parser.add_argument("input", help="JSONL file of queries, '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results file (appended as queries finish), '-' for stdout")
+    parser.add_argument("--concurrency", type=int, default=BATCH_MAX_CONCURRENCY, help="queries analysed at once")
+    parser.add_argument("--http-concurrency", type=int, help="Algolia requests in flight across all queries")
+    parser.add_argument("--llm-concurrency", type=int, help="LLM calls in flight across all queries")
+    parser.add_argument("--verbose", action="store_true", help="show the agents' progress output")
+    args = parser.parse_args()
+
+    if args.http_concurrency:
+        from src.tools.algolia import http_limit
+        http_limit.resize(args.http_concurrency)
+    if args.llm_concurrency:
+        from src.llm.provider import llm_limit
+        llm_limit.resize(args.llm_concurrency)
+
+    with (sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")) as f:
+        jobs = read_jobs(f)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    write_lock = threading.Lock()
+    done = [0]
+
+    def _write(result: dict) -> None:
+        with write_lock:
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            done[0] += 1
+            status = "error: " + result["error"] if "error" in result else f"{result['elapsed_seconds']}s"
+            print(f"[{done[0]}/{len(jobs)}] {result['query']} ({status})", file=sys.stderr)
+
+    started = time.perf_counter()
+    try:
+        results = run_batch(jobs, args.concurrency, on_result=_write, quiet=not args.verbose)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    failed = sum(1 for r in results if "error" in r)
+    print(f"Finished {len(results)} queries ({failed} failed) in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    _main()
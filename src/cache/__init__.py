@@ -0,0 +1,13 @@
+# loaded on first access: the LLM cache pulls in langchain_core, the HN cache doesn't need it
+from src._lazy import lazy_exports
+
+__all__, __getattr__, __dir__ = lazy_exports(__name__, {
+    "SQLiteCache": "src.cache.store",
+    "HNResponseCache": "src.cache.hn",
+    "get_hn_cache": "src.cache.hn",
+    "LLMResponseCache": "src.cache.llm",
+    "get_llm_cache": "src.cache.llm",
+    "clear_llm_cache": "src.cache.llm",
+    "PDFCache": "src.cache.pdf",
+    "get_pdf_cache": "src.cache.pdf",
+})
@@ -0,0 +1,85 @@
+'''
+On-disk cache for Algolia HN responses.
+
+Keys are a hash of the endpoint + request params (query, tags, numericFilters,
+hitsPerPage, ...). Windows that closed a while ago barely change, so they are kept
+for a long time, anything touching "now" gets a short TTL.
+'''
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+from src.cache.store import SQLiteCache
+from src.config import (
+    CACHE_DIR,
+    HN_CACHE_ENABLED,
+    HN_CACHE_MAX_MB,
+    HN_CACHE_HISTORICAL_TTL_SECONDS,
+    HN_CACHE_RECENT_TTL_SECONDS,
+    HN_CACHE_SETTLE_SECONDS,
+)
+
+# matches the upper bound of a created_at_i filter, e.g. "created_at_i<=1711843200"
+_UPPER_BOUND = re.compile(r"created_at_i\s*<=?\s*(\d+)")
+
+
+def hn_cache_key(endpoint: str, params: dict) -> str:
+    payload = json.dumps({"endpoint": endpoint, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def ttl_for_params(params: dict, now: Optional[float] = None) -> float:
+    '''
+    closed historical windows -> near-immutable (long TTL)
+    windows touching "now" or with no upper bound -> short TTL
+    '''
+    now = time.time() if now is None else now
+
+    match = _UPPER_BOUND.search(str(params.get("numericFilters", "")))
+    if match and int(match.group(1)) < now - HN_CACHE_SETTLE_SECONDS:
+        return HN_CACHE_HISTORICAL_TTL_SECONDS
+    return HN_CACHE_RECENT_TTL_SECONDS
+
+
+class HNResponseCache:
+
+    def __init__(self, store: SQLiteCache):
+        self.store = store
+
+    def get(self, endpoint: str, params: dict) -> Optional[dict]:
+        value = self.store.get(hn_cache_key(endpoint, params))
+        return json.loads(value) if value is not None else None
+
+    def put(self, endpoint: str, params: dict, data: dict) -> None:
+        value = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        self.store.set(hn_cache_key(endpoint, params), value, ttl=ttl_for_params(params))
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+
+_lock = threading.Lock()
+_hn_cache: Optional[HNResponseCache] = None
+
+
+def get_hn_cache() -> Optional[HNResponseCache]:
+    '''Process-wide HN cache, or None when HN_CACHE_ENABLED is off.'''
+    global _hn_cache
+
+    if not HN_CACHE_ENABLED:
+        return None
+
+    with _lock:
+        if _hn_cache is None:
+            store = SQLiteCache(
+                os.path.join(CACHE_DIR, "hn_cache.sqlite3"),
+                namespace="hn",
+                max_bytes=int(HN_CACHE_MAX_MB * 1024 * 1024),
+            )
+            _hn_cache = HNResponseCache(store)
+    return _hn_cache
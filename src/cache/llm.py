@@ -0,0 +1,155 @@
+'''
+On-disk cache for LLM responses, plugged into LangChain chat models as their `cache`.
+
+LangChain hands us the serialized messages (prompt) and the serialized model config
+(llm_string: model, temperature, stop, ...). A key is the hash of a canonical JSON form of
+both, so prompts that only differ in how they were built still hit: roles are normalized
+(human/user, ai/assistant), whitespace runs collapse to one space, message ids and metadata
+are dropped and the model params are sorted, with unset (None) ones left out. Each caller
+gets its own namespace (worker, synthesizer, extraction) that can be cleared on its own,
+all namespaces share one SQLite file and each is capped by size with LRU eviction.
+'''
+
+import ast
+import hashlib
+import json
+import os
+import threading
+import warnings
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from src.cache.store import SQLiteCache
+from src.config import (
+    CACHE_DIR,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MAX_MB,
+    LLM_CACHE_TTL_SECONDS,
+)
+
+# we only ever load generations we wrote ourselves
+warnings.filterwarnings("ignore", message="The function `loads` is in beta")
+
+
+_ROLES = {"human": "user", "user": "user", "ai": "assistant", "assistant": "assistant", "system": "system",
+          "HumanMessage": "user", "AIMessage": "assistant", "SystemMessage": "system", "ToolMessage": "tool"}
+_MESSAGE_FIELDS = ("name", "tool_calls", "tool_call_id") # besides role and content, what changes the answer
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _normalize_content(content):
+    if isinstance(content, str):
+        return _normalize_text(content)
+    if isinstance(content, list): # content blocks
+        return [
+            {**block, "text": _normalize_text(block["text"])} if isinstance(block, dict) and isinstance(block.get("text"), str)
+            else _normalize_content(block)
+            for block in content
+        ]
+    return content
+
+
+def _normalize_message(message) -> dict:
+    # a serialized LangChain message ({"id": [..., "HumanMessage"], "kwargs": {...}}) -> {"role", "content", ...}
+    if not isinstance(message, dict):
+        return {"role": "user", "content": _normalize_content(message)}
+    kwargs = message.get("kwargs", message)
+    kind = kwargs.get("role") or kwargs.get("type") or (message.get("id") or ["user"])[-1]
+    normalized = {"role": _ROLES.get(kind, kind), "content": _normalize_content(kwargs.get("content", ""))}
+    normalized.update({field: kwargs[field] for field in _MESSAGE_FIELDS if kwargs.get(field)})
+    return normalized
+
+
+def _normalize_prompt(prompt: str):
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return _normalize_text(prompt) # a plain-text prompt (completion models)
+    if not isinstance(messages, list):
+        messages = [messages]
+    return [_normalize_message(message) for message in messages]
+
+
+def _normalize_llm_string(llm_string: str) -> dict:
+    # "<serialized model JSON>---<repr of sorted call params>", or only the params repr for models that can't be serialized
+    model, params = {}, llm_string
+    try:
+        serialized, end = json.JSONDecoder().raw_decode(llm_string)
+    except ValueError:
+        serialized, end = None, 0
+    if isinstance(serialized, dict) and llm_string.startswith("---", end):
+        model = {"id": serialized.get("id"), **(serialized.get("kwargs") or {})}
+        params = llm_string[end + 3:]
+
+    try:
+        model.update(dict(ast.literal_eval(params)))
+    except (ValueError, SyntaxError, TypeError):
+        model["params"] = params # not a literal (e.g. an object repr), keep it as is
+    return {key: value for key, value in model.items() if value is not None}
+
+
+def llm_cache_key(prompt: str, llm_string: str) -> str:
+    canonical = json.dumps(
+        {"model": _normalize_llm_string(llm_string), "messages": _normalize_prompt(prompt)},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=repr,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache(BaseCache):
+
+    def __init__(self, store: SQLiteCache, ttl: Optional[float] = None):
+        self.store = store
+        self.ttl = ttl
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        value = self.store.get(llm_cache_key(prompt, llm_string))
+        if value is None:
+            return None
+        try:
+            return loads(value.decode("utf-8"), allowed_objects="core")
+        except Exception:
+            return None # written by an incompatible langchain version, treat as a miss
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        value = dumps(list(return_val)).encode("utf-8")
+        self.store.set(llm_cache_key(prompt, llm_string), value, ttl=self.ttl)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
+
+    def stats(self) -> dict:
+        return self.store.stats()
+
+
+_lock = threading.Lock()
+_llm_caches: dict[str, LLMResponseCache] = {}
+
+
+def get_llm_cache(namespace: str) -> Optional[LLMResponseCache]:
+    '''Process-wide cache for one namespace (e.g. "worker"), or None when LLM_CACHE_ENABLED is off.'''
+
+    if not LLM_CACHE_ENABLED:
+        return None
+
+    with _lock:
+        cache = _llm_caches.get(namespace)
+        if cache is None:
+            store = SQLiteCache(
+                os.path.join(CACHE_DIR, "llm_cache.sqlite3"),
+                namespace=f"llm:{namespace}",
+                max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024),
+            )
+            cache = _llm_caches[namespace] = LLMResponseCache(store, ttl=LLM_CACHE_TTL_SECONDS)
+    return cache
+
+
+def clear_llm_cache(namespace: str) -> int:
+    # drops every cached response in the namespace (e.g. after a prompt change), returns no. removed
+    cache = get_llm_cache(namespace)
+    return cache.store.clear() if cache is not None else 0
@@ -0,0 +1,165 @@
+'''
+On-disk cache for arXiv PDFs and the text extracted from them.
+
+PDFs are streamed straight to PDF_CACHE_DIR (never held in memory whole), one file per
+arXiv id and version, and hashed while they download. The per-page text is stored under
+the PDF's sha256, so re-processing a paper with another prompt or model skips both the
+download and the parsing, and a re-download of an unchanged PDF reuses the old text.
+'''
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+from src.cache.store import SQLiteCache
+from src.config import (
+    CACHE_DIR,
+    PDF_CACHE_DIR,
+    PDF_CACHE_ENABLED,
+    PDF_CACHE_LATEST_TTL_SECONDS,
+    PDF_CACHE_MAX_MB,
+    PDF_TEXT_CACHE_MAX_MB,
+)
+
+_VERSIONED = re.compile(r"v\d+$")
+_CHUNK_BYTES = 1 << 16
+
+
+@dataclass(slots=True)
+class CachedPDF:
+    arxiv_id: str
+    path: str
+    sha256: str
+    size: int
+    cached: bool = True # False: a temp file (cache off), the caller deletes it when done
+
+
+def normalize_arxiv_id(arxiv_id: str) -> str:
+    return arxiv_id.replace("arxiv:", "").strip()
+
+
+def _filename(arxiv_id: str) -> str:
+    # old-style ids have a slash (hep-th/9901001)
+    return arxiv_id.replace("/", "_") + ".pdf"
+
+
+def stream_to_file(response, directory: str) -> tuple[str, str, int]:
+    # -> (temp path, sha256, size) of an httpx streaming response written to directory
+    digest, size = hashlib.sha256(), 0
+    fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for block in response.iter_bytes(_CHUNK_BYTES):
+                f.write(block)
+                digest.update(block)
+                size += len(block)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+class PDFCache:
+
+    def __init__(self, directory: str, index: SQLiteCache, texts: SQLiteCache, max_bytes: Optional[int] = None):
+        self.directory = directory
+        self.index = index # arxiv id -> {sha256, size}
+        self.texts = texts # sha256 -> zlib'd JSON [[page_number, text], ...]
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, arxiv_id: str) -> Optional[CachedPDF]:
+        arxiv_id = normalize_arxiv_id(arxiv_id)
+        value = self.index.get(arxiv_id)
+        if value is None:
+            return None
+
+        entry = json.loads(value)
+        path = os.path.join(self.directory, _filename(arxiv_id))
+        if not os.path.exists(path): # deleted by hand or evicted
+            self.index.delete(arxiv_id)
+            return None
+
+        os.utime(path) # mtime doubles as "last used" for eviction
+        return CachedPDF(arxiv_id, path, entry["sha256"], entry["size"])
+
+    def download(self, arxiv_id: str, client, url: str, timeout: float = 60.0) -> CachedPDF:
+        '''Streams url into the cache as arxiv_id's PDF (replacing any older copy).'''
+
+        arxiv_id = normalize_arxiv_id(arxiv_id)
+        with client.stream("GET", url, timeout=timeout) as response:
+            response.raise_for_status()
+            tmp_path, sha256, size = stream_to_file(response, self.directory)
+
+        path = os.path.join(self.directory, _filename(arxiv_id))
+        os.replace(tmp_path, path) # atomic, a concurrent reader sees the old file or the new one
+
+        ttl = None if _VERSIONED.search(arxiv_id) else PDF_CACHE_LATEST_TTL_SECONDS
+        self.index.set(arxiv_id, json.dumps({"sha256": sha256, "size": size}).encode("utf-8"), ttl=ttl)
+        self._evict(keep=path)
+        return CachedPDF(arxiv_id, path, sha256, size)
+
+    def get_pages(self, sha256: str) -> Optional[list[tuple[int, str]]]:
+        value = self.texts.get(sha256)
+        if value is None:
+            return None
+        return [(page_num, text) for page_num, text in json.loads(zlib.decompress(value))]
+
+    def put_pages(self, sha256: str, pages: list[tuple[int, str]]) -> None:
+        value = zlib.compress(json.dumps(pages, separators=(",", ":")).encode("utf-8"), 6)
+        self.texts.set(sha256, value)
+
+    def _evict(self, keep: str) -> None:
+        # drop the least recently used PDFs once the directory is over max_bytes (their text stays cached)
+        if not self.max_bytes:
+            return
+
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pdf") and entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        return {"index": self.index.stats(), "texts": self.texts.stats()}
+
+
+_lock = threading.Lock()
+_pdf_cache: Optional[PDFCache] = None
+
+
+def get_pdf_cache() -> Optional[PDFCache]:
+    '''Process-wide PDF cache, or None when PDF_CACHE_ENABLED is off.'''
+    global _pdf_cache
+
+    if not PDF_CACHE_ENABLED:
+        return None
+
+    with _lock:
+        if _pdf_cache is None:
+            db_path = os.path.join(CACHE_DIR, "pdf_cache.sqlite3")
+            _pdf_cache = PDFCache(
+                PDF_CACHE_DIR,
+                index=SQLiteCache(db_path, namespace="pdf_index"),
+                texts=SQLiteCache(db_path, namespace="pdf_text", max_bytes=int(PDF_TEXT_CACHE_MAX_MB * 1024 * 1024)),
+                max_bytes=int(PDF_CACHE_MAX_MB * 1024 * 1024),
+            )
+    return _pdf_cache
@@ -0,0 +1,195 @@
+'''
+Small SQLite-backed key/value cache shared by the HN, LLM and PDF caches.
+
+Each entry has its own TTL, and every namespace is capped by total size with
+least-recently-used eviction. WAL mode + a busy timeout make it safe for several
+threads or processes to share one database file.
+
+Each namespace's total size is kept in namespace_sizes by triggers, so a write only looks
+at that one row, and the entries are only scanned for eviction once it's over the cap.
+'''
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+_SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS entries (
+    namespace   TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    value       BLOB NOT NULL,
+    size        INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    expires_at  REAL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, accessed_at);
+CREATE INDEX IF NOT EXISTS entries_expiry ON entries (namespace, expires_at);
+
+CREATE TABLE IF NOT EXISTS namespace_sizes (
+    namespace TEXT PRIMARY KEY,
+    bytes     INTEGER NOT NULL
+);
+
+-- a database from before the size table: count its entries once, before the triggers take over
+INSERT OR REPLACE INTO namespace_sizes
+SELECT namespace, SUM(size) FROM entries
+WHERE NOT EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'entries_size_ai')
+GROUP BY namespace;
+
+CREATE TRIGGER IF NOT EXISTS entries_size_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO namespace_sizes VALUES (new.namespace, new.size)
+    ON CONFLICT(namespace) DO UPDATE SET bytes = bytes + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_size_ad AFTER DELETE ON entries BEGIN
+    UPDATE namespace_sizes SET bytes = bytes - old.size WHERE namespace = old.namespace;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_size_au AFTER UPDATE OF size ON entries BEGIN
+    UPDATE namespace_sizes SET bytes = bytes - old.size + new.size WHERE namespace = new.namespace;
+END;
+COMMIT;
+"""
+
+# an upsert rather than INSERT OR REPLACE: REPLACE deletes the old row without firing entries_size_ad
+_UPSERT = """
+INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(namespace, key) DO UPDATE SET
+    value = excluded.value, size = excluded.size, created_at = excluded.created_at,
+    expires_at = excluded.expires_at, accessed_at = excluded.accessed_at
+"""
+
+
+class SQLiteCache:
+
+    def __init__(self, path: str, namespace: str, max_bytes: Optional[int] = None):
+        self.path = path
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._local = threading.local() # sqlite connections can't be shared across threads
+        self._stats_lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, field: str, n: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        conn = self._conn()
+
+        row = conn.execute(
+            "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+
+        if row is None:
+            self._count("misses")
+            return None
+
+        value, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self._count("misses")
+            return None
+
+        conn.execute(
+            "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+            (now, self.namespace, key),
+        )
+        self._count("hits")
+        return bytes(value)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        # ttl=None means the entry never expires (it can still be evicted)
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+
+        self._conn().execute(
+            _UPSERT, (self.namespace, key, sqlite3.Binary(value), len(value), now, expires_at, now),
+        )
+        if self.max_bytes is not None and self._total() > self.max_bytes:
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self) -> int:
+        # invalidates the whole namespace, returns no. of entries removed
+        cursor = self._conn().execute("DELETE FROM entries WHERE namespace = ?", (self.namespace,))
+        return cursor.rowcount
+
+    def _total(self) -> int:
+        row = self._conn().execute(
+            "SELECT bytes FROM namespace_sizes WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _evict(self) -> None:
+        conn = self._conn()
+        now = time.time()
+
+        # expired entries go first, then least recently used until under the cap
+        conn.execute(
+            "DELETE FROM entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, now),
+        )
+
+        total = self._total()
+        if total <= self.max_bytes:
+            return
+
+        removed = 0
+        while total > self.max_bytes:
+            rows = conn.execute(
+                "SELECT key, size FROM entries WHERE namespace = ? ORDER BY accessed_at ASC LIMIT 64",
+                (self.namespace,),
+            ).fetchall()
+            if not rows:
+                break
+
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                total -= size
+                removed += 1
+
+        self._count("evictions", removed)
+
+    def stats(self) -> dict:
+        entries = self._conn().execute(
+            "SELECT COUNT(*) FROM entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        size = self._total()
+
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
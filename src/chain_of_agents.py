@@ -1,33 +1,101 @@
+# Chain of Agents over Hacker News: manager -> workers -> synthesizer (see README)
+# example run from the project root: python -m src.chain_of_agents
+
 import os 
-from typing import TypedDict, Annotated, List, TypedDict
-from datetime import datetime
+import uuid
+from functools import lru_cache
+from dataclasses import replace
+from typing import AsyncIterator, TypedDict, Annotated, Iterator, List, Optional, TypedDict
+from datetime import date, datetime, timedelta
 
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage
-from langgraph.graph import StateGraph, START, END
-
-from hn_tool import search_hn_stories, search_hn_by_date_range
 
-from IPython.display import Image, display
+from src.hn_tool import (
+    search_hn_stories,
+    fetch_hn_by_date_range,
+    prefetch_date_ranges,
+    prefetch_period_comments,
+    period_key,
+    StoryBatch,
+    CommentBatch,
+)
+from src.analysis_store import get_analysis_store
+from src.checkpoints import get_checkpointer, run_config
+from src.config import CHECKPOINT_ENABLED, COA_MAX_CONCURRENCY, COA_MODE, COA_MODES, COA_RUN_DEADLINE_SECONDS, COA_TREE_FANIN, HN_COMMENTS_TOP_K, PLANNER_MODE, ChainConfig
+from src.llm.provider import get_llm as get_shared_llm
+from src.llm.resilience import call_llm, run_deadline
+from src.llm.tokens import PromptBudget, allocate_budget, count_tokens, trim_to_tokens
+from src.planner import plan_periods
+
+# langchain_core / langgraph are imported where they're used, so importing this module (the batch CLI,
+# the service, hn_tool users) stays cheap until a graph is built or an LLM is called
 
 load_dotenv() # loads environment
 
+def merge_period_results(existing: List[dict], new: List[dict]) -> List[dict]:
+    # reducer for parallel workers: keyed by period index so results can land in any order
+    # (and nodes returning {**state} don't add the same result twice)
+    by_index = {r['index']: r for r in existing or []}
+    by_index.update({r['index']: r for r in new or []})
+    return [by_index[i] for i in sorted(by_index)]
+
+def merge_tree_nodes(existing: List[dict], new: List[dict]) -> List[dict]:
+    # same idea for tree mode, keyed by (level, index) so every level of the reduction is kept
+    by_pos = {(n['level'], n['index']): n for n in existing or []}
+    by_pos.update({(n['level'], n['index']): n for n in new or []})
+    return [by_pos[k] for k in sorted(by_pos)]
+
 # state: data structure that flows thru the agents
 class AgentState(TypedDict):
     query: str 
+    mode: str  # "sequential", "parallel", "extend" or "tree", kept so a resumed run rebuilds the same graph
+    start_date: str  # overall span for the planner, empty = trailing year
+    end_date: str
     time_periods: List[dict]  # start and end 
     current_period_index: int
     search_results: str
+    prefetched_results: dict  # period_key -> StoryBatch, filled by the prefetch node
+    prefetched_comments: dict  # period_key -> CommentBatch (sampled to a token budget)
     period_summaries: List[str]
+    period_results: Annotated[List[dict], merge_period_results]  # parallel and tree mode
+    tree_nodes: Annotated[List[dict], merge_tree_nodes]  # tree mode: summaries per (level, index), level 0 = periods
+    tree_level: int  # tree mode: level currently being reduced
     running_summary: str
+    token_usage: List[dict]  # one record per LLM call: prompt budget, estimated and reported tokens
     final_answer: str
 
-def get_llm(): 
-    return ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash", 
-        google_api_key = os.getenv("GEMINI_API_KEY"),
-        temperature=0.3) #lower = more deterministic, samples less etc.
+def get_llm(cache_namespace: Optional[str] = None): 
+    # one shared Gemini client for every worker/synthesizer call (see src/llm/provider.py)
+    # cache_namespace: repeated prompts are answered from the on-disk LLM cache (src/cache/llm.py)
+    return get_shared_llm(
+        "gemini", ChainConfig.MODEL_NAME, ChainConfig.TEMPERATURE,
+        cache_namespace=cache_namespace) #lower = more deterministic, samples less etc.
+
+HN_RESULTS_PER_PERIOD = 10
+
+def _fetch_period(query: str, period: dict) -> tuple[StoryBatch, CommentBatch]:
+    stories = fetch_hn_by_date_range(
+        query=query,
+        start_date=period['start'],
+        end_date=period['end'],
+        limit = HN_RESULTS_PER_PERIOD)
+
+    comments = CommentBatch()
+    if HN_COMMENTS_TOP_K > 0 and not stories.error:
+        comments = prefetch_period_comments({"period": stories}, model=ChainConfig.MODEL_NAME)["period"]
+
+    return stories, comments
+
+def _get_period_results(state: AgentState, period: dict) -> tuple[StoryBatch, CommentBatch]:
+    # prefetched, or fetched now if the prefetch missed the period or its fetch failed
+    key = period_key(period)
+    stories = (state.get('prefetched_results') or {}).get(key)
+    if stories is not None and not stories.error:
+        return stories, (state.get('prefetched_comments') or {}).get(key, CommentBatch())
+
+    if stories is not None:
+        print(f"Prefetch for {period['label']} failed ({stories.error}), fetching again...")
+    return _fetch_period(state['query'], period)
 
 def manager_nodes(state: AgentState) -> AgentState: 
     
@@ -39,18 +107,19 @@ def manager_nodes(state: AgentState) -> AgentState:
 
     query = state['query']
 
-    #EDIT THIS LATER, MAKE IT DYNAMIC
-    time_periods = [
-        {"start": "2024-01-01", "end": "2024-03-31", "label": "Q1 2024"},
-        {"start": "2024-04-01", "end": "2024-06-30", "label": "Q2 2024"},
-        {"start": "2024-07-01", "end": "2024-09-30", "label": "Q3 2024"},
-        {"start": "2024-10-01", "end": "2024-12-31", "label": "Q4 2024"},
-    ]
+    # caller-supplied periods win, otherwise size periods by discussion volume
+    if state.get('time_periods'):
+        time_periods = state['time_periods']
+    elif PLANNER_MODE == "fixed":
+        time_periods = ChainConfig.get_default_time_periods()
+    else:
+        time_periods = plan_periods(query, state.get('start_date'), state.get('end_date'))
 
     print(f"Query: {query}")
     print(f"Will analyze {len(time_periods)} time periods:")
     for period in time_periods:
-        print(f"  - {period['label']}: {period['start']} to {period['end']}")
+        hits = f" (~{period['hits']} stories)" if 'hits' in period else ""
+        print(f"  - {period['label']}: {period['start']} to {period['end']}{hits}")
     
     return {
         **state,
@@ -60,39 +129,159 @@ def manager_nodes(state: AgentState) -> AgentState:
         "running_summary": "",
     }
 
-def worker_node(state: AgentState) -> AgentState:
-    # analyze one time period
-    # update running summary
-
-    current_index = state['current_period_index']
-    time_periods = state['time_periods']
-
-    if current_index >= len(time_periods):
-        print("All time periods have been processed.")
-        return state  # No more periods to process
-    
-    period = time_periods[current_index]
+def restore_node(state: AgentState) -> AgentState:
+    # extend mode: pick up the query's stored chain, only periods after it get planned and analysed
 
     print("\n" + "="*60)
-    print(f"WORKER AGENT: Analyzing {period['label']}...")
+    print("RESTORE: Loading stored analysis...")
     print("="*60)
 
-    print(f"Fetching HN data for '{state['query']}' in {period['label']}...")
-    search_results = search_hn_by_date_range(
-        query=state['query'],
-        start_date=period['start'],
-        end_date=period['end'],
-        limit = 10)
-    print(f"Found data:\n{search_results[:500]}...")  # print first 500 chars
+    query = state['query']
+    chain = get_analysis_store().load_chain(query)
+
+    if not chain:
+        print(f"No stored analysis for '{query}' yet, planning the full span")
+        return manager_nodes(state)
+
+    done = [entry['period'] for entry in chain]
+    last_end = done[-1]['end']
+
+    if state.get('time_periods'):
+        new_periods = [p for p in state['time_periods'] if p['start'] > last_end]
+    else:
+        # everything since the last stored period becomes one new period -> one worker call
+        new_start = (date.fromisoformat(last_end) + timedelta(days=1)).isoformat()
+        end_date = state.get('end_date') or date.today().isoformat()
+        new_periods = plan_periods(query, new_start, end_date, max_workers=1) if new_start <= end_date else []
+
+    print(f"Restored {len(done)} analysed periods ({done[0]['label']} to {done[-1]['label']})")
+    print(f"New periods to analyze: {', '.join(p['label'] for p in new_periods) or 'none'}")
+
+    return {
+        **state,
+        "time_periods": done + new_periods,
+        "current_period_index": len(done),
+        "period_summaries": [f"{entry['period']['label']}: {entry['period_analysis']}" for entry in chain],
+        "running_summary": chain[-1]['running_summary'],
+    }
+
+def prefetch_node(state: AgentState) -> AgentState:
+    # fetch HN data for every planned period concurrently, so workers only do LLM work
+    # (restored periods before current_period_index are already analysed)
+
+    time_periods = state['time_periods'][state.get('current_period_index', 0):]
+    prefetched = dict(state.get('prefetched_results') or {})
+    missing = [p for p in time_periods if period_key(p) not in prefetched]
+
+    print(f"\nPrefetching HN data for {len(missing)} periods...")
+    started = datetime.now()
 
-    llm = get_llm()
+    fetched = prefetch_date_ranges(state['query'], missing, limit=HN_RESULTS_PER_PERIOD)
+    prefetched.update(fetched)
+
+    comments = dict(state.get('prefetched_comments') or {})
+    if HN_COMMENTS_TOP_K > 0:
+        ok = {key: batch for key, batch in fetched.items() if not batch.error}
+        comments.update(prefetch_period_comments(ok, model=ChainConfig.MODEL_NAME))
+
+    print(f"Prefetch done in {(datetime.now() - started).total_seconds():.2f}s")
+
+    return {
+        **state,
+        "prefetched_results": prefetched,
+        "prefetched_comments": comments,
+    }
 
-    analysis_prompt =f"""
-You are analyzing Hacker News discusssions about "{state['query']}" 
+## Prompt budgets
+# every prompt is fitted into a budget (src/llm/tokens.py) split between the instructions, the carried-over
+# summary and the new data: an over-budget summary is re-summarised, over-budget data loses the comments
+# and then the lowest-scored stories
+
+def _tokens(text: str) -> int:
+    return count_tokens(text, ChainConfig.MODEL_NAME)
+
+def _usage(node: str, label: str, budget: PromptBudget, prompt: str, response, **extra) -> dict:
+    # our estimate next to what the provider reports (when it does)
+    reported = getattr(response, "usage_metadata", None) or {}
+    return {
+        "node": node,
+        "label": label,
+        "budget_tokens": budget.total,
+        "prompt_tokens_est": _tokens(prompt),
+        "input_tokens": reported.get("input_tokens"),
+        "output_tokens": reported.get("output_tokens"),
+        **extra,
+    }
+
+def _run_value(key: str, default=None):
+    # per-run values from the LangGraph config (configurable, see _run_options), default outside a run
+    from langgraph.config import get_config
+
+    try:
+        return get_config().get("configurable", {}).get(key, default)
+    except RuntimeError:
+        return default
+
+def _run_deadline() -> Optional[float]:
+    # set per run in the LangGraph config (configurable.deadline), None outside a run or without one
+    return _run_value("deadline")
+
+def _invoke(llm, prompt: str, label: str, hedge: Optional[bool] = None, config: Optional[dict] = None):
+    # one LLM call under llm_limit and the run's deadline, with retries (and hedging if enabled), see src/llm/resilience.py
+    from langchain_core.messages import HumanMessage
+
+    options = {} if hedge is None else {"hedge": hedge}
+    return call_llm(lambda: llm.ainvoke([HumanMessage(content=prompt)], config=config),
+                    label=label, deadline=_run_deadline(), **options)
+
+def _fit_summary(query: str, summary: str, max_tokens: int) -> tuple[str, bool]:
+    # -> (summary within max_tokens, whether it had to be compressed)
+    if _tokens(summary) <= max_tokens:
+        return summary, False
+
+    print(f"Running summary is ~{_tokens(summary)} tokens (budget {max_tokens}), compressing...")
+
+    compress_prompt = f"""Condense this running summary of Hacker News discussions about "{query}" to at most {int(max_tokens * 0.75)} words.
+Keep the key themes, sentiment and how they changed over time, with the time period each point belongs to. Drop repetition and minor details.
+
+RUNNING SUMMARY:
+{summary}
+
+CONDENSED SUMMARY:"""
+
+    # tagged so the streaming API doesn't mistake these tokens for the final answer
+    condensed = _invoke(get_llm("compress"), compress_prompt, "compress", config={"tags": ["compress"]}).content
+    return trim_to_tokens(condensed, max_tokens, ChainConfig.MODEL_NAME), True
+
+def _render_period_data(stories: StoryBatch, comments: CommentBatch) -> str:
+    search_results = stories.render() # prompt text is only built here
+    if len(comments):
+        search_results += f"\n\nNOTABLE COMMENTS ON THE TOP STORIES:\n{comments.render()}"
+    return search_results
+
+def _fit_period_data(stories: StoryBatch, comments: CommentBatch, max_tokens: int) -> tuple[str, int]:
+    # -> (rendered data within max_tokens, no. of stories dropped)
+    search_results = _render_period_data(stories, comments)
+    if _tokens(search_results) <= max_tokens:
+        return search_results, 0
+
+    # comments go first, then stories from the lowest points up
+    kept = stories
+    search_results = _render_period_data(kept, CommentBatch())
+    while _tokens(search_results) > max_tokens and len(kept) > 1:
+        top_ids = {s.hn_id for s in stories.top(len(kept) - 1)}
+        kept = replace(stories, stories=[s for s in stories if s.hn_id in top_ids])
+        search_results = _render_period_data(kept, CommentBatch())
+
+    return trim_to_tokens(search_results, max_tokens, ChainConfig.MODEL_NAME), len(stories) - len(kept)
+
+def _worker_prompt(query: str, period: dict, running_summary: str, search_results: str, summary_words: int) -> str:
+    return f"""
+You are analyzing Hacker News discusssions about "{query}" 
 for the time period {period['label']} ({period['start']} to {period['end']}).
 
 PREVIOUS RUNNING SUMMARY: 
-{state['running_summary']}
+{running_summary}
 
 NEW DATA FROM {period['label']}:
 {search_results}
@@ -105,10 +294,25 @@ YOUR TASK:
 
 RESPOND WITH: 
 PERIOD ANALYSIS: (2-3 sentences about this specific period)
-UPDATED SUMMARY: (comprehensive summary including all periods analysed so far)
+UPDATED SUMMARY: (comprehensive summary including all periods analysed so far, at most {summary_words} words)
 """
+
+def _analyse_period(query: str, period: dict, stories: StoryBatch, comments: CommentBatch, running_summary: str) -> tuple[str, str, str, dict]:
+    # one worker LLM call -> (prompt data, period analysis, updated running summary, token usage)
+
+    llm = get_llm("worker")
+
+    budget = allocate_budget(ChainConfig.MODEL_NAME, _worker_prompt(query, period, "", "", 0))
+    summary_words = int(budget.summary * 0.75) # the next worker has to fit this summary into the same budget
+
+    running_summary, compressed = _fit_summary(query, running_summary, budget.summary)
+    search_results, dropped = _fit_period_data(stories, comments, budget.data_after(_tokens(running_summary)))
+    if dropped:
+        print(f"Dropped {dropped} lowest-scored stories to fit the prompt budget")
+
+    analysis_prompt = _worker_prompt(query, period, running_summary, search_results, summary_words)
     
-    response = llm.invoke([HumanMessage(content=analysis_prompt)])
+    response = _invoke(llm, analysis_prompt, "worker")
     analysis = response.content
 
     print(f"\nWorker Analysis: \n{analysis[:500]}...")  # print first 500 chars
@@ -122,32 +326,237 @@ UPDATED SUMMARY: (comprehensive summary including all periods analysed so far)
         period_analysis = analysis.split("PERIOD ANALYSIS:")[-1].split("UPDATED SUMMARY:")[0].strip()
     else:
         period_analysis = f"Analysis of {period['label']}: {analysis[:200]}"
+
+    usage = _usage("worker", period['label'], budget, analysis_prompt, response,
+                   summary_compressed=compressed, stories_dropped=dropped)
+
+    return search_results, period_analysis, new_running_summary, usage
+
+def worker_node(state: AgentState) -> AgentState:
+    # analyze one time period
+    # update running summary
+
+    current_index = state['current_period_index']
+    time_periods = state['time_periods']
+
+    if current_index >= len(time_periods):
+        print("All time periods have been processed.")
+        return state  # No more periods to process
     
+    period = time_periods[current_index]
+
+    print("\n" + "="*60)
+    print(f"WORKER AGENT: Analyzing {period['label']}...")
+    print("="*60)
+
+    print(f"Fetching HN data for '{state['query']}' in {period['label']}...")
+    stories, comments = _get_period_results(state, period)
+    print(f"Found data: {stories.preview()}")
+    if len(comments):
+        print(f"Sampled {len(comments)} of {comments.total_fetched} comments")
+
+    search_results, period_analysis, new_running_summary, usage = _analyse_period(
+        state['query'], period, stories, comments, state['running_summary'])
+
     new_summaries = state["period_summaries"] + [f"{period['label']}: {period_analysis}"]
 
+    # kept per (query, period) so a later "extend" run can continue from here
+    prev_period = time_periods[current_index - 1] if current_index > 0 else None
+    get_analysis_store().save_period(state['query'], period, period_analysis, new_running_summary, prev_period)
+
     return {
     **state,
     "search_results": search_results,
     "period_summaries": new_summaries,
     "running_summary": new_running_summary,
+    "token_usage": (state.get('token_usage') or []) + [usage],
     "current_period_index": current_index + 1}
 
-def synthesizer_node(state: AgentState) -> AgentState:
-    # synthesize final answer from period summaries
+## Parallel (map-reduce) mode
+# every period gets its own worker call at once (capped by max_concurrency in the run config),
+# then merge_node stitches the results back together in time order for the synthesizer
+
+def fan_out_periods(state: AgentState):
+    # one Send per period, each worker sees the full state plus its own index
+    from langgraph.types import Send
+
+    time_periods = state['time_periods']
+    if not time_periods:
+        return "tree_collect" if state.get('mode') == "tree" else "merge"
+
+    print(f"\nFanning out {len(time_periods)} periods to parallel workers...")
+    return [Send("period_worker", {**state, "current_period_index": i}) for i in range(len(time_periods))]
+
+def period_worker_node(state: AgentState) -> dict:
+    # analyze one time period on its own, no running summary to build on
+
+    index = state['current_period_index']
+    period = state['time_periods'][index]
+
+    print(f"PARALLEL WORKER: Analyzing {period['label']}...")
+
+    stories, comments = _get_period_results(state, period)
+
+    _, period_analysis, period_summary, usage = _analyse_period(
+        state['query'], period, stories, comments,
+        "None - this period is analysed on its own, alongside the others.")
+
+    # only the reducer channel is returned, parallel branches would clash on the rest
+    return {"period_results": [{
+        "index": index,
+        "label": period['label'],
+        "analysis": period_analysis,
+        "summary": period_summary,
+        "usage": usage,
+    }]}
+
+def _save_period_results(query: str, time_periods: List[dict], results: List[dict], final_summary: str) -> None:
+    # parallel / tree runs store their periods like sequential workers do, so a later "extend" run continues
+    # from them. A period's running summary is the summaries up to and including it, the last one gets final_summary
+    store = get_analysis_store()
+    for i, r in enumerate(results):
+        period = time_periods[r['index']]
+        if i == len(results) - 1:
+            running_summary = final_summary
+        else:
+            running_summary = "\n\n".join(f"{p['label']}:\n{p['summary']}" for p in results[:i + 1])
+        prev_period = time_periods[results[i - 1]['index']] if i > 0 else None
+        store.save_period(query, period, r['analysis'], running_summary, prev_period)
+
+def merge_node(state: AgentState) -> AgentState:
+    # rebuilds the temporal running summary from the per-period results, no LLM call
+
+    results = state.get('period_results') or []
 
     print("\n" + "="*60)
-    print("SYNTHESIZER AGENT: Creating final synthesis...")
+    print(f"MERGE: Combining {len(results)} period analyses in time order...")
     print("="*60)
 
-    llm = get_llm()
+    period_summaries = [f"{r['label']}: {r['analysis']}" for r in results]
+    running_summary = "\n\n".join(f"{r['label']}:\n{r['summary']}" for r in results)
+    _save_period_results(state['query'], state['time_periods'], results, running_summary)
+
+    return {
+        **state,
+        "period_summaries": period_summaries,
+        "running_summary": running_summary,
+        "token_usage": (state.get('token_usage') or []) + [r['usage'] for r in results],
+        "current_period_index": len(state['time_periods']),
+    }
+
+## Tree (hierarchical) mode
+# for very many periods: leaves are the parallel period workers, then adjacent summaries are merged
+# COA_TREE_FANIN at a time, level by level and in time order, until one summary is left for the
+# synthesizer. The merges of a level run concurrently, so the critical path is ~log(periods) LLM calls
+# instead of one per period
+
+def _level_nodes(state: AgentState, level: int) -> List[dict]:
+    return [n for n in state.get('tree_nodes') or [] if n['level'] == level]
+
+def tree_collect_node(state: AgentState) -> dict:
+    # runs after the leaves and after every level of merges, moves tree_level to the newest level
+
+    if not state.get('tree_nodes'):
+        # first visit: the period worker results become level 0
+        leaves = [{"level": 0, "index": r['index'], "label": r['label'], "first": r['label'], "last": r['label'],
+                   "summary": r['summary'], "usage": None}
+                  for r in state.get('period_results') or []]
+        print(f"\nTREE: {len(leaves)} period summaries at level 0")
+        return {"tree_nodes": leaves, "tree_level": 0}
+
+    level = max(n['level'] for n in state['tree_nodes'])
+    print(f"\nTREE: level {level} done, {len(_level_nodes(state, level))} summaries left")
+    return {"tree_level": level}
 
-    all_summaries = "\n".join(state['period_summaries'])
+def fan_out_tree_level(state: AgentState):
+    # one Send per group of COA_TREE_FANIN adjacent summaries, or on to the root once one is left
+    from langgraph.types import Send
+
+    level = state.get('tree_level', 0)
+    nodes = _level_nodes(state, level)
+    if len(nodes) <= 1:
+        return "tree_root"
+
+    groups = [nodes[i:i + COA_TREE_FANIN] for i in range(0, len(nodes), COA_TREE_FANIN)]
+    print(f"Merging {len(nodes)} summaries into {len(groups)} at level {level + 1}...")
+    return [Send("tree_merge", {**state, "tree_level": level + 1, "tree_group": group, "tree_index": i})
+            for i, group in enumerate(groups)]
+
+def _tree_merge_prompt(query: str, label: str, summaries: str, summary_words: int) -> str:
+    return f"""You are merging summaries of Hacker News discussions about "{query}" for consecutive time periods, listed oldest first.
+
+SUMMARIES:
+{summaries}
+
+YOUR TASK:
+Write ONE summary covering {label} that keeps the key themes, sentiment and notable discussions,
+says how they changed from one period to the next, and notes which period each point belongs to.
+Drop repetition. At most {summary_words} words.
+
+MERGED SUMMARY:"""
+
+def tree_merge_node(state: dict) -> dict:
+    # merges one group of adjacent summaries into a node of the next level
+
+    level, index, group = state['tree_level'], state['tree_index'], state['tree_group']
+    first, last = group[0]['first'], group[-1]['last']
+    label = first if first == last else f"{first} to {last}"
+
+    if len(group) == 1:
+        # the odd one out at the end of a level moves up as is
+        return {"tree_nodes": [{**group[0], "level": level, "index": index, "usage": None}]}
+
+    print(f"TREE MERGE: {label} (level {level})...")
+
+    budget = allocate_budget(ChainConfig.MODEL_NAME, _tree_merge_prompt(state['query'], label, "", 0), summary_share=0)
+    # children share the budget evenly, the merged summary has to fit one child's share at the next level
+    per_child = budget.data // len(group)
+    summary_words = int(per_child * 0.75)
+    summaries = "\n\n".join(f"{n['label']}:\n{trim_to_tokens(n['summary'], per_child, ChainConfig.MODEL_NAME)}" for n in group)
+
+    merge_prompt = _tree_merge_prompt(state['query'], label, summaries, summary_words)
+
+    response = _invoke(get_llm("tree_merge"), merge_prompt, "tree_merge")
+
+    return {"tree_nodes": [{
+        "level": level,
+        "index": index,
+        "label": label,
+        "first": first,
+        "last": last,
+        "summary": response.content.strip(),
+        "usage": _usage("tree_merge", label, budget, merge_prompt, response, level=level),
+    }]}
+
+def tree_root_node(state: AgentState) -> AgentState:
+    # the single summary left becomes the running summary for the synthesizer
+
+    results = state.get('period_results') or []
+    nodes = state.get('tree_nodes') or []
+    root = _level_nodes(state, state.get('tree_level', 0))
+
+    print("\n" + "="*60)
+    print(f"TREE ROOT: {len(results)} periods reduced over {state.get('tree_level', 0)} levels")
+    print("="*60)
+
+    running_summary = root[0]['summary'] if root else ""
+    _save_period_results(state['query'], state['time_periods'], results, running_summary)
+
+    return {
+        **state,
+        "period_summaries": [f"{r['label']}: {r['analysis']}" for r in results],
+        "running_summary": running_summary,
+        "token_usage": (state.get('token_usage') or []) + [r['usage'] for r in results]
+                       + [n['usage'] for n in nodes if n['usage']],
+        "current_period_index": len(state['time_periods']),
+    }
 
-    synthesis_prompt = f"""You are creating a final comprehensive answer about "{state['query']}" based on the analysis of Hacker News discussions across multipe time periods.
+def _synthesis_prompt(query: str, all_summaries: str, running_summary: str) -> str:
+    return f"""You are creating a final comprehensive answer about "{query}" based on the analysis of Hacker News discussions across multipe time periods.
 
     INDIVIDUAL PERIOD ANALYSES: {all_summaries}
 
-    RUNNING SUMMARY: {state['running_summary']}
+    RUNNING SUMMARY: {running_summary}
 
     YOUR TASK:
     Ceate a well-structured final answer that: 
@@ -159,14 +568,38 @@ def synthesizer_node(state: AgentState) -> AgentState:
     Format your response in a clear, professional manner suitable for someone researching this topic. Use bullet points when appropriate. 
     """
 
-    response = llm.invoke([HumanMessage(content = synthesis_prompt)])
+def synthesizer_node(state: AgentState) -> AgentState:
+    # synthesize final answer from period summaries
+
+    print("\n" + "="*60)
+    print("SYNTHESIZER AGENT: Creating final synthesis...")
+    print("="*60)
+
+    llm = get_llm("synthesizer")
+
+    budget = allocate_budget(ChainConfig.MODEL_NAME, _synthesis_prompt(state['query'], "", ""))
+
+    running_summary, compressed = _fit_summary(state['query'], state['running_summary'], budget.summary)
+
+    # period analyses share what's left evenly, each is only a few sentences so this rarely bites
+    period_summaries = state['period_summaries']
+    per_period = budget.data_after(_tokens(running_summary)) // max(len(period_summaries), 1)
+    all_summaries = "\n".join(trim_to_tokens(p, per_period, ChainConfig.MODEL_NAME) for p in period_summaries)
+
+    synthesis_prompt = _synthesis_prompt(state['query'], all_summaries, running_summary)
+
+    # not hedged, its tokens are streamed to the user and a second request would stream them twice
+    response = _invoke(llm, synthesis_prompt, "synthesizer", hedge=False)
     final_answer = response.content
 
     print(f"\nFinal Answer Preview:\n{final_answer[:500]}...")  # print first 500 chars     
 
+    usage = _usage("synthesizer", "final", budget, synthesis_prompt, response, summary_compressed=compressed)
+
     return {
 
         **state,
+        "token_usage": (state.get('token_usage') or []) + [usage],
         "final_answer": final_answer
     }
 
@@ -189,54 +622,225 @@ def should_continue_analysis(state: AgentState) -> str:
     
 # the agent graph 
 
-def create_chain_of_agents_graph(): 
+def create_chain_of_agents_graph(mode: str = COA_MODE, checkpointer=None): 
+
+    # sequential: start -> manager -> prefetch -> worker -> worker (loop) or synthesizer -> end
+    # parallel:   start -> manager -> prefetch -> period_worker x N -> merge -> synthesizer -> end
+    # extend:     start -> restore -> prefetch -> worker (new periods only) or synthesizer -> end
+    # tree:       start -> manager -> prefetch -> period_worker x N -> tree_collect -> tree_merge x N/k
+    #             -> tree_collect ... (one level per pass) -> tree_root -> synthesizer -> end
+
+    if mode not in COA_MODES:
+        raise ValueError(f"Unknown mode {mode!r}, pick 'sequential', 'parallel', 'extend' or 'tree'")
 
-    # start -> manager -> worker -> worker (loop) or synthesizer -> end
+    from langgraph.graph import StateGraph, START, END
 
     graph = StateGraph(AgentState)
 
-    graph.add_node("manager", manager_nodes)
-    graph.add_node("worker", worker_node)
+    graph.add_node("prefetch", prefetch_node)
     graph.add_node("synthesizer", synthesizer_node)
 
     # add edges
 
-    graph.add_edge(START, "manager")
-    graph.add_edge("manager", "worker")
+    if mode == "extend":
+        graph.add_node("restore", restore_node)
+        graph.add_edge(START, "restore")
+        graph.add_edge("restore", "prefetch")
+    else:
+        graph.add_node("manager", manager_nodes)
+        graph.add_edge(START, "manager")
+        graph.add_edge("manager", "prefetch")
+
+    if mode == "parallel":
+        graph.add_node("period_worker", period_worker_node)
+        graph.add_node("merge", merge_node)
+
+        graph.add_conditional_edges("prefetch", fan_out_periods, ["period_worker", "merge"])
+        graph.add_edge("period_worker", "merge")
+        graph.add_edge("merge", "synthesizer")
+    elif mode == "tree":
+        graph.add_node("period_worker", period_worker_node)
+        graph.add_node("tree_collect", tree_collect_node)
+        graph.add_node("tree_merge", tree_merge_node)
+        graph.add_node("tree_root", tree_root_node)
+
+        graph.add_conditional_edges("prefetch", fan_out_periods, ["period_worker", "tree_collect"])
+        graph.add_edge("period_worker", "tree_collect")
+        graph.add_conditional_edges("tree_collect", fan_out_tree_level, ["tree_merge", "tree_root"])
+        graph.add_edge("tree_merge", "tree_collect")
+        graph.add_edge("tree_root", "synthesizer")
+    else:
+        graph.add_node("worker", worker_node)
+        graph.add_edge("prefetch", "worker")
 
-    graph.add_conditional_edges("worker", should_continue_analysis,
-                               {
-                                      "continue": "worker",
-                                      "synthesize": "synthesizer"
-                                 })
+        graph.add_conditional_edges("worker", should_continue_analysis,
+                                   {
+                                          "continue": "worker",
+                                          "synthesize": "synthesizer"
+                                     })
 
     graph.add_edge("synthesizer", END)
 
-    return graph.compile() 
+    # with a checkpointer the state is saved after every node, keyed by the run's thread_id
+    return graph.compile(checkpointer=checkpointer) 
+
+@lru_cache(maxsize=None)
+def get_compiled_graph(mode: str = COA_MODE, checkpointer=None):
+    # compiled once per (mode, checkpointer) and shared, a compiled graph can run many threads at once
+    return create_chain_of_agents_graph(mode, checkpointer)
+
+def _initial_state(query: str, start_date: str, end_date: str, time_periods: Optional[List[dict]], mode: str) -> AgentState:
+    return {
+        "query": query,
+        "mode": mode,
+        "start_date": start_date,
+        "end_date": end_date,
+        "time_periods": time_periods or [],
+        "current_period_index": 0,
+        "search_results": "",
+        "prefetched_results": {},
+        "prefetched_comments": {},
+        "period_summaries": [],
+        "period_results": [],
+        "tree_nodes": [],
+        "tree_level": 0,
+        "running_summary": "",
+        "token_usage": [],
+        "final_answer": ""
+    }
 
-def analyse_hn_trends(query: str) -> str: 
+def analyse_hn_trends(
+        query: str,
+        start_date: str = "",
+        end_date: str = "",
+        time_periods: Optional[List[dict]] = None,
+        mode: str = COA_MODE,
+        max_concurrency: int = COA_MAX_CONCURRENCY,
+        thread_id: Optional[str] = None,
+        deadline_seconds: Optional[float] = COA_RUN_DEADLINE_SECONDS
+    ) -> str: 
     # main function to run the chain of agents graph 
+    # time_periods skips the planner, otherwise start_date/end_date bound the planned span (YYYY-MM-DD)
+    # mode: "sequential" (classic CoA, each worker builds on the last), "parallel" (periods analysed
+    # concurrently, max_concurrency LLM calls at a time, then merged in order), "extend" (continue the
+    # query's stored chain from an earlier run, only periods after it are analysed, then re-synthesize)
+    # or "tree" (like parallel, then adjacent summaries merged COA_TREE_FANIN at a time, level by level)
+    # thread_id: run id for checkpoints (generated if not given), pass it to resume_hn_trends after a failure
+    # deadline_seconds: no LLM call (or retry) of this run starts or runs past it, None = no deadline
 
     print("\n" + "="*60)
     print(f"Starting analysis of Hacker News trends for query: {query}")
-    print(f"Started at {datetime.now().isoformat()}")
+    print(f"Started at {datetime.now().isoformat()} ({mode} mode)")
     print("\n" + "="*60)
 
 
-    chain = create_chain_of_agents_graph()
+    checkpointer, thread_id = _run_checkpointer(thread_id)
+    chain = get_compiled_graph(mode, checkpointer)
 
+    initial_state = _initial_state(query, start_date, end_date, time_periods, mode)
 
-    initial_state: AgentState = {
-        "query": query,
-        "time_periods": [],
-        "current_period_index": 0,
-        "search_results": "",
-        "period_summaries": [],
-        "running_summary": "",
-        "final_answer": ""
+    final_state = _invoke_resumable(chain, initial_state, run_config(thread_id, **_run_options(max_concurrency, deadline_seconds)), thread_id)
+
+    print("\n" + "="*60)
+    print(f"Finished analysis at {datetime.now().isoformat()}")
+    _print_token_usage(final_state.get('token_usage') or [])
+    print("\n" + "="*60)
+
+    return final_state['final_answer']
+
+
+def _run_options(max_concurrency: int, deadline_seconds: Optional[float]) -> dict:
+    # LangGraph run config shared by every entry point, nodes read these back with _run_value()
+    return {
+        "max_concurrency": max_concurrency,
+        "configurable": {"deadline": run_deadline(deadline_seconds)},
     }
 
-    final_state = chain.invoke(initial_state)
+def _print_token_usage(token_usage: List[dict]) -> None:
+    if not token_usage:
+        return
+    estimated = sum(u['prompt_tokens_est'] for u in token_usage)
+    reported_in = sum(u['input_tokens'] or 0 for u in token_usage)
+    reported_out = sum(u['output_tokens'] or 0 for u in token_usage)
+    largest = max(token_usage, key=lambda u: u['prompt_tokens_est'])
+    print(f"Token usage: {len(token_usage)} LLM calls, ~{estimated} prompt tokens estimated "
+          f"({reported_in} in / {reported_out} out reported), largest prompt ~{largest['prompt_tokens_est']} ({largest['label']})")
+
+## Checkpointing & resume
+
+def _run_checkpointer(thread_id: Optional[str]):
+    # -> (checkpointer, thread_id), (None, None) when checkpointing is off or unavailable
+    # an explicit thread_id means the caller wants a resumable run, so a missing package is an error then
+    if thread_id is None and not CHECKPOINT_ENABLED:
+        return None, None
+
+    try:
+        checkpointer = get_checkpointer()
+    except ImportError as e:
+        if thread_id is not None:
+            raise
+        print(f"Checkpointing disabled: {e}")
+        return None, None
+
+    return checkpointer, thread_id or uuid.uuid4().hex[:12]
+
+def warm_up(mode: str = COA_MODE) -> None:
+    # for long-running processes: compile the graph analyse_hn_trends(mode=mode) will use and build the
+    # LLM clients up front, so the first run doesn't pay for it
+    get_compiled_graph(mode, _run_checkpointer(None)[0])
+    try:
+        for namespace in ("worker", "synthesizer", "compress"):
+            get_llm(namespace)
+    except Exception as e: # missing API key etc., the first run will report it
+        print(f"LLM client not ready yet: {e}")
+
+def _invoke_resumable(chain, state: Optional[AgentState], config: dict, thread_id: Optional[str]) -> AgentState:
+    if thread_id is not None:
+        print(f"Run id: {thread_id}")
+    try:
+        final_state = chain.invoke(state, config=config)
+    except Exception:
+        if thread_id is not None:
+            print(f"\nRun {thread_id} failed, completed steps are checkpointed. Continue with resume_hn_trends({thread_id!r})")
+        raise
+
+    if thread_id is not None:
+        _delete_checkpoints(chain, thread_id)
+    return final_state
+
+def _delete_checkpoints(chain, thread_id: str) -> None:
+    # a finished run has nothing left to resume, so its checkpoints (full state after every node,
+    # story and comment batches included) would only grow the file. Failed runs keep theirs until resumed
+    try:
+        chain.checkpointer.delete_thread(thread_id)
+    except Exception as e:
+        print(f"Could not delete the checkpoints of run {thread_id}: {e}")
+
+def resume_hn_trends(thread_id: str, max_concurrency: int = COA_MAX_CONCURRENCY, deadline_seconds: Optional[float] = COA_RUN_DEADLINE_SECONDS) -> str:
+    # continues a checkpointed run from its last completed node (e.g. the period after the last finished worker)
+
+    checkpointer = get_checkpointer()
+    config = run_config(thread_id, **_run_options(max_concurrency, deadline_seconds)) # the deadline starts over
+
+    saved = checkpointer.get_tuple(config)
+    if saved is None:
+        raise ValueError(f"No checkpointed run with id {thread_id!r}")
+
+    mode = saved.checkpoint["channel_values"].get("mode") or COA_MODE
+    chain = get_compiled_graph(mode, checkpointer)
+
+    snapshot = chain.get_state(config)
+    if not snapshot.next:
+        print(f"Run {thread_id} already finished")
+        return snapshot.values.get('final_answer', "")
+
+    print("\n" + "="*60)
+    print(f"Resuming run {thread_id} ({mode} mode) at {', '.join(snapshot.next)}")
+    if mode == "sequential":
+        print(f"{snapshot.values.get('current_period_index', 0)}/{len(snapshot.values.get('time_periods', []))} periods already done")
+    print("\n" + "="*60)
+
+    final_state = _invoke_resumable(chain, None, config, thread_id) # None input = continue from the checkpoint
 
     print("\n" + "="*60)
     print(f"Finished analysis at {datetime.now().isoformat()}")
@@ -245,6 +849,111 @@ def analyse_hn_trends(query: str) -> str:
     return final_state['final_answer']
 
 
+## Streaming
+# Same run as analyse_hn_trends, but yields events as it goes:
+#   {"type": "progress", "node": ..., "message": ...}  after every node finishes
+#   {"type": "token", "content": ...}                  final-answer tokens as the provider sends them
+#   {"type": "final", "answer": ...}                   once, at the end
+# A cached synthesizer answer arrives without token events, only in "final".
+
+def _describe_update(node: str, update: dict) -> str:
+    if node == "manager":
+        return f"Planned {len(update.get('time_periods', []))} time periods"
+    if node == "restore":
+        done, total = update.get('current_period_index', 0), len(update.get('time_periods', []))
+        return f"Restored {done} analysed periods, {total - done} new"
+    if node == "prefetch":
+        return f"Fetched HN data for {len(update.get('prefetched_results', {}))} periods"
+    if node == "worker":
+        done, total = update.get('current_period_index', 0), len(update.get('time_periods', []))
+        return f"Analysed {update['time_periods'][done - 1]['label']} ({done}/{total})" if done else "Analysed period"
+    if node == "period_worker":
+        return f"Analysed {update['period_results'][0]['label']}"
+    if node == "merge":
+        return f"Merged {len(update.get('period_summaries', []))} period analyses"
+    if node == "tree_merge":
+        merged = update['tree_nodes'][0]
+        return f"Merged {merged['label']} (level {merged['level']})"
+    if node == "tree_collect":
+        level = update.get('tree_level', 0)
+        return f"Level {level} merged" if level else f"{len(update.get('tree_nodes', []))} period summaries ready to merge"
+    if node == "tree_root":
+        return f"Reduced {len(update.get('period_summaries', []))} periods to one summary"
+    if node == "synthesizer":
+        return "Final answer ready"
+    return f"{node} done"
+
+class _StreamEvents:
+    # LangGraph (stream mode, chunk) pairs -> stream_hn_trends events, shared by the sync and async streams
+
+    modes = ["updates", "messages"]
+
+    def __init__(self):
+        self.final_answer = ""
+
+    def translate(self, mode: str, chunk) -> Optional[dict]:
+        if mode == "messages":
+            message, metadata = chunk
+            # only the synthesizer's tokens are user-facing, worker calls stream too
+            if metadata.get("langgraph_node") == "synthesizer" and "compress" not in metadata.get("tags", []) and message.text:
+                return {"type": "token", "content": message.text}
+            return None
+
+        node, update = next(iter(chunk.items()))
+        if node == "synthesizer":
+            self.final_answer = update["final_answer"]
+        return {"type": "progress", "node": node, "message": _describe_update(node, update or {}), "update": update}
+
+    def final(self) -> dict:
+        return {"type": "final", "answer": self.final_answer}
+
+def _start_stream(query: str, start_date: str, end_date: str, time_periods: Optional[List[dict]], mode: str,
+                  max_concurrency: int, deadline_seconds: Optional[float]):
+    # -> (graph, initial state, run config, event translator) for one streamed run
+    return (get_compiled_graph(mode), _initial_state(query, start_date, end_date, time_periods, mode),
+            _run_options(max_concurrency, deadline_seconds), _StreamEvents())
+
+def stream_hn_trends(
+        query: str,
+        start_date: str = "",
+        end_date: str = "",
+        time_periods: Optional[List[dict]] = None,
+        mode: str = COA_MODE,
+        max_concurrency: int = COA_MAX_CONCURRENCY,
+        deadline_seconds: Optional[float] = COA_RUN_DEADLINE_SECONDS
+    ) -> Iterator[dict]:
+    # generator version of analyse_hn_trends, same arguments
+
+    chain, initial_state, config, events = _start_stream(
+        query, start_date, end_date, time_periods, mode, max_concurrency, deadline_seconds)
+
+    for stream_mode, chunk in chain.stream(initial_state, config=config, stream_mode=events.modes):
+        if (event := events.translate(stream_mode, chunk)) is not None:
+            yield event
+
+    yield events.final()
+
+async def astream_hn_trends(
+        query: str,
+        start_date: str = "",
+        end_date: str = "",
+        time_periods: Optional[List[dict]] = None,
+        mode: str = COA_MODE,
+        max_concurrency: int = COA_MAX_CONCURRENCY,
+        deadline_seconds: Optional[float] = COA_RUN_DEADLINE_SECONDS
+    ) -> AsyncIterator[dict]:
+    # async twin of stream_hn_trends, only the graph call differs
+
+    chain, initial_state, config, events = _start_stream(
+        query, start_date, end_date, time_periods, mode, max_concurrency, deadline_seconds)
+
+    async for stream_mode, chunk in chain.astream(initial_state, config=config, stream_mode=events.modes):
+        if (event := events.translate(stream_mode, chunk)) is not None:
+            yield event
+
+    yield events.final()
+
+
 # visaulize the agents loop 
 
 def visualize_graph(): 
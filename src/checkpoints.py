@@ -0,0 +1,62 @@
+'''
+Durable LangGraph checkpoints for chain-of-agents runs.
+
+The graph state is saved to a local SQLite file after every node, keyed by the run's
+thread id, so a run that dies halfway (rate limit, timeout) can be resumed from the
+last completed step instead of re-fetching and re-analysing every period. A run's
+checkpoints are deleted once it finishes, only failed runs stay in the file.
+'''
+
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from src.config import CHECKPOINT_PATH
+
+# our dataclasses in AgentState, allowed through the checkpoint deserializer
+_STATE_TYPES = [
+    ("src.tools.hn_records", "HNArticle"),
+    ("src.tools.hn_records", "StoryBatch"),
+    ("src.tools.hn_comments", "HNComment"),
+    ("src.tools.hn_comments", "CommentBatch"),
+]
+
+_lock = threading.Lock()
+_checkpointers: dict = {}
+
+
+def _serializer():
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    try:
+        return JsonPlusSerializer(allowed_msgpack_modules=_STATE_TYPES)
+    except TypeError: # older langgraph-checkpoint, no allowlist yet
+        return JsonPlusSerializer()
+
+
+def get_checkpointer(path: str = CHECKPOINT_PATH):
+    '''Process-wide SqliteSaver for path (one connection shared by all runs/threads).'''
+
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError:
+        raise ImportError(
+            "langgraph-checkpoint-sqlite is not installed. Please install it to checkpoint chain-of-agents runs."
+        )
+
+    with _lock:
+        saver = _checkpointers.get(path)
+        if saver is None:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False) # SqliteSaver locks around its own use
+            saver = _checkpointers[path] = SqliteSaver(conn, serde=_serializer())
+    return saver
+
+
+def run_config(thread_id: Optional[str], **config) -> dict:
+    # LangGraph run config, checkpoints are keyed by configurable.thread_id
+    if thread_id is not None:
+        config["configurable"] = {**config.get("configurable", {}), "thread_id": thread_id}
+    return config
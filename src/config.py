@@ -17,6 +17,7 @@ LLM_PROVIDER = os.getenv("LLM_PROVIDER","OLLAMA").lower()
 # Local models
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL","http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL","llama3.1:8b")
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "8192")) # Ollama silently truncates prompts past this, its default is smaller
 
 # Cloud API 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -36,10 +37,117 @@ CHUNK_SIZE_TOKENS = int(os.getenv("CHUNK_SIZE_TOKENS", "2000"))
 CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "200"))
 # llama3.1:8b actually has a context length of up to 8000 tokens, so this is good
 
+# PDF page text extraction: documents with at least PDF_PARALLEL_MIN_PAGES pages are split across
+# PDF_EXTRACT_WORKERS processes (1 = always serial)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(8, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+# papers are processed as a pipeline (extract -> chunk -> LLM), chunks ready ahead of the LLM
+PAPER_PIPELINE_CHUNKS_AHEAD = int(os.getenv("PAPER_PIPELINE_CHUNKS_AHEAD", "4"))
+
 MAX_VALIDATION_RETRIES = int(os.getenv("MAX_VALIDATION_RETRIES", "2"))
 
 MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", "5"))
 
+# Shared HTTP transport (see src/http_client.py)
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "30"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# HN search backend: "algolia" (hn.algolia.com) or "local" (offline corpus, see src/tools/hn_corpus.py)
+HN_BACKEND = os.getenv("HN_BACKEND", "algolia").lower()
+HN_CORPUS_PATH = os.getenv("HN_CORPUS_PATH", os.path.join("data", "hn_corpus.sqlite3"))
+
+# no. of Algolia requests allowed in flight when prefetching all periods of a run
+HN_PREFETCH_CONCURRENCY = int(os.getenv("HN_PREFETCH_CONCURRENCY", "8"))
+# ...and across every run in the process (batch runs share it)
+HN_HTTP_MAX_CONCURRENCY = int(os.getenv("HN_HTTP_MAX_CONCURRENCY", "16"))
+
+# comments for the top-k stories of each period are sampled down to a token budget (0 disables)
+HN_COMMENTS_TOP_K = int(os.getenv("HN_COMMENTS_TOP_K", "3"))
+HN_COMMENT_TOKEN_BUDGET = int(os.getenv("HN_COMMENT_TOKEN_BUDGET", "1200"))
+HN_COMMENT_CONCURRENCY = int(os.getenv("HN_COMMENT_CONCURRENCY", "8"))
+
+# Time-period planner (see src/planner.py): "adaptive" sizes periods by discussion volume, "fixed" uses 2024 quarters
+PLANNER_MODE = os.getenv("PLANNER_MODE", "adaptive").lower()
+PLANNER_MAX_WORKERS = int(os.getenv("PLANNER_MAX_WORKERS", "6"))
+PLANNER_WINDOWS_PER_WORKER = int(os.getenv("PLANNER_WINDOWS_PER_WORKER", "4"))  # probe resolution
+PLANNER_DEFAULT_SPAN_DAYS = int(os.getenv("PLANNER_DEFAULT_SPAN_DAYS", "365"))
+
+# Chain execution: "sequential" (worker -> worker CoA loop), "parallel" (periods analysed concurrently, then merged in order),
+# "extend" (continue the topic's stored chain, only new periods get a worker call)
+# or "tree" (periods analysed concurrently, then adjacent summaries merged level by level, for very many periods)
+COA_MODES = ("sequential", "parallel", "extend", "tree")
+COA_MODE = os.getenv("COA_MODE", "sequential").lower()
+COA_MAX_CONCURRENCY = int(os.getenv("COA_MAX_CONCURRENCY", "4"))  # LLM calls in flight in parallel / tree mode
+COA_TREE_FANIN = max(2, int(os.getenv("COA_TREE_FANIN", "4")))  # summaries merged per LLM call in tree mode
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # LLM calls in flight across every run in the process
+
+# LLM call deadlines, retries and hedging (see src/llm/resilience.py)
+LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "120"))  # per attempt
+COA_RUN_DEADLINE_SECONDS = float(os.getenv("COA_RUN_DEADLINE_SECONDS", "0")) or None  # whole chain run, 0 = none
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))  # on timeouts, rate limits and 5xx
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+# hedging: a call still running after the p95 of recent calls like it gets a second, identical request
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "10"))  # no hedging until we know typical latency
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "2"))
+
+# Batch runs (see src/batch.py): no. of queries analysed at once
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+# Analysis service (see src/service.py): jobs run SERVICE_WORKERS at a time, at most SERVICE_QUEUE_SIZE wait
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8765"))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "2"))
+SERVICE_QUEUE_SIZE = int(os.getenv("SERVICE_QUEUE_SIZE", "64"))
+SERVICE_JOB_HISTORY = int(os.getenv("SERVICE_JOB_HISTORY", "500"))  # finished jobs kept for status lookups
+
+# Tokenizers (see src/llm/tokens.py): "auto" uses the model's real tokenizer when one loads offline
+# (TOKENIZER_PATH, the local Hugging Face cache, tiktoken), else a chars-per-token estimate; "heuristic" forces the estimate
+TOKENIZER_BACKEND = os.getenv("TOKENIZER_BACKEND", "auto").lower()
+TOKENIZER_PATH = os.getenv("TOKENIZER_PATH", "")  # tokenizer.json for the configured LLM_PROVIDER model
+TOKENIZER_ALLOW_DOWNLOAD = os.getenv("TOKENIZER_ALLOW_DOWNLOAD", "false").lower() in ("1", "true", "yes")  # fetch missing tokenizer.json from the Hub once
+
+# Prompt budgets (see src/llm/tokens.py): prompts are capped well below Gemini's window so latency stays
+# flat as periods pile up, answers get COA_OUTPUT_RESERVE_TOKENS of room
+COA_MAX_PROMPT_TOKENS = int(os.getenv("COA_MAX_PROMPT_TOKENS", "6000"))
+COA_OUTPUT_RESERVE_TOKENS = int(os.getenv("COA_OUTPUT_RESERVE_TOKENS", "1500"))
+
+# Local caches (see src/cache/)
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+# Run checkpoints (see src/checkpoints.py), lets a failed run resume from its last completed step
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() in ("1", "true", "yes")
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join(CACHE_DIR, "checkpoints.sqlite3"))
+
+# completed worker steps per (query, period), picked up by the "extend" mode (see src/analysis_store.py)
+ANALYSIS_STORE_PATH = os.getenv("ANALYSIS_STORE_PATH", os.path.join(CACHE_DIR, "analyses.sqlite3"))
+
+HN_CACHE_ENABLED = os.getenv("HN_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+HN_CACHE_MAX_MB = float(os.getenv("HN_CACHE_MAX_MB", "256"))
+HN_CACHE_HISTORICAL_TTL_SECONDS = float(os.getenv("HN_CACHE_HISTORICAL_TTL_SECONDS", str(30 * 24 * 3600)))
+HN_CACHE_RECENT_TTL_SECONDS = float(os.getenv("HN_CACHE_RECENT_TTL_SECONDS", str(15 * 60)))
+# a window counts as "closed" once it ended this long ago (points/comments have settled)
+HN_CACHE_SETTLE_SECONDS = float(os.getenv("HN_CACHE_SETTLE_SECONDS", str(3 * 24 * 3600)))
+
+# LLM responses (see src/cache/llm.py), one namespace per caller: worker, synthesizer, extraction
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))  # per namespace
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "0")) or None  # 0 = never expires
+
+# arXiv PDFs and their page text (see src/cache/pdf.py)
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(CACHE_DIR, "pdfs"))
+PDF_CACHE_MAX_MB = float(os.getenv("PDF_CACHE_MAX_MB", "2048"))  # PDF files, least recently used go first
+PDF_TEXT_CACHE_MAX_MB = float(os.getenv("PDF_TEXT_CACHE_MAX_MB", "512"))
+# an unversioned id ("1706.03762") means the latest version, re-downloaded after this long; "1706.03762v7" is kept
+PDF_CACHE_LATEST_TTL_SECONDS = float(os.getenv("PDF_CACHE_LATEST_TTL_SECONDS", str(7 * 24 * 3600)))
+
 # Validation heper
 
 def validate_config(): 
@@ -1,157 +1,180 @@
-import httpx
-import time 
-from datetime import datetime
-from typing import Optional
+# Hacker News search tools for the agents
+# quick check against the live API, from the project root: python -m src.hn_tool
 
-HN_SEARCH_URL = "https://hn.algolia.com/api/v1/search"
-HN_SEARCH_BY_DATE_URL = "https://hn.algolia.com/api/v1/search_by_date"
+from typing import Optional
 
-def search_hn_stories(
+from src.aio import gather_bounded, run_sync
+from src.config import HN_PREFETCH_CONCURRENCY
+from src.cache.hn import get_hn_cache
+from src.tools.algolia import (
+    HN_SEARCH_URL,
+    HN_SEARCH_BY_DATE_URL,
+    HNSearchError,
+    fetch_algolia_json,
+    afetch_algolia_json,
+    date_range_filter,
+)
+from src.tools.hn_records import StoryBatch
+from src.tools.hn_comments import CommentBatch, afetch_comment_tree, fetch_comments_for_stories
+
+
+def fetch_hn_stories(
     query: str,
-    limit: int = 10) -> str:
+    limit: int = 10) -> StoryBatch:
+    # relevance search, returns compact records (render lazily with .render())
 
-    with httpx.Client() as client: 
-        response = client.get(
+    try:
+        data = fetch_algolia_json(
             HN_SEARCH_URL,
             params={
                 "query": query,
                 "tags": "story",
                 "hitsPerPage": limit
-            }
+            },
+            max_retries=1
         )
-    
-        if response.status_code != 200:
-            return f"Error: API unable to fetch stories. Status code {response.status_code}"
-        
-        data = response.json()
-    results = []
-    results.append(f"=== Hacker News Search Results for '{query}' ===")
-    results.append(f"Found {data.get('nbHits', 0)} total results. Showing top {limit}:\n")
-    
-    for i, hit in enumerate(data.get("hits", []), start=1):
-        title = hit.get("title", "No Title")
-        url = hit.get("url", "No URL")
-        points = hit.get("points", 0)
-        author = hit.get("author", "Unknown Author")
-        num_comments = hit.get("num_comments", 0)
-        created_at = hit.get("created_at", "Unknown Date")
-        story_id = hit.get("objectID", "")
-        url = hit.get("url",f"https://news.ycombinator.com/item?id={story_id}")
-
-        results.append(f"{i}. {title}")
-        results.append(f"   Points: {points} | Comments: {num_comments} | Author: {author}")
-        results.append(f"   Date: {created_at}")
-        results.append(f"   URL: {url}")
-        # results.append(f"_all results: {data.get('hits')[0].get('created_at')}") ## debugging line
-        results.append("")  # Blank line for readability
+    except HNSearchError as e:
+        return StoryBatch(query=query, limit=limit, error=str(e))
 
-    return "\n".join(results)
+    return StoryBatch.from_response(query, data, limit)
 
 
-def search_hn_by_date_range(
+def search_hn_stories(
+    query: str,
+    limit: int = 10) -> str:
+    return fetch_hn_stories(query, limit).render("detailed")
+
+
+def fetch_hn_by_date_range(
         query:str,
         start_date: str,
         end_date: str,
         limit: int = 15,
         max_retries: int = 3
-    ) -> str:
+    ) -> StoryBatch:
 
+    try:
+        params = _date_range_params(query, start_date, end_date, limit)
+    except ValueError as e: 
+        return StoryBatch(query=query, limit=limit, error=f"invalid date format. Use YYYY-MM-DD. Details: {str(e)}")
 
     try:
-        start_ts = int(datetime.strptime(start_date, "%Y-%m-%d").timestamp())
-        end_ts = int(datetime.strptime(end_date, "%Y-%m-%d").timestamp())
-    
+        data = fetch_algolia_json(HN_SEARCH_BY_DATE_URL, params=params, max_retries=max_retries)
+    except HNSearchError as e:
+        return StoryBatch(query=query, limit=limit, error=str(e))
+
+    return StoryBatch.from_response(query, data, limit, start_date, end_date)
+
+
+async def afetch_hn_by_date_range(
+        query:str,
+        start_date: str,
+        end_date: str,
+        limit: int = 15,
+        max_retries: int = 3
+    ) -> StoryBatch:
+
+    try:
+        params = _date_range_params(query, start_date, end_date, limit)
     except ValueError as e: 
-        return f"invalid date format. Use YYYY-MM-DD. Details: {str(e)}"
-
-    numeric_filtres = f"created_at_i>={start_ts},created_at_i<={end_ts}"
-
-    # with retry logic for error handling, exponential back-off 
-    for attempt in range(max_retries):
-        try:
-            with httpx.Client() as client: 
-                response = client.get(
-                    HN_SEARCH_BY_DATE_URL,
-                    params={
-                        "query": query, 
-                        "tags": "story",
-                        "numericFilters": numeric_filtres,
-                        "hitsPerPage": limit
-                    }
-                )
-            
-                if response.status_code != 200:
-                    return f"Error: API unable to fetch stories. Status code {response.status_code}"
-                
-                data = response.json()
-                break # exits loop if successful 
-        except Exception as e: 
-            if attempt < (max_retries -1):
-                wait_time = 2 ** attempt # exponential back-off timing, 1s then 2s then 4s etc.
-                print(f"API error attempt {attempt +1} failed. Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-            else: 
-                return f"Error: API request failed after {max_retries} attempts. Last error details: {str(e)}"
+        return StoryBatch(query=query, limit=limit, error=f"invalid date format. Use YYYY-MM-DD. Details: {str(e)}")
 
-    results = []
-    results.append(f"=== Hacker News Search Results for '{query}' from {start_date} to {end_date} ===")
-    results.append(f"Found {data.get('nbHits', 0)} total results. Showing top {limit}:\n")
-
-    for i, hit in enumerate(data.get("hits", []), start=1):
-        title = hit.get("title", "No Title")
-        points = hit.get("points", 0)
-        num_comments = hit.get("num_comments", 0)
-        created_at = hit.get("created_at", "Unknown Date")
-
-        # url = hit.get("url", "No URL")
-        # author = hit.get("author", "Unknown Author")
-        # story_id = hit.get("objectID", "")
-        # url = hit.get("url",f"https://news.ycombinator.com/item?id={story_id}") 
-        
-        results.append(f"{i}. {title}")
-        results.append(f"   Points: {points} | Comments: {num_comments} | Date: {created_at}")
-        # results.append("   Date: {created_at}")
-        # results.append(f"   URL: {url}")
-        results.append("")  # Blank line for readability
+    try:
+        data = await afetch_algolia_json(HN_SEARCH_BY_DATE_URL, params=params, max_retries=max_retries)
+    except HNSearchError as e:
+        return StoryBatch(query=query, limit=limit, error=str(e))
 
-    if not data.get("hits"):
-        results.append("No stories found in the specified date range.")
-        
-    return "\n".join(results)
+    return StoryBatch.from_response(query, data, limit, start_date, end_date)
 
-# def get_hn_comments(story_id: str, limit: int = 10) -> str:
-#     # HN_ITEM_URL = "https://hn.algolia.com/api/v1/items/"
 
-#     with httpx.Client() as client: 
-#         response = client.get(
-#             HN_SEARCH_URL,
-#             params={
-#                 "tags": f"comment,story_{story_id}",
-#                 "hitsPerPage": limit
-#             }
-#         )
-    
-#         if response.status_code != 200:
-#             return f"Error: API unable to fetch comments. Status code {response.status_code}"
-        
-#         data = response.json()
+def search_hn_by_date_range(
+        query:str,
+        start_date: str,
+        end_date: str,
+        limit: int = 15,
+        max_retries: int = 3
+    ) -> str:
+    return fetch_hn_by_date_range(query, start_date, end_date, limit, max_retries).render()
+
+
+async def asearch_hn_by_date_range(
+        query:str,
+        start_date: str,
+        end_date: str,
+        limit: int = 15,
+        max_retries: int = 3
+    ) -> str:
+    batch = await afetch_hn_by_date_range(query, start_date, end_date, limit, max_retries)
+    return batch.render()
+
+
+def period_key(period: dict) -> str:
+    # labels aren't guaranteed unique, the date range is
+    return f"{period['start']}:{period['end']}"
+
 
-#     # comments = data.get("children", [])
-#     results = []
-#     results.append(f"=== Top {limit} Comments for Story ID {story_id} ===\n")
+async def aprefetch_date_ranges(
+        query: str,
+        periods: list[dict],
+        limit: int = 10,
+        max_concurrency: int = HN_PREFETCH_CONCURRENCY
+    ) -> dict[str, StoryBatch]:
+    '''
+    Fetches every period concurrently (at most max_concurrency requests in flight).
+    Returns {period_key(period): StoryBatch}.
+    '''
 
-#     for i, comment in enumerate(data.get("hits", []), start=1):
+    async def _fetch(period: dict) -> StoryBatch:
+        return await afetch_hn_by_date_range(query, period['start'], period['end'], limit=limit)
 
-#         author = comment.get("author", "Unknown Author")
-#         text = comment.get("text", "[No Text]").replace("\n", " ")
-#         text = text[:500]
-#         # created_at = comment.get("created_at", "Unknown Date")
+    results = await gather_bounded(_fetch, periods, max_concurrency)
+    return {period_key(period): result for period, result in zip(periods, results)}
 
-#         results.append(f"{i}. Author: {author}: {text}")
-#         # results.append(f"   Comment: {text}")
-#         results.append("")  # Blank line for readability
 
-#     return "\n".join(results)
+def prefetch_date_ranges(
+        query: str,
+        periods: list[dict],
+        limit: int = 10,
+        max_concurrency: int = HN_PREFETCH_CONCURRENCY
+    ) -> dict[str, StoryBatch]:
+    return run_sync(aprefetch_date_ranges(query, periods, limit, max_concurrency))
+
+
+def _date_range_params(query: str, start_date: str, end_date: str, limit: int) -> dict:
+    # raises ValueError on bad dates
+    numeric_filtres = date_range_filter(start_date, end_date)
+
+    return {
+        "query": query, 
+        "tags": "story",
+        "numericFilters": numeric_filtres,
+        "hitsPerPage": limit
+    }
+
+def get_hn_comments(story_id: str, limit: int = 10) -> str:
+    # top-ranked comments of one story, from the Algolia items endpoint
+
+    try:
+        comments = run_sync(afetch_comment_tree(story_id))
+    except HNSearchError as e:
+        return str(e)
+
+    comments.sort(key=lambda c: c.score, reverse=True)
+
+    results = []
+    results.append(f"=== Top {limit} Comments for Story ID {story_id} ===\n")
+
+    for i, comment in enumerate(comments[:limit], start=1):
+        results.append(f"{i}. Author: {comment.author}: {comment.text}")
+        results.append("")  # Blank line for readability
+
+    return "\n".join(results)
+
+
+def prefetch_period_comments(batches: dict[str, StoryBatch], model: Optional[str] = None) -> dict[str, CommentBatch]:
+    # {period_key: StoryBatch} -> {period_key: CommentBatch}, all comment trees fetched concurrently
+    # model: the LLM the comments are prompted to, their token budget is counted with its tokenizer
+    return fetch_comments_for_stories(batches, model=model)
 
 if __name__ == '__main__': 
     print("\n"+"="*60)
@@ -170,9 +193,15 @@ if __name__ == '__main__':
     result = search_hn_by_date_range("GPT", "2024-10-01", "2024-12-31", limit=5)
     print(result)
 
-    # print("\nTest 4: Get comments for top story from above\n")
-    # result = get_hn_comments("53612345", limit=5)
-    # print(result)
+    print("\nTest 4: Get comments for top story from above\n")
+    top_stories = fetch_hn_by_date_range("GPT", "2024-10-01", "2024-12-31", limit=5).top(1)
+    if top_stories:
+        result = get_hn_comments(top_stories[0].hn_id, limit=5)
+        print(result)
+
+    cache = get_hn_cache()
+    if cache is not None:
+        print(f"\nHN cache stats: {cache.stats()}")
 
     print("\n"+"="*60)
     print("End of Hacker News Search Tool Test")
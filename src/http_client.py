@@ -0,0 +1,115 @@
+'''
+Shared, long-lived HTTP clients for every search tool.
+
+Opening a new httpx.Client per call means a fresh TCP + TLS handshake for every
+request. Instead all tools go through get_client() / get_async_client(), which hand
+out process-wide clients with keep-alive pooling per host (and HTTP/2 if h2 is installed).
+'''
+
+import asyncio
+import atexit
+import importlib.util
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+
+from src.config import (
+    HTTP_TIMEOUT_SECONDS,
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP2_ENABLED,
+)
+
+USER_AGENT = "chain-of-agents-hn-analyser/0.1"
+
+_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+
+# async clients are bound to the event loop they were created on, so keep one per loop
+# (sync code reaches them through src.aio.run_sync, whose one background loop keeps its client for the whole process)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def http2_available() -> bool:
+    # httpx only speaks HTTP/2 when the optional h2 package is installed
+    return HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+def _client_kwargs() -> dict:
+    return {
+        "timeout": httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        "http2": http2_available(),
+        "follow_redirects": True,
+        "headers": {"User-Agent": USER_AGENT},
+    }
+
+
+def get_client() -> httpx.Client:
+    '''Returns the shared sync client, creating it on first use.'''
+    global _sync_client
+
+    if _sync_client is None or _sync_client.is_closed:
+        with _lock:
+            if _sync_client is None or _sync_client.is_closed:
+                _sync_client = httpx.Client(**_client_kwargs())
+    return _sync_client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    '''Returns the shared async client for the running event loop.'''
+    loop = asyncio.get_running_loop()
+
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**_client_kwargs())
+            _async_clients[loop] = client
+    return client
+
+
+def close_clients() -> None:
+    # closes the sync client, and the async clients of loops still running in other threads
+    # (run_sync's background loop); others are closed with aclose_client() on their own loop
+    global _sync_client
+
+    with _lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+        running = [(loop, client) for loop, client in _async_clients.items() if loop.is_running()]
+
+    for loop, client in running:
+        if _current_loop() is loop:
+            continue # can't wait on our own loop, aclose_client() there instead
+        try:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=5)
+        except Exception: # the loop is ours (deadlock) or stuck, the OS closes the sockets at exit anyway
+            pass
+
+
+def _current_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+async def aclose_client() -> None:
+    loop = asyncio.get_running_loop()
+
+    with _lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+atexit.register(close_clients)
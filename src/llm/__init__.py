@@ -1,5 +1,8 @@
-from src.llm.provider import get_llm
-
-__all__ = ['get_llm']
-
+# loaded on first access, so src.llm.tokens can be used without the provider module
+from src._lazy import lazy_exports
 
+__all__, __getattr__, __dir__ = lazy_exports(__name__, {
+    "get_llm": "src.llm.provider",
+    "clear_llm_registry": "src.llm.provider",
+    "llm_limit": "src.llm.provider",
+})
@@ -1,26 +1,100 @@
 # Switching bewteen Ollama & GEMINI
+# Clients are built once per (provider, model, params) and reused process-wide: chat models are
+# safe to share across threads and support ainvoke, and each one keeps its own HTTP session warm.
 
+from __future__ import annotations
 
-from langchain_core.language_models import BaseChatModel
+import json
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from src.aio import ConcurrencyLimit
 from src.config import(
 
     LLM_PROVIDER,
     OLLAMA_BASE_URL,
     OLLAMA_MODEL,      
+    OLLAMA_NUM_CTX,
     GEMINI_API_KEY,
-    GEMINI_MODEL
+    GEMINI_MODEL,
+    LLM_CALL_TIMEOUT_SECONDS,
+    LLM_MAX_CONCURRENCY
 )
 
-def get_llm() -> BaseChatModel: 
+if TYPE_CHECKING: # langchain is only imported once a client is built
+    from langchain_core.language_models import BaseChatModel
+
+DEFAULT_TEMPERATURE = 0.1 # low temp for more consistent extraction 
+
+# wrap LLM calls in `with llm_limit:` to keep the whole process (e.g. a batch) under LLM_MAX_CONCURRENCY
+llm_limit = ConcurrencyLimit(LLM_MAX_CONCURRENCY)
+
+_registry: dict[tuple, BaseChatModel] = {}
+_registry_lock = threading.Lock()
+
+
+def resolve_model(provider: Optional[str] = None, model: Optional[str] = None) -> tuple[str, str]:
+    # -> (provider, model), filling in LLM_PROVIDER and that provider's configured model
+    provider = (provider or LLM_PROVIDER).lower()
+    if provider == "ollama": 
+        return provider, model or OLLAMA_MODEL
+    if provider == "gemini": 
+        return provider, model or GEMINI_MODEL
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def get_llm(
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        temperature: float = DEFAULT_TEMPERATURE,
+        cache_namespace: Optional[str] = None,
+        **params
+    ) -> BaseChatModel: 
+    '''
+    Returns the shared client for (provider, model, temperature, params), building it on first use.
+    provider defaults to LLM_PROVIDER, model to that provider's configured model.
+    cache_namespace (e.g. "worker") answers repeated prompts from the on-disk LLM cache.
+    '''
+
+    provider, model = resolve_model(provider, model)
+
+    # params can hold unhashable values (e.g. safety_settings dicts), so key on a frozen copy
+    base_key = (provider, model, temperature, json.dumps(params, sort_keys=True, default=repr))
+    key = base_key + (cache_namespace,)
+
+    llm = _registry.get(key)
+    if llm is not None:
+        return llm
+
+    with _registry_lock:
+        llm = _registry.get(key)
+        if llm is not None: # another thread built it while we waited
+            return llm
+
+        base = _registry.get(base_key + (None,))
+        if base is None:
+            build = _get_ollama_llm if provider == "ollama" else _get_gemini_llm
+            base = _registry[base_key + (None,)] = build(model, temperature, **params)
+
+        llm = base
+        if cache_namespace is not None:
+            from src.cache.llm import get_llm_cache
+
+            cache = get_llm_cache(cache_namespace)
+            if cache is not None:
+                # shallow copy, shares the underlying client/HTTP session
+                llm = base.model_copy(update={"cache": cache})
+
+        _registry[key] = llm
+    return llm
+
+
+def clear_llm_registry() -> None: 
+    with _registry_lock:
+        _registry.clear()
 
-    if LLM_PROVIDER == "ollama": 
-        return _get_ollama_llm()
-    elif LLM_PROVIDER == "gemini": 
-        return _get_gemini_llm()
-    else: 
-        raise ValueError(f"Unknown LLM provider: {LLM_PROVIDER}")
     
-def _get_ollama_llm() -> BaseChatModel: 
+def _get_ollama_llm(model: str, temperature: float, **params) -> BaseChatModel: 
 
     try: 
         from langchain_ollama import ChatOllama 
@@ -29,13 +103,18 @@ def _get_ollama_llm() -> BaseChatModel:
             "langchain_ollama is not installed. Please install it to use Ollama LLM provider."
         )
     
+    params.setdefault("num_ctx", OLLAMA_NUM_CTX) # match the window src/llm/tokens.py budgets for
+    # aborts the HTTP request itself, also for calls made outside call_llm
+    params.setdefault("client_kwargs", {"timeout": LLM_CALL_TIMEOUT_SECONDS})
+
     return ChatOllama(
-        model=OLLAMA_MODEL,
+        model=model,
         base_url=OLLAMA_BASE_URL,
-        temperature=0.1 # low temp for more consistent extraction 
+        temperature=temperature,
+        **params
         )   
 
-def _get_gemini_llm() -> BaseChatModel:
+def _get_gemini_llm(model: str, temperature: float, **params) -> BaseChatModel:
     if not GEMINI_API_KEY: 
         raise ValueError("GEMINI_API_KEY must be set to use Gemini LLM provider.")
     
@@ -46,10 +125,13 @@ def _get_gemini_llm() -> BaseChatModel:
             "langchain_google_genai is not installed. Please install it to use Gemini LLM provider."
         )    
     
+    params.setdefault("timeout", LLM_CALL_TIMEOUT_SECONDS) # per request, see _get_ollama_llm
+
     return ChatGoogleGenerativeAI(
-        model=GEMINI_MODEL,
+        model=model,
         google_api_key=GEMINI_API_KEY,
-        temperature=0.1 # low temp for more consistent extraction
+        temperature=temperature,
+        **params
     )
 
 # for testing
@@ -0,0 +1,247 @@
+'''
+Deadlines, retries and hedging for LLM calls.
+
+    response = call_llm(lambda: llm.ainvoke(messages), label="worker", deadline=run_deadline)
+    response = await acall_llm(lambda: llm.ainvoke(messages), label="worker")
+
+Every attempt runs under llm_limit with a per-call timeout that is cut short by the run's
+deadline, if any. The timeout starts once the request holds a slot, waiting for one is only
+bounded by the deadline. Transient failures (timeouts, rate limits, 5xx, dropped connections)
+are retried with full-jitter exponential backoff. With hedging on, an attempt still running
+after the p95 latency of recent calls with the same label gets an identical second request,
+and whichever answers first wins.
+
+Requests are asyncio tasks (call_llm runs them on the shared background loop, see src/aio.py),
+so a request that times out or loses the hedge is cancelled: its HTTP call is dropped and its
+llm_limit slot is released right away instead of when the provider answers.
+'''
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from src.config import (
+    LLM_CALL_TIMEOUT_SECONDS,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MIN_DELAY_SECONDS,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_PERCENTILE,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_RETRY_MAX_SECONDS,
+)
+from src.aio import run_sync
+from src.llm.provider import llm_limit
+
+T = TypeVar("T")
+
+LATENCY_WINDOW = 200 # recent successful calls per label the hedge delay is taken from
+
+# provider errors worth another try: google.api_core, langchain wrappers, httpx, ollama
+TRANSIENT_ERROR_NAMES = {
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests",
+    "ConnectError", "ConnectTimeout", "ReadTimeout", "ReadError", "RemoteProtocolError", "PoolTimeout",
+}
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_MESSAGES = ("429", "rate limit", "quota", "overloaded", "unavailable", "timed out", "timeout", "503", "502")
+
+
+class LLMTimeoutError(TimeoutError):
+    '''One attempt took longer than its timeout (retried).'''
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    '''The run's deadline passed, no more attempts.'''
+
+
+def run_deadline(seconds: Optional[float]) -> Optional[float]:
+    # seconds from now -> deadline for call_llm (time.monotonic() based), None = no deadline
+    return time.monotonic() + seconds if seconds else None
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    if type(exc).__name__ in TRANSIENT_ERROR_NAMES:
+        return True
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status in TRANSIENT_STATUS_CODES:
+        return True
+    message = str(exc).lower()
+    return any(marker in message for marker in TRANSIENT_MESSAGES)
+
+
+def backoff_delay(attempt: int) -> float:
+    # full jitter: uniform(0, base * 2^attempt), capped, so retrying callers spread out
+    return random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+## Latency tracking (for the hedge delay)
+
+_latencies: dict[str, deque] = {}
+_latency_lock = threading.Lock()
+
+
+def record_latency(label: str, seconds: float) -> None:
+    with _latency_lock:
+        _latencies.setdefault(label, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def hedge_delay(label: str) -> Optional[float]:
+    # the LLM_HEDGE_PERCENTILE latency of recent calls with this label, None until there are enough
+    with _latency_lock:
+        samples = sorted(_latencies.get(label, ()))
+    if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    p = samples[min(len(samples) - 1, int(len(samples) * LLM_HEDGE_PERCENTILE / 100))]
+    return max(p, LLM_HEDGE_MIN_DELAY_SECONDS)
+
+
+def _attempt_timeout(timeout: float, deadline: Optional[float]) -> float:
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise LLMDeadlineExceeded("LLM call not started, the run's deadline has passed")
+    return min(timeout, remaining)
+
+
+## Calls
+
+class _Abandoned(Exception):
+    pass
+
+
+class _Request:
+    # one request of an attempt (the first one, or its hedge), see _limited
+    __slots__ = ("task", "started", "settled")
+
+    def __init__(self, settled: asyncio.Event):
+        self.task: Optional[asyncio.Task] = None
+        self.started = asyncio.Event() # holds a slot and has called fn
+        self.settled = settled # shared by the attempt's requests: answered, or nobody waits anymore
+
+
+async def _limited(fn: Callable[[], Awaitable[T]], request: _Request) -> tuple[T, float]:
+    # cancelling the task while it waits for a slot or while the call runs frees the slot on the spot
+    async with llm_limit:
+        if request.settled.is_set(): # got the slot the winner just released
+            raise _Abandoned()
+        request.started.set()
+        started = time.monotonic()
+        result = await fn()
+        request.settled.set() # before the slot is released, so a hedge waiting for it doesn't go out
+        return result, time.monotonic() - started
+
+
+def _submit(fn: Callable[[], Awaitable[T]], settled: asyncio.Event) -> _Request:
+    request = _Request(settled)
+    request.task = asyncio.create_task(_limited(fn, request))
+    return request
+
+
+async def _wait_for_slot(request: _Request, deadline: Optional[float]) -> bool:
+    # False if the deadline passes first
+    started = asyncio.create_task(request.started.wait())
+    try:
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        done, _ = await asyncio.wait([request.task, started], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        started.cancel()
+    return bool(done) # request.task done = failed before it started, the error is raised by the caller
+
+
+async def _run_attempt(fn: Callable[[], Awaitable[T]], label: str, timeout: float, hedge: bool, deadline: Optional[float]) -> T:
+    _attempt_timeout(timeout, deadline) # don't queue up once the deadline has passed
+    settled = asyncio.Event()
+    requests = [_submit(fn, settled)]
+
+    try:
+        if not await _wait_for_slot(requests[0], deadline):
+            raise LLMDeadlineExceeded(f"LLM call ({label}) got no free slot before the run's deadline")
+        timeout = _attempt_timeout(timeout, deadline) # what's left of the deadline after the wait
+        started = time.monotonic()
+
+        delay = hedge_delay(label) if hedge else None
+        if delay is not None and delay < timeout:
+            done, _ = await asyncio.wait([requests[0].task], timeout=delay)
+            if not done:
+                print(f"LLM call ({label}) still running after {delay:.1f}s (p{LLM_HEDGE_PERCENTILE:g}), sending a hedged request...")
+                requests.append(_submit(fn, settled))
+
+        tasks = [r.task for r in requests]
+        error = None
+        while tasks:
+            remaining = timeout - (time.monotonic() - started)
+            done, _ = await asyncio.wait(tasks, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+
+            for task in done:
+                tasks.remove(task)
+                if task.exception() is None:
+                    result, elapsed = task.result()
+                    record_latency(label, elapsed)
+                    return result
+                error = task.exception() # the other request may still answer
+
+        if error is not None and not tasks:
+            raise error
+        raise LLMTimeoutError(f"LLM call ({label}) timed out after {timeout:.1f}s")
+    finally:
+        # the loser / timed-out request is cancelled mid-call, and its slot is free once this returns
+        settled.set()
+        pending = [r.task for r in requests if not r.task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+
+async def acall_llm(
+        fn: Callable[[], Awaitable[T]],
+        label: str = "llm",
+        timeout: float = LLM_CALL_TIMEOUT_SECONDS,
+        deadline: Optional[float] = None,
+        max_retries: int = LLM_MAX_RETRIES,
+        hedge: bool = LLM_HEDGE_ENABLED
+    ) -> T:
+    '''
+    Runs fn (one LLM request, e.g. lambda: llm.ainvoke(prompt)) with a per-attempt timeout,
+    retries on transient errors and optional hedging. Don't wrap fn in llm_limit, this does.
+    label: groups calls for the hedge delay (calls with a similar prompt size/latency)
+    deadline: from run_deadline(), no attempt or backoff runs past it
+    hedge: off for calls whose tokens are streamed to a user (a hedge would stream them twice)
+    '''
+
+    for attempt in range(max_retries + 1):
+        try:
+            return await _run_attempt(fn, label, timeout, hedge, deadline)
+        except LLMDeadlineExceeded:
+            raise
+        except Exception as e:
+            if attempt == max_retries or not is_transient(e):
+                raise
+            wait_time = backoff_delay(attempt)
+            if deadline is not None and time.monotonic() + wait_time >= deadline:
+                raise LLMDeadlineExceeded(f"LLM call ({label}) failed and the run's deadline leaves no time to retry: {e}")
+            print(f"LLM call ({label}) attempt {attempt + 1} failed: {e}. Retrying in {wait_time:.1f} seconds...")
+            await asyncio.sleep(wait_time)
+
+
+def call_llm(fn: Callable[[], Awaitable[T]], label: str = "llm", **options) -> T:
+    '''
+    acall_llm for sync code (graph nodes, scripts), same arguments. The requests run on the shared
+    background loop, in a copy of the caller's context so LangChain callbacks / LangGraph streaming
+    and run config still see them as part of the calling node.
+    '''
+    context = contextvars.copy_context()
+
+    async def _in_context() -> T:
+        return await asyncio.get_running_loop().create_task(acall_llm(fn, label, **options), context=context)
+
+    return run_sync(_in_context())
@@ -0,0 +1,235 @@
+'''
+Token counting and prompt budgets.
+
+Counts come from the model's own tokenizer when one can be loaded offline (a tokenizer.json
+through `tokenizers`, or a tiktoken encoding), and are otherwise estimated from characters
+per token for the model's family (close enough for budgeting English prompts, and free).
+Tokenizers are loaded once per model and shared process-wide.
+
+Budgets are split between the fixed instructions, the carried-over summary and the new data,
+so a prompt never grows past the model's context window, or past the configured cap that
+keeps latency flat.
+'''
+
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Sequence
+
+from src.config import (
+    COA_MAX_PROMPT_TOKENS,
+    COA_OUTPUT_RESERVE_TOKENS,
+    TOKENIZER_ALLOW_DOWNLOAD,
+    TOKENIZER_BACKEND,
+    TOKENIZER_PATH,
+)
+
+# context windows by model name prefix, longest match wins
+CONTEXT_WINDOWS = {
+    "llama3.1": 8192,  # what we run Ollama with (num_ctx), the model itself goes to 128k
+    "llama3": 8192,
+    "mistral": 8192,
+    "gemini-2.5": 1_048_576,
+    "gemini-2.0": 1_048_576,
+    "gemini-1.5-pro": 2_097_152,
+    "gemini-1.5": 1_048_576,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# rough English averages per model family
+CHARS_PER_TOKEN = {
+    "gemini": 4.0,
+    "llama": 3.8,
+}
+DEFAULT_CHARS_PER_TOKEN = 4.0
+
+# Hugging Face repos with the model's tokenizer.json (only read from the local HF cache unless
+# TOKENIZER_ALLOW_DOWNLOAD is on). Gemini's tokenizer isn't published, it stays on the estimate
+HF_TOKENIZER_REPOS = {
+    "llama3.1": "unsloth/Meta-Llama-3.1-8B-Instruct",
+    "llama3": "unsloth/llama-3-8b-Instruct",
+    "mistral": "mistralai/Mistral-7B-Instruct-v0.3",
+}
+
+# tiktoken encodings close to the model's own (Llama 3's vocabulary extends cl100k's)
+TIKTOKEN_ENCODINGS = {
+    "llama3": "cl100k_base",
+}
+
+
+def _model_key(model: str) -> str:
+    # model names compare case-insensitively ("Llama3.1" from one config, "llama3.1" from another)
+    return model.strip().lower()
+
+
+def _lookup(table: dict, model: Optional[str], default):
+    if not model:
+        return default
+    model = _model_key(model)
+    matches = [prefix for prefix in table if model.startswith(prefix)]
+    return table[max(matches, key=len)] if matches else default
+
+
+def context_window(model: Optional[str]) -> int:
+    return _lookup(CONTEXT_WINDOWS, model, DEFAULT_CONTEXT_WINDOW)
+
+
+## Tokenizers
+# all three expose count_batch(texts) -> token counts, encoding the whole batch in one call
+
+class HeuristicTokenizer:
+    name = "heuristic"
+
+    def __init__(self, chars_per_token: float):
+        self.chars_per_token = chars_per_token
+
+    def count_batch(self, texts: Sequence[str]) -> list[int]:
+        return [math.ceil(len(t) / self.chars_per_token) if t else 0 for t in texts]
+
+
+class HFTokenizer:
+
+    def __init__(self, tokenizer, name: str):
+        self.tokenizer = tokenizer
+        self.name = name
+
+    def count_batch(self, texts: Sequence[str]) -> list[int]:
+        # encode_batch runs in parallel in Rust
+        return [len(e.ids) for e in self.tokenizer.encode_batch(list(texts), add_special_tokens=False)]
+
+
+class TiktokenTokenizer:
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.name = f"tiktoken:{encoding.name}"
+
+    def count_batch(self, texts: Sequence[str]) -> list[int]:
+        return [len(ids) for ids in self.encoding.encode_ordinary_batch(list(texts))]
+
+
+def _load_hf(model: Optional[str]) -> Optional[HFTokenizer]:
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        return None
+
+    from src.llm.provider import resolve_model
+
+    if TOKENIZER_PATH and model and _model_key(model) == _model_key(resolve_model()[1]):
+        return HFTokenizer(Tokenizer.from_file(TOKENIZER_PATH), f"tokenizers:{TOKENIZER_PATH}")
+
+    repo = _lookup(HF_TOKENIZER_REPOS, model, None)
+    if repo is None:
+        return None
+    try:
+        from huggingface_hub import hf_hub_download
+
+        path = hf_hub_download(repo, "tokenizer.json", local_files_only=not TOKENIZER_ALLOW_DOWNLOAD)
+    except Exception: # not cached (offline), gated, or huggingface_hub missing
+        return None
+    return HFTokenizer(Tokenizer.from_file(path), f"tokenizers:{repo}")
+
+
+def _load_tiktoken(model: Optional[str]) -> Optional[TiktokenTokenizer]:
+    encoding_name = _lookup(TIKTOKEN_ENCODINGS, model, None)
+    if encoding_name is None:
+        return None
+    try:
+        import tiktoken
+
+        return TiktokenTokenizer(tiktoken.get_encoding(encoding_name)) # reads tiktoken's local cache
+    except Exception: # not installed, or the encoding isn't cached and we're offline
+        return None
+
+
+@lru_cache(maxsize=None)
+def _tokenizer_for(model: Optional[str]):
+    tokenizer = None
+    if TOKENIZER_BACKEND != "heuristic":
+        tokenizer = _load_hf(model) or _load_tiktoken(model)
+    if tokenizer is None:
+        tokenizer = HeuristicTokenizer(_lookup(CHARS_PER_TOKEN, model, DEFAULT_CHARS_PER_TOKEN))
+    if tokenizer.name != "heuristic":
+        print(f"Token counts for {model}: {tokenizer.name}")
+    return tokenizer
+
+
+def get_tokenizer(model: Optional[str] = None):
+    '''The shared tokenizer for model (default: the configured LLM_PROVIDER model).'''
+
+    if model is None:
+        from src.llm.provider import resolve_model
+
+        model = resolve_model()[1]
+    return _tokenizer_for(_model_key(model))
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    return get_tokenizer(model).count_batch([text])[0]
+
+
+def count_word_tokens(words: Sequence[str], model: Optional[str] = None) -> list[float]:
+    '''
+    Tokens each word adds to space-separated text, for packing text to a token budget.
+    Unique words are encoded once, in one batch (documents repeat most of their words).
+    '''
+
+    tokenizer = get_tokenizer(model)
+    if isinstance(tokenizer, HeuristicTokenizer):
+        # fractional, rounding every word up would overshoot the text's count by ~1/2 token a word
+        return [(len(w) + 1) / tokenizer.chars_per_token for w in words]
+
+    unique = list(dict.fromkeys(words))
+    counts = dict(zip(unique, tokenizer.count_batch([" " + w for w in unique])))
+    return [counts[w] for w in words]
+
+
+def trim_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    '''Cuts text to roughly max_tokens, at a line (or word) boundary where possible.'''
+
+    n_tokens = count_tokens(text, model)
+    if n_tokens <= max_tokens:
+        return text
+
+    max_chars = int(len(text) * max(max_tokens, 0) / n_tokens) # at this text's own chars per token
+    cut = text[:max_chars]
+    boundary = cut.rfind("\n")
+    if boundary < max_chars // 2:
+        boundary = cut.rfind(" ")
+    if boundary > 0:
+        cut = cut[:boundary]
+    return cut.rstrip() + "\n[...]"
+
+
+@dataclass(slots=True)
+class PromptBudget:
+    total: int  # tokens the whole prompt may use
+    instructions: int  # already spent on the fixed template
+    summary: int  # for the carried-over summary
+    data: int  # for the new data (gets whatever the summary doesn't use)
+
+    def data_after(self, summary_tokens: int) -> int:
+        return self.data + max(self.summary - summary_tokens, 0)
+
+
+def allocate_budget(
+        model: Optional[str],
+        instructions: str,
+        summary_share: float = 0.35,
+        max_prompt_tokens: int = COA_MAX_PROMPT_TOKENS,
+        output_reserve: int = COA_OUTPUT_RESERVE_TOKENS
+    ) -> PromptBudget:
+    '''
+    total = min(context window - room for the answer, max_prompt_tokens)
+    whatever the instructions leave is split summary_share / (1 - summary_share)
+    '''
+
+    total = min(context_window(model) - output_reserve, max_prompt_tokens)
+    used = count_tokens(instructions, model)
+    remaining = max(total - used, 0)
+    summary = int(remaining * summary_share)
+
+    return PromptBudget(total=total, instructions=used, summary=summary, data=remaining - summary)
@@ -0,0 +1,185 @@
+'''
+Adaptive time-period planner.
+
+Instead of fixed quarters, it fires cheap hitsPerPage=0 count probes across the query's
+date span (concurrently), then splits busy windows and merges quiet ones so every worker
+gets roughly the same volume of discussion, with at most max_workers periods.
+'''
+
+import math
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from src.aio import gather_bounded, run_sync
+from src.config import (
+    HN_PREFETCH_CONCURRENCY,
+    PLANNER_MAX_WORKERS,
+    PLANNER_WINDOWS_PER_WORKER,
+    PLANNER_DEFAULT_SPAN_DAYS,
+)
+from src.tools.algolia import HN_SEARCH_BY_DATE_URL, HNSearchError, afetch_algolia_json, date_range_filter
+
+MAX_SPLIT_ROUNDS = 2
+
+Window = tuple[date, date] # inclusive start/end days
+
+
+def default_date_span(today: Optional[date] = None) -> tuple[str, str]:
+    # trailing PLANNER_DEFAULT_SPAN_DAYS up to today
+    today = today or date.today()
+    start = today - timedelta(days=PLANNER_DEFAULT_SPAN_DAYS - 1)
+    return start.isoformat(), today.isoformat()
+
+
+def _month_end(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def period_label(start: date, end: date) -> str:
+    if start.day == 1 and end == _month_end(start):
+        return start.strftime("%B %Y")
+
+    if start.day == 1 and (start.month - 1) % 3 == 0 and end == _month_end(date(start.year, start.month + 2, 1)):
+        return f"Q{(start.month - 1) // 3 + 1} {start.year}"
+
+    return f"{start:%d %b %Y} - {end:%d %b %Y}"
+
+
+def _split_evenly(start: date, end: date, n: int) -> list[Window]:
+    n_days = (end - start).days + 1
+    n = max(1, min(n, n_days))
+
+    edges = [start + timedelta(days=round(i * n_days / n)) for i in range(n + 1)]
+    return [(edges[i], edges[i + 1] - timedelta(days=1)) for i in range(n)]
+
+
+async def acount_hits(query: str, window: Window) -> int:
+    params = {
+        "query": query,
+        "tags": "story",
+        "numericFilters": date_range_filter(window[0].isoformat(), window[1].isoformat()),
+        "hitsPerPage": 0, # only nbHits is needed
+    }
+    data = await afetch_algolia_json(HN_SEARCH_BY_DATE_URL, params=params)
+    return data.get("nbHits", 0)
+
+
+async def _count_all(query: str, windows: list[Window]) -> list[int]:
+    return await gather_bounded(lambda w: acount_hits(query, w), windows, HN_PREFETCH_CONCURRENCY)
+
+
+def _merge(windows: list[Window], counts: list[int], target: float, max_workers: int) -> list[tuple[Window, int]]:
+    # greedy sweep: close a period once it holds ~target hits
+    periods = []
+    current_start, acc = None, 0
+
+    for (w_start, w_end), count in zip(windows, counts):
+        if current_start is None:
+            current_start = w_start
+        acc += count
+        if acc >= target:
+            periods.append(((current_start, w_end), acc))
+            current_start, acc = None, 0
+
+    if current_start is not None:
+        tail = ((current_start, windows[-1][1]), acc)
+        if periods and acc < target / 2:
+            (p_start, _), p_count = periods.pop()
+            tail = ((p_start, windows[-1][1]), p_count + acc)
+        periods.append(tail)
+
+    # still too many -> merge the adjacent pair with the smallest combined volume
+    while len(periods) > max_workers:
+        i = min(range(len(periods) - 1), key=lambda j: periods[j][1] + periods[j + 1][1])
+        (a_start, _), a_count = periods[i]
+        (_, b_end), b_count = periods[i + 1]
+        periods[i:i + 2] = [((a_start, b_end), a_count + b_count)]
+
+    return periods
+
+
+async def aplan_periods(
+        query: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        max_workers: int = PLANNER_MAX_WORKERS,
+        windows_per_worker: int = PLANNER_WINDOWS_PER_WORKER
+    ) -> list[dict]:
+    '''
+    Returns [{"start", "end", "label", "hits"}] covering the busy part of the span,
+    each period holding roughly total_hits / max_workers stories.
+    '''
+
+    if not start_date or not end_date:
+        start_date, end_date = default_date_span()
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+
+    windows = _split_evenly(start, end, max_workers * windows_per_worker)
+    counts = await _count_all(query, windows)
+
+    total = sum(counts)
+    if total == 0:
+        return [{"start": start_date, "end": end_date, "label": period_label(start, end), "hits": 0}]
+
+    target = total / max_workers
+
+    # split windows that alone hold more than one worker's share
+    for _ in range(MAX_SPLIT_ROUNDS):
+        busy = [i for i, (w, c) in enumerate(zip(windows, counts)) if c > target and w[1] > w[0]]
+        if not busy:
+            break
+
+        pieces = {i: _split_evenly(windows[i][0], windows[i][1], math.ceil(counts[i] / target)) for i in busy}
+        piece_counts = await _count_all(query, [p for i in busy for p in pieces[i]])
+
+        new_windows, new_counts, cursor = [], [], 0
+        for i, (w, c) in enumerate(zip(windows, counts)):
+            if i in pieces:
+                n = len(pieces[i])
+                new_windows.extend(pieces[i])
+                new_counts.extend(piece_counts[cursor:cursor + n])
+                cursor += n
+            else:
+                new_windows.append(w)
+                new_counts.append(c)
+        windows, counts = new_windows, new_counts
+
+    # no point spending LLM calls on empty stretches at either end
+    while counts and counts[0] == 0:
+        windows, counts = windows[1:], counts[1:]
+    while counts and counts[-1] == 0:
+        windows, counts = windows[:-1], counts[:-1]
+
+    return [
+        {"start": s.isoformat(), "end": e.isoformat(), "label": period_label(s, e), "hits": hits}
+        for (s, e), hits in _merge(windows, counts, target, max_workers)
+    ]
+
+
+def plan_periods(
+        query: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        max_workers: int = PLANNER_MAX_WORKERS,
+        windows_per_worker: int = PLANNER_WINDOWS_PER_WORKER
+    ) -> list[dict]:
+    '''
+    Sync wrapper around aplan_periods. If the count probes fail, falls back to
+    max_workers equal-width periods so a run can still go ahead.
+    '''
+
+    try:
+        return run_sync(aplan_periods(query, start_date, end_date, max_workers, windows_per_worker))
+    except HNSearchError as e:
+        print(f"Count probes failed ({e}), falling back to equal-width periods")
+
+    if not start_date or not end_date:
+        start_date, end_date = default_date_span()
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+
+    return [
+        {"start": s.isoformat(), "end": e.isoformat(), "label": period_label(s, e)}
+        for s, e in _split_evenly(start, end, max_workers)
+    ]
@@ -0,0 +1,278 @@
+'''
+Long-running analysis service: the chain of agents behind a small local HTTP API.
+
+The process imports langchain/langgraph once and keeps the compiled graphs and LLM clients
+warm. Jobs go into a bounded queue that SERVICE_WORKERS workers drain. A request for an
+analysis that is already queued or running (same query, dates, periods and mode) joins that
+job instead of starting another one.
+
+    python -m src.service --port 8765
+
+    POST /jobs         {"query": "AI agents", "start_date": "2024-01-01", "mode": "parallel"}
+                       -> 202 {"id": ..., "status": "queued", "coalesced": false}
+                       -> 400 without a query string, or when a field has the wrong type
+                       -> 503 when the queue is full
+    GET  /jobs         every job still in memory, newest first (no answers)
+    GET  /jobs/<id>    status, and final_answer / error once finished
+                       ?wait=<seconds> holds the request until the job finishes (or the wait runs out)
+    GET  /health       workers, queue depth, running jobs
+'''
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from src.batch import JOB_FIELDS, job_key, validate_job
+from src.config import SERVICE_HOST, SERVICE_JOB_HISTORY, SERVICE_PORT, SERVICE_QUEUE_SIZE, SERVICE_WORKERS
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_WAIT_SECONDS = 300
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass(slots=True)
+class Job:
+    id: str
+    key: str
+    args: dict
+    status: str = "queued" # queued -> running -> done | failed
+    final_answer: Optional[str] = None
+    error: Optional[str] = None
+    requests: int = 1 # submissions sharing this job
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def to_dict(self, with_result: bool = True) -> dict:
+        info = {
+            "id": self.id,
+            "status": self.status,
+            "requests": self.requests,
+            **self.args,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.started_at and self.finished_at:
+            info["elapsed_seconds"] = round(self.finished_at - self.started_at, 2)
+        if with_result:
+            info["final_answer"] = self.final_answer
+            info["error"] = self.error
+        return info
+
+
+class AnalysisService:
+
+    def __init__(self, workers: int = SERVICE_WORKERS, queue_size: int = SERVICE_QUEUE_SIZE, history: int = SERVICE_JOB_HISTORY):
+        self.n_workers = max(1, workers)
+        self.queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=max(1, queue_size))
+        self.history = history
+        self.jobs: OrderedDict[str, Job] = OrderedDict() # id -> job, oldest first
+        self.in_flight: dict[str, Job] = {} # job key -> queued or running job
+        self._workers: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        # pay the imports and graph compilation once, before the first request
+        await asyncio.to_thread(self._warm_up)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.n_workers)]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    @staticmethod
+    def _warm_up() -> None:
+        from src.chain_of_agents import warm_up
+
+        warm_up()
+
+    def submit(self, args: dict) -> tuple[Job, bool]:
+        '''-> (job, whether it joined an identical in-flight job). Raises QueueFullError.'''
+
+        key = job_key(args)
+        job = self.in_flight.get(key)
+        if job is not None:
+            job.requests += 1
+            return job, True
+
+        job = Job(id=uuid.uuid4().hex[:12], key=key, args={k: args[k] for k in JOB_FIELDS if args.get(k)})
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.queue.maxsize} waiting), try again later")
+
+        self.jobs[job.id] = job
+        self.in_flight[key] = job
+        self._trim_history()
+        return job, False
+
+    def _trim_history(self) -> None:
+        # forget the oldest finished jobs, queued and running ones are always kept
+        finished = [job_id for job_id, job in self.jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(len(self.jobs) - self.history, 0)]:
+            del self.jobs[job_id]
+
+    async def _worker(self, n: int) -> None:
+        from src.chain_of_agents import analyse_hn_trends
+
+        while True:
+            job = await self.queue.get()
+            job.status, job.started_at = "running", time.time()
+            print(f"[worker {n}] {job.id}: {job.args['query']!r}")
+            try:
+                job.final_answer = await asyncio.to_thread(analyse_hn_trends, **job.args)
+                job.status = "done"
+            except Exception as e:
+                job.error, job.status = str(e), "failed"
+            finally:
+                job.finished_at = time.time()
+                self.in_flight.pop(job.key, None)
+                job.done.set()
+                self.queue.task_done()
+            print(f"[worker {n}] {job.id}: {job.status} in {job.finished_at - job.started_at:.1f}s")
+
+    async def wait(self, job: Job, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def health(self) -> dict:
+        return {
+            "workers": self.n_workers,
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "running": sum(1 for job in self.in_flight.values() if job.status == "running"),
+            "jobs": len(self.jobs),
+        }
+
+
+## HTTP
+# just enough HTTP/1.1 for JSON requests from internal tools, one request per connection
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+async def _read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes]:
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    method, target, _ = request_line.split(" ", 2)
+
+    headers = {}
+    while (line := (await reader.readline()).decode("latin-1").strip()):
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", "0"))
+    if length > MAX_BODY_BYTES:
+        raise ValueError("body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, body
+
+
+async def _route(service: AnalysisService, method: str, target: str, body: bytes) -> tuple[int, dict]:
+    url = urlsplit(target)
+    path = url.path.rstrip("/")
+    query = parse_qs(url.query)
+
+    if path == "/health" and method == "GET":
+        return 200, service.health()
+
+    if path == "/jobs" and method == "POST":
+        try:
+            args = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            return 400, {"error": f"invalid JSON ({e})"}
+        if not isinstance(args, dict):
+            return 400, {"error": "expected an object with a 'query' field"}
+        try:
+            validate_job(args)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        try:
+            job, coalesced = service.submit(args)
+        except QueueFullError as e:
+            return 503, {"error": str(e)}
+        return 202, {"id": job.id, "status": job.status, "coalesced": coalesced}
+
+    if path == "/jobs" and method == "GET":
+        return 200, {"jobs": [job.to_dict(with_result=False) for job in reversed(service.jobs.values())]}
+
+    if path.startswith("/jobs/") and method == "GET":
+        job = service.jobs.get(path[len("/jobs/"):])
+        if job is None:
+            return 404, {"error": "no such job"}
+        if "wait" in query and not job.done.is_set():
+            await service.wait(job, min(float(query["wait"][0]), MAX_WAIT_SECONDS))
+        return 200, job.to_dict()
+
+    if path in ("/health", "/jobs") or path.startswith("/jobs/"):
+        return 405, {"error": f"{method} not allowed on {path}"}
+    return 404, {"error": "not found"}
+
+
+def make_handler(service: AnalysisService):
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, target, body = await _read_request(reader)
+                status, payload = await _route(service, method, target, body)
+            except ValueError as e:
+                status, payload = (413 if "too large" in str(e) else 400), {"error": str(e)}
+
+            data = json.dumps(payload).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+                + data
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass # client went away
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT, workers: int = SERVICE_WORKERS, queue_size: int = SERVICE_QUEUE_SIZE) -> None:
+    service = AnalysisService(workers, queue_size)
+    await service.start()
+
+    server = await asyncio.start_server(make_handler(service), host, port)
+    print(f"Analysis service on http://{host}:{port} ({service.n_workers} workers, queue of {service.queue.maxsize})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Serve HN trend analyses over HTTP")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="analyses run at once")
+    parser.add_argument("--queue-size", type=int, default=SERVICE_QUEUE_SIZE, help="jobs allowed to wait")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    _main()
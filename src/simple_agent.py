@@ -1,9 +1,15 @@
+# Single ReAct-style Gemini agent with the HN tools
+# demo run from the project root: python -m src.simple_agent
+
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
 import json
+from typing import Optional
 
-from hn_tool import search_hn_stories, search_hn_by_date_range
+from src.hn_tool import search_hn_stories, search_hn_by_date_range
+from src.config import LLM_CALL_TIMEOUT_SECONDS
+from src.llm.resilience import call_llm, run_deadline
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
@@ -43,8 +49,9 @@ If you have enough information to answer, respond with:
 FINAL_ANSWER: your complete answer here
 """
 
-def run_agent(user_question: str, max_steps: int = 5) -> str: 
+def run_agent(user_question: str, max_steps: int = 5, deadline_seconds: Optional[float] = None) -> str: 
     model = genai.GenerativeModel('gemini-2.5-flash')
+    deadline = run_deadline(deadline_seconds) # for all steps together, None = no deadline
 
     system_prompt = f"""You are a helpful AI assistant with access to tools. 
 
@@ -60,7 +67,11 @@ def run_agent(user_question: str, max_steps: int = 5) -> str:
         print(f"Step {step + 1}")
         print('='*50)
 
-        response = model.generate_content(conversation)
+        response = call_llm(
+            lambda: model.generate_content_async(conversation, request_options={"timeout": LLM_CALL_TIMEOUT_SECONDS}),
+            label="simple_agent",
+            deadline=deadline,
+        )
         llm_output = response.text.strip()
         print(f"Agent thinking: \n {llm_output}")
 
@@ -1,6 +1,10 @@
-from src.tools.brave_search import search_web
-from src.tools.arxiv_search import search_arxiv, get_paper_metadata
-from src.tools.hn_search import search_hackernews
-
-__all__ = ["search_web", "search_arxiv","get_paper_metadata","search_hackernews"]
+# tools are loaded on first access (from src.tools import search_web), so importing one tool
+# module doesn't import the others and their dependencies
+from src._lazy import lazy_exports
 
+__all__, __getattr__, __dir__ = lazy_exports(__name__, {
+    "search_web": "src.tools.brave_search",
+    "search_arxiv": "src.tools.arxiv_search",
+    "get_paper_metadata": "src.tools.arxiv_search",
+    "search_hackernews": "src.tools.hn_search",
+})
@@ -0,0 +1,147 @@
+"""
+Low-level Algolia HN API access shared by hn_tool and src/tools/hn_search.py
+Docs: https://hn.algolia.com/api
+"""
+
+import asyncio
+import calendar
+import time
+from datetime import datetime
+
+from src.aio import ConcurrencyLimit, SingleFlight
+from src.cache.hn import get_hn_cache, hn_cache_key
+from src.config import HN_BACKEND, HN_HTTP_MAX_CONCURRENCY
+from src.http_client import get_client, get_async_client
+
+HN_SEARCH_URL = "https://hn.algolia.com/api/v1/search"
+HN_SEARCH_BY_DATE_URL = "https://hn.algolia.com/api/v1/search_by_date"
+HN_ITEMS_URL = "https://hn.algolia.com/api/v1/items/{story_id}"  # full story + comment tree
+
+# Algolia never returns more than this many hits for one query, however it is paged
+ALGOLIA_MAX_HITS = 1000
+
+
+class HNSearchError(Exception):
+    pass
+
+
+# shared by every run in the process (batch runs included): a cap on Algolia requests in flight,
+# and identical requests that overlap in time go out once
+http_limit = ConcurrencyLimit(HN_HTTP_MAX_CONCURRENCY)
+_single_flight = SingleFlight()
+
+
+def utc_day_start(day: str) -> int:
+    # YYYY-MM-DD -> unix seconds at 00:00 UTC that day (created_at_i is UTC), raises ValueError on bad dates
+    return calendar.timegm(datetime.strptime(day, "%Y-%m-%d").timetuple())
+
+
+def date_range_filter(start_date: str, end_date: str) -> str:
+    # YYYY-MM-DD dates, both days included -> Algolia numericFilters on created_at_i
+    # the upper bound is exclusive at the next day's midnight, so the end day counts in full
+    start_ts = utc_day_start(start_date)
+    end_ts = utc_day_start(end_date)
+
+    return f"created_at_i>={start_ts},created_at_i<{end_ts + 86400}"
+
+
+def _search_local(url: str, params: dict) -> dict:
+    # HN_BACKEND=local: answer from the offline corpus instead of Algolia
+    from src.tools.hn_corpus import search_corpus
+
+    if url not in (HN_SEARCH_URL, HN_SEARCH_BY_DATE_URL):
+        raise HNSearchError(f"Error: {url} is not available from the local HN corpus")
+
+    try:
+        return search_corpus(params, order="date" if url == HN_SEARCH_BY_DATE_URL else "relevance")
+    except HNSearchError:
+        raise
+    except Exception as e:
+        raise HNSearchError(f"Error: local HN corpus query failed. Details: {str(e)}")
+
+
+def fetch_algolia_json(url: str, params: dict, max_retries: int = 3) -> dict:
+    '''
+    GET an Algolia endpoint, served from the local response cache when possible.
+    Raises HNSearchError (with a printable message) if the API can't be reached.
+    '''
+
+    if HN_BACKEND == "local":
+        return _search_local(url, params)
+
+    cache = get_hn_cache()
+    if cache is not None:
+        cached = cache.get(url, params)
+        if cached is not None:
+            return cached
+
+    return _single_flight.do(hn_cache_key(url, params), lambda: _fetch(url, params, max_retries, cache))
+
+
+## Retries
+# the decisions are shared, _fetch / _afetch only differ in how they send the request and sleep
+
+def _parse_response(response) -> dict:
+    # a bad status isn't retried, a garbled body (JSON error) is
+    if response.status_code != 200:
+        raise HNSearchError(f"Error: API unable to fetch stories. Status code {response.status_code}")
+    return response.json()
+
+
+def _retry_delay(attempt: int, max_retries: int, error: Exception) -> float:
+    # seconds to wait before the next attempt, raises HNSearchError once the attempts are used up
+    if attempt >= max_retries - 1:
+        raise HNSearchError(f"Error: API request failed after {max_retries} attempts. Last error details: {str(error)}")
+    wait_time = 2 ** attempt # exponential back-off timing, 1s then 2s then 4s etc.
+    print(f"API error attempt {attempt +1} failed. Retrying in {wait_time} seconds...")
+    return wait_time
+
+
+def _store(cache, url: str, params: dict, data: dict) -> dict:
+    if cache is not None:
+        cache.put(url, params, data)
+    return data
+
+
+def _fetch(url: str, params: dict, max_retries: int, cache) -> dict:
+    # with retry logic for error handling, exponential back-off 
+    for attempt in range(max_retries):
+        try:
+            with http_limit:
+                response = get_client().get(url, params=params)
+            data = _parse_response(response)
+        except HNSearchError:
+            raise
+        except Exception as e: 
+            time.sleep(_retry_delay(attempt, max_retries, e))
+            continue
+        return _store(cache, url, params, data)
+
+
+async def afetch_algolia_json(url: str, params: dict, max_retries: int = 3) -> dict:
+    # async twin of fetch_algolia_json, uses the shared async client
+
+    if HN_BACKEND == "local":
+        return _search_local(url, params) # local queries take milliseconds, no need to go async
+
+    cache = get_hn_cache()
+    if cache is not None:
+        cached = cache.get(url, params)
+        if cached is not None:
+            return cached
+
+    return await _single_flight.ado(hn_cache_key(url, params), lambda: _afetch(url, params, max_retries, cache))
+
+
+async def _afetch(url: str, params: dict, max_retries: int, cache) -> dict:
+    for attempt in range(max_retries):
+        try:
+            async with http_limit:
+                response = await get_async_client().get(url, params=params)
+            data = _parse_response(response)
+        except HNSearchError:
+            raise
+        except Exception as e: 
+            await asyncio.sleep(_retry_delay(attempt, max_retries, e))
+            continue
+        return _store(cache, url, params, data)
@@ -3,11 +3,12 @@ ArXiv API wrapper
 Docs: https://info.arxiv.org/help/api/
 """
 
-import httpx
 import xml.etree.ElementTree as ET
 from typing import Optional
 from dataclasses import dataclass
 
+from src.http_client import get_client
+
 ARXIV_API_URL = "https://export.arxiv.org/api/query"
 
 @dataclass
@@ -48,7 +49,7 @@ def search_arxiv(
         "sortOrder": sort_order, 
     }
 
-    response = httpx.get(ARXIV_API_URL, params=params, timeout=30.0, follow_redirects=True)
+    response = get_client().get(ARXIV_API_URL, params=params)
     response.raise_for_status()
 
     return _parse_arxiv_response(response.text)
@@ -62,7 +63,7 @@ def get_paper_metadata(arxiv_id: str) -> Optional[ArxivPaper]:
             "max_results": 1
     }
 
-    response = httpx.get(ARXIV_API_URL, params=params, timeout=30.0, follow_redirects=True)
+    response = get_client().get(ARXIV_API_URL, params=params)
     response.raise_for_status()
 
     papers = _parse_arxiv_response(response.text)
@@ -1,9 +1,9 @@
 # Brave search API wrapper for web search
 # Docs: https://api.search.brave.com/app/documentation/web-search
 
-import httpx
 from typing import Optional 
 from ..config import BRAVE_API_KEY, MAX_SEARCH_RESULTS
+from ..http_client import get_client
 
 # should i add this to config instead *** 
 BRAVE_SEARCH_URL = "https://api.search.brave.com/res/v1/web/search"
@@ -37,11 +37,10 @@ def search_web(
     if freshness: 
         params['freshness'] = freshness 
 
-    response = httpx.get(
+    response = get_client().get(
         BRAVE_SEARCH_URL,
         headers=headers,
         params=params,
-        timeout=30.0
         )
 
     response.raise_for_status() 
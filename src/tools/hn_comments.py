@@ -0,0 +1,190 @@
+"""
+HN comment ingestion: fetch comment trees for a period's top stories concurrently,
+flatten and rank them, then sample down to a token budget before they reach a worker.
+Docs: https://hn.algolia.com/api (items endpoint)
+"""
+
+import html
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from src.aio import gather_bounded, run_sync
+from src.config import HN_COMMENT_CONCURRENCY, HN_COMMENT_TOKEN_BUDGET, HN_COMMENTS_TOP_K
+from src.llm.tokens import count_tokens
+from src.tools.algolia import HN_ITEMS_URL, HNSearchError, afetch_algolia_json
+from src.tools.hn_records import HNArticle
+
+MAX_COMMENT_CHARS = 600 # long comments are clipped before they count against the budget
+
+_TAG = re.compile(r"<[^>]+>")
+
+
+@dataclass(slots=True)
+class HNComment:
+    comment_id: str
+    story_id: str
+    author: str
+    text: str
+    depth: int  # 1 = direct reply to the story
+    n_replies: int  # all descendants, a proxy for how much discussion it started
+    created_at_i: int = 0
+
+    @property
+    def score(self) -> float:
+        # favour comments that started discussion, then top-level ones, then substance
+        return 2.0 * math.log1p(self.n_replies) + 1.0 / self.depth + min(len(self.text), MAX_COMMENT_CHARS) / MAX_COMMENT_CHARS
+
+
+@dataclass(slots=True)
+class CommentBatch:
+    comments: list[HNComment] = field(default_factory=list)
+    story_titles: dict = field(default_factory=dict)  # story_id -> title, for rendering
+    total_fetched: int = 0  # before sampling
+    errors: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.comments)
+
+    def render(self) -> str:
+        if not self.comments:
+            return "No comments sampled."
+
+        lines = []
+        for story_id, title in self.story_titles.items():
+            story_comments = [c for c in self.comments if c.story_id == story_id]
+            if not story_comments:
+                continue
+            lines.append(f"On \"{title}\":")
+            for c in story_comments:
+                lines.append(f"  - {c.author}: {c.text}")
+            lines.append("")
+        return "\n".join(lines).rstrip()
+
+
+def clean_comment_text(raw: Optional[str]) -> str:
+    if not raw:
+        return ""
+    text = _TAG.sub(" ", raw.replace("<p>", "\n"))
+    text = html.unescape(text)
+    text = " ".join(text.split())
+    if len(text) > MAX_COMMENT_CHARS:
+        text = text[:MAX_COMMENT_CHARS].rsplit(" ", 1)[0] + "..."
+    return text
+
+
+def flatten_comment_tree(item: dict) -> list[HNComment]:
+    '''Flattens an items-endpoint story tree into comments (deleted/empty ones dropped).'''
+
+    story_id = str(item.get("id", ""))
+    comments = []
+
+    # returns the no. of descendants under `children` so each parent knows its reply count
+    def _walk(children: Optional[list], depth: int) -> int:
+        total = 0
+        for child in children or []:
+            n_desc = _walk(child.get("children"), depth + 1)
+            total += 1 + n_desc
+
+            text = clean_comment_text(child.get("text"))
+            if child.get("type", "comment") == "comment" and text and child.get("author"):
+                comments.append(HNComment(
+                    comment_id=str(child.get("id", "")),
+                    story_id=story_id,
+                    author=child.get("author"),
+                    text=text,
+                    depth=depth,
+                    n_replies=n_desc,
+                    created_at_i=child.get("created_at_i") or 0,
+                ))
+        return total
+
+    _walk(item.get("children"), 1)
+    return comments
+
+
+def sample_comments(per_story: dict[str, list[HNComment]], token_budget: int, model: Optional[str] = None) -> list[HNComment]:
+    '''
+    Ranks each story's comments and takes them round-robin across stories (so one huge
+    thread can't eat the whole budget) until token_budget is used up.
+    model: whose tokenizer the budget is counted in, the one the comments' prompt goes to
+    (default: the configured LLM_PROVIDER model)
+    '''
+
+    ranked = [sorted(comments, key=lambda c: c.score, reverse=True) for comments in per_story.values()]
+    sampled = []
+    used = 0
+    cursor = 0
+
+    while any(cursor < len(r) for r in ranked):
+        for r in ranked:
+            if cursor >= len(r):
+                continue
+            cost = count_tokens(r[cursor].text, model)
+            if used + cost > token_budget:
+                continue # too long for what's left, shorter ones further down may still fit
+            sampled.append(r[cursor])
+            used += cost
+        cursor += 1
+
+    return sampled
+
+
+async def afetch_comment_tree(story_id: str) -> list[HNComment]:
+    item = await afetch_algolia_json(HN_ITEMS_URL.format(story_id=story_id), params={})
+    return flatten_comment_tree(item)
+
+
+async def afetch_comments_for_stories(
+        stories_by_group: dict[str, Iterable[HNArticle]],
+        top_k: int = HN_COMMENTS_TOP_K,
+        token_budget: int = HN_COMMENT_TOKEN_BUDGET,
+        max_concurrency: int = HN_COMMENT_CONCURRENCY,
+        model: Optional[str] = None
+    ) -> dict[str, CommentBatch]:
+    '''
+    For each group (e.g. a time period) takes its top_k stories by points, fetches all of
+    their comment trees concurrently (one shared concurrency cap across groups) and samples
+    every group down to token_budget, counted with model's tokenizer (see sample_comments).
+    '''
+
+    top = {
+        group: sorted((s for s in stories if s.num_comments > 0), key=lambda s: s.points, reverse=True)[:top_k]
+        for group, stories in stories_by_group.items()
+    }
+    story_ids = list(dict.fromkeys(s.hn_id for stories in top.values() for s in stories))
+
+    async def _fetch(story_id: str):
+        try:
+            return await afetch_comment_tree(story_id)
+        except HNSearchError as e:
+            return e
+
+    trees = dict(zip(story_ids, await gather_bounded(_fetch, story_ids, max_concurrency)))
+
+    batches = {}
+    for group, stories in top.items():
+        batch = CommentBatch(story_titles={s.hn_id: s.title for s in stories})
+        per_story = {}
+        for s in stories:
+            tree = trees[s.hn_id]
+            if isinstance(tree, Exception):
+                batch.errors.append(str(tree))
+                continue
+            per_story[s.hn_id] = tree
+            batch.total_fetched += len(tree)
+        batch.comments = sample_comments(per_story, token_budget, model)
+        batches[group] = batch
+
+    return batches
+
+
+def fetch_comments_for_stories(
+        stories_by_group: dict[str, Iterable[HNArticle]],
+        top_k: int = HN_COMMENTS_TOP_K,
+        token_budget: int = HN_COMMENT_TOKEN_BUDGET,
+        max_concurrency: int = HN_COMMENT_CONCURRENCY,
+        model: Optional[str] = None
+    ) -> dict[str, CommentBatch]:
+    return run_sync(afetch_comments_for_stories(stories_by_group, top_k, token_budget, max_concurrency, model))
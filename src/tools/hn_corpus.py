@@ -0,0 +1,366 @@
+"""
+Offline HN story corpus: a local SQLite (FTS5) mirror that can stand in for Algolia.
+
+Ingest Algolia dumps / JSONL exports once, then set HN_BACKEND=local and every
+Algolia search (search_hn_by_date_range, search_hackernews, the paginated iterators)
+is answered from disk without touching the network.
+
+    python -m src.tools.hn_corpus ingest stories.jsonl more_stories.json.gz
+    python -m src.tools.hn_corpus stats
+    python -m src.tools.hn_corpus search "AI agents" --start 2024-01-01 --end 2024-03-31
+"""
+
+import argparse
+import gzip
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional
+
+from src.config import HN_CORPUS_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stories (
+    id           INTEGER PRIMARY KEY,
+    title        TEXT NOT NULL,
+    url          TEXT,
+    author       TEXT,
+    points       INTEGER NOT NULL DEFAULT 0,
+    num_comments INTEGER NOT NULL DEFAULT 0,
+    created_at   TEXT,
+    created_at_i INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stories_created_at_i ON stories (created_at_i);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS stories_fts USING fts5(
+    title, content='stories', content_rowid='id'
+);
+
+-- keep the full-text index in sync on append / re-ingest
+CREATE TRIGGER IF NOT EXISTS stories_ai AFTER INSERT ON stories BEGIN
+    INSERT INTO stories_fts(rowid, title) VALUES (new.id, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS stories_ad AFTER DELETE ON stories BEGIN
+    INSERT INTO stories_fts(stories_fts, rowid, title) VALUES ('delete', old.id, old.title);
+END;
+CREATE TRIGGER IF NOT EXISTS stories_au AFTER UPDATE ON stories BEGIN
+    INSERT INTO stories_fts(stories_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    INSERT INTO stories_fts(rowid, title) VALUES (new.id, new.title);
+END;
+"""
+
+_UPSERT = """
+INSERT INTO stories (id, title, url, author, points, num_comments, created_at, created_at_i)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    title = excluded.title,
+    url = excluded.url,
+    author = excluded.author,
+    points = excluded.points,
+    num_comments = excluded.num_comments,
+    created_at = excluded.created_at,
+    created_at_i = excluded.created_at_i
+"""
+
+# numericFilters fields we can answer locally
+_NUMERIC_FIELDS = {"created_at_i", "points", "num_comments"}
+_NUMERIC_FILTER = re.compile(r"^\s*(\w+)\s*(<=|>=|<|>|=)\s*(-?\d+)\s*$")
+
+_local = threading.local()
+
+
+def _connect(path: str = HN_CORPUS_PATH) -> sqlite3.Connection:
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+
+    conn = conns.get(path)
+    if conn is None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conns[path] = conn
+    return conn
+
+
+## Ingestion
+
+def _normalize_hit(hit: dict) -> Optional[tuple]:
+    '''
+    Accepts both Algolia hits (objectID, author, points, created_at_i)
+    and HN Firebase items (id, by, score, descendants, time). Returns None for non-stories.
+    '''
+
+    if hit.get("type", "story") != "story":
+        return None
+    tags = hit.get("_tags")
+    if tags is not None and "story" not in tags:
+        return None
+
+    story_id = hit.get("objectID", hit.get("id"))
+    title = hit.get("title")
+    created_at_i = hit.get("created_at_i", hit.get("time"))
+    if story_id is None or not title or created_at_i is None:
+        return None
+
+    created_at_i = int(created_at_i)
+    created_at = hit.get("created_at") or datetime.fromtimestamp(created_at_i, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    return (
+        int(story_id),
+        title,
+        hit.get("url"),
+        hit.get("author", hit.get("by")),
+        int(hit.get("points", hit.get("score")) or 0),
+        int(hit.get("num_comments", hit.get("descendants")) or 0),
+        created_at,
+        created_at_i,
+    )
+
+
+def _iter_file_hits(path: str) -> Iterator[dict]:
+    # JSONL (one hit per line), a JSON array of hits, or Algolia responses ({"hits": [...]}) - optionally gzipped
+
+    def _unwrap(item):
+        if isinstance(item, dict) and "hits" in item:
+            yield from item["hits"]
+        else:
+            yield item
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        first_line = f.readline()
+        f.seek(0)
+
+        is_jsonl = not first_line.lstrip().startswith("[")
+        if is_jsonl:
+            try:
+                json.loads(first_line)
+            except json.JSONDecodeError:
+                is_jsonl = False # a pretty-printed JSON document
+
+        if not is_jsonl:
+            data = json.load(f)
+            for item in data if isinstance(data, list) else [data]:
+                yield from _unwrap(item)
+            return
+
+        for line in f:
+            line = line.strip()
+            if line:
+                yield from _unwrap(json.loads(line))
+
+
+def ingest_hits(hits: Iterable[dict], path: str = HN_CORPUS_PATH, batch_size: int = 5000) -> int:
+    '''Upserts stories into the corpus (safe to re-run / append), returns no. of stories written.'''
+
+    conn = _connect(path)
+    written = 0
+    batch = []
+
+    def _flush():
+        with conn:
+            conn.executemany(_UPSERT, batch)
+
+    for hit in hits:
+        row = _normalize_hit(hit)
+        if row is None:
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _flush()
+            written += len(batch)
+            batch = []
+
+    if batch:
+        _flush()
+        written += len(batch)
+
+    return written
+
+
+def ingest_files(paths: list[str], path: str = HN_CORPUS_PATH) -> int:
+    total = 0
+    for file_path in paths:
+        started = time.time()
+        n = ingest_hits(_iter_file_hits(file_path), path=path)
+        total += n
+        print(f"Ingested {n} stories from {file_path} in {time.time() - started:.1f}s")
+    return total
+
+
+## Search
+
+def _fts_query(query: str) -> str:
+    # every word must match, last word as a prefix (roughly what Algolia does)
+    words = re.findall(r"\w+", query)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+
+def _numeric_clauses(numeric_filters) -> tuple[list[str], list[int]]:
+    if isinstance(numeric_filters, (list, tuple)):
+        numeric_filters = ",".join(numeric_filters)
+
+    clauses, args = [], []
+    for part in (numeric_filters or "").split(","):
+        if not part.strip():
+            continue
+        match = _NUMERIC_FILTER.match(part)
+        if not match or match.group(1) not in _NUMERIC_FIELDS:
+            raise ValueError(f"Unsupported numeric filter for local corpus: {part!r}")
+        field, op, value = match.groups()
+        clauses.append(f"s.{field} {op} ?")
+        args.append(int(value))
+    return clauses, args
+
+
+def _tag_clauses(tags) -> tuple[list[str], list[str]]:
+    # the corpus only holds stories, so it can serve "story" and "author_<name>" (ANDed);
+    # anything else (comment, front_page, ask_hn, OR groups...) would silently return the wrong hits
+    from src.tools.algolia import HNSearchError
+
+    if isinstance(tags, (list, tuple)):
+        if not all(isinstance(t, str) for t in tags): # nested list = OR group
+            raise HNSearchError(f"Error: tags {tags!r} are not available from the local HN corpus")
+        tags = ",".join(tags)
+
+    clauses, args = [], []
+    for tag in (tags or "").split(","):
+        tag = tag.strip()
+        if not tag or tag == "story":
+            continue
+        if tag.startswith("author_") and len(tag) > len("author_"):
+            clauses.append("s.author = ?")
+            args.append(tag[len("author_"):])
+            continue
+        raise HNSearchError(f"Error: tag {tag!r} is not available from the local HN corpus")
+    return clauses, args
+
+
+def search_corpus(params: dict, order: str = "date", path: str = HN_CORPUS_PATH) -> dict:
+    '''
+    Answers an Algolia search request (query, tags, numericFilters, hitsPerPage, page)
+    from the local corpus, returning an Algolia-shaped response.
+    order: "date" (search_by_date) or "relevance" (search)
+    Raises HNSearchError for tags the corpus can't serve (only story and author_<name>).
+    '''
+
+    tag_where, tag_args = _tag_clauses(params.get("tags"))
+    conn = _connect(path)
+    hits_per_page = int(params.get("hitsPerPage", 20))
+    page = int(params.get("page", 0))
+
+    where, args = _numeric_clauses(params.get("numericFilters"))
+    where, args = tag_where + where, tag_args + args
+    fts = _fts_query(params.get("query", ""))
+
+    if fts:
+        source = "stories_fts f JOIN stories s ON s.id = f.rowid"
+        where.insert(0, "stories_fts MATCH ?")
+        args.insert(0, fts)
+        order_by = "s.created_at_i DESC" if order == "date" else "f.rank, s.points DESC"
+    else:
+        source = "stories s"
+        order_by = "s.created_at_i DESC" if order == "date" else "s.points DESC"
+
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+    nb_hits = conn.execute(f"SELECT COUNT(*) FROM {source} {where_sql}", args).fetchone()[0]
+
+    hits = []
+    if hits_per_page > 0:
+        rows = conn.execute(
+            f"SELECT s.id, s.title, s.url, s.author, s.points, s.num_comments, s.created_at, s.created_at_i "
+            f"FROM {source} {where_sql} ORDER BY {order_by} LIMIT ? OFFSET ?",
+            args + [hits_per_page, page * hits_per_page],
+        ).fetchall()
+        hits = [
+            {
+                "objectID": str(r[0]),
+                "title": r[1],
+                "url": r[2],
+                "author": r[3],
+                "points": r[4],
+                "num_comments": r[5],
+                "created_at": r[6],
+                "created_at_i": r[7],
+            }
+            for r in rows
+        ]
+
+    return {
+        "hits": hits,
+        "nbHits": nb_hits,
+        "page": page,
+        "nbPages": math.ceil(nb_hits / hits_per_page) if hits_per_page > 0 else 0,
+        "hitsPerPage": hits_per_page,
+    }
+
+
+def corpus_stats(path: str = HN_CORPUS_PATH) -> dict:
+    count, first, last = _connect(path).execute(
+        "SELECT COUNT(*), MIN(created_at_i), MAX(created_at_i) FROM stories"
+    ).fetchone()
+
+    def _fmt(ts):
+        return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d") if ts else None
+
+    return {"path": path, "stories": count, "first": _fmt(first), "last": _fmt(last)}
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Local HN story corpus")
+    parser.add_argument("--db", default=HN_CORPUS_PATH, help="corpus SQLite file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="bulk-load JSONL / JSON / Algolia dump files (.gz ok)")
+    ingest.add_argument("files", nargs="+")
+
+    sub.add_parser("stats", help="show corpus size and date span")
+
+    search = sub.add_parser("search", help="query the corpus like search_by_date")
+    search.add_argument("query")
+    search.add_argument("--start", help="YYYY-MM-DD")
+    search.add_argument("--end", help="YYYY-MM-DD")
+    search.add_argument("--limit", type=int, default=10)
+
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        total = ingest_files(args.files, path=args.db)
+        print(f"Done, {total} stories written. {corpus_stats(args.db)}")
+
+    elif args.command == "stats":
+        print(corpus_stats(args.db))
+
+    elif args.command == "search":
+        from src.tools.algolia import utc_day_start
+
+        filters = []
+        if args.start:
+            filters.append(f"created_at_i>={utc_day_start(args.start)}")
+        if args.end:
+            filters.append(f"created_at_i<{utc_day_start(args.end) + 86400}") # end day included
+
+        started = time.perf_counter()
+        data = search_corpus(
+            {"query": args.query, "numericFilters": ",".join(filters), "hitsPerPage": args.limit},
+            path=args.db,
+        )
+        print(f"{data['nbHits']} hits in {(time.perf_counter() - started) * 1000:.1f} ms")
+        for i, hit in enumerate(data["hits"], start=1):
+            print(f"{i}. {hit['title']} ({hit['points']} points, {hit['created_at']})")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,155 @@
+"""
+Compact HN story records and lazy prompt rendering.
+
+Fetchers return a StoryBatch of slotted HNArticle records, prompt text is only
+built when render() (or str()) is called, with a selectable template and field set.
+"""
+
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, Sequence
+
+FIELD_LABELS = {
+    "points": "Points",
+    "num_comments": "Comments",
+    "author": "Author",
+    "created_at": "Date",
+    "url": "URL",
+}
+
+# per-template default field sets
+DEFAULT_FIELDS = {
+    "default": ("points", "num_comments", "created_at"),
+    "compact": ("points", "num_comments", "created_at"),
+    "detailed": ("points", "num_comments", "author", "created_at", "url"),
+}
+
+
+@dataclass(slots=True)
+class HNArticle:
+    hn_id: str
+    title: str
+    url: Optional[str]
+    author: str
+    points: int
+    num_comments: int
+    created_at: str
+    created_at_i: int = 0
+
+    @property
+    def hn_url(self) -> str:
+        return f"https://news.ycombinator.com/item?id={self.hn_id}"
+
+    def to_dict(self) -> dict:
+        return {
+            "hn_id": self.hn_id,
+            "title": self.title,
+            "url": self.url,
+            "author": self.author,
+            "points": self.points,
+            "num_comments": self.num_comments,
+            "created_at": self.created_at,
+            "hn_url": self.hn_url
+        }
+
+
+def hit_to_article(hit: dict) -> HNArticle:
+    return HNArticle(
+        hn_id=str(hit.get("objectID", "")),
+        title=hit.get("title") or "No Title",
+        url=hit.get("url"),
+        author=hit.get("author") or "Unknown Author",
+        points=hit.get("points") or 0,
+        num_comments=hit.get("num_comments") or 0,
+        created_at=hit.get("created_at") or "Unknown Date",
+        created_at_i=hit.get("created_at_i") or 0,
+    )
+
+
+@dataclass(slots=True)
+class StoryBatch:
+    '''The result of one HN search: records plus what's needed to render the header.'''
+
+    query: str
+    stories: list[HNArticle] = field(default_factory=list)
+    nb_hits: int = 0
+    limit: int = 0
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    error: Optional[str] = None  # set instead of stories when the fetch failed
+
+    @classmethod
+    def from_response(cls, query: str, data: dict, limit: int, start_date: Optional[str] = None, end_date: Optional[str] = None) -> "StoryBatch":
+        return cls(
+            query=query,
+            stories=[hit_to_article(hit) for hit in data.get("hits", [])],
+            nb_hits=data.get("nbHits", 0),
+            limit=limit,
+            start_date=start_date,
+            end_date=end_date,
+        )
+
+    def __len__(self) -> int:
+        return len(self.stories)
+
+    def __iter__(self) -> Iterator[HNArticle]:
+        return iter(self.stories)
+
+    def __str__(self) -> str:
+        return self.render()
+
+    def top(self, k: int) -> list[HNArticle]:
+        # highest scoring stories first
+        return sorted(self.stories, key=lambda s: s.points, reverse=True)[:k]
+
+    def preview(self, k: int = 3) -> str:
+        # one-line description for logs, without rendering the whole batch
+        if self.error:
+            return self.error
+        titles = "; ".join(s.title for s in self.stories[:k])
+        return f"{len(self.stories)} of {self.nb_hits} stories, e.g. {titles}"
+
+    def render(self, template: str = "default", fields: Optional[Sequence[str]] = None) -> str:
+        '''
+        template: "default" (title + one metadata line), "compact" (one line per story),
+                  "detailed" (title, metadata, date and URL lines)
+        fields: which of FIELD_LABELS to show, defaults per template
+        '''
+        if self.error:
+            return self.error
+
+        if template not in DEFAULT_FIELDS:
+            raise ValueError(f"Unknown template {template!r}, pick one of {sorted(DEFAULT_FIELDS)}")
+        fields = tuple(fields) if fields is not None else DEFAULT_FIELDS[template]
+
+        lines = []
+        if self.start_date and self.end_date:
+            lines.append(f"=== Hacker News Search Results for '{self.query}' from {self.start_date} to {self.end_date} ===")
+        else:
+            lines.append(f"=== Hacker News Search Results for '{self.query}' ===")
+        lines.append(f"Found {self.nb_hits} total results. Showing top {self.limit}:\n")
+
+        for i, story in enumerate(self.stories, start=1):
+            if template == "compact":
+                lines.append(f"{i}. {story.title} ({_meta(story, fields)})")
+            elif template == "detailed":
+                inline = [f for f in fields if f not in ("created_at", "url")]
+                lines.append(f"{i}. {story.title}")
+                lines.append(f"   {_meta(story, inline)}")
+                if "created_at" in fields:
+                    lines.append(f"   Date: {story.created_at}")
+                if "url" in fields:
+                    lines.append(f"   URL: {story.url or story.hn_url}")
+                lines.append("")  # Blank line for readability
+            else:
+                lines.append(f"{i}. {story.title}")
+                lines.append(f"   {_meta(story, fields)}")
+                lines.append("")  # Blank line for readability
+
+        if not self.stories and self.start_date:
+            lines.append("No stories found in the specified date range.")
+
+        return "\n".join(lines)
+
+
+def _meta(story: HNArticle, fields: Sequence[str]) -> str:
+    return " | ".join(f"{FIELD_LABELS[f]}: {getattr(story, f)}" for f in fields)
@@ -3,33 +3,25 @@ HackerNews Algolia API wrapper
 Docs: https://hn.algolia.com/api
 """
 
-import httpx
-from typing import Optional
-from dataclasses import dataclass
-
-HN_SEARCH_URL = "https://hn.algolia.com/api/v1/search"
-
-@dataclass
-class HNArticle:
-    hn_id: str
-    title: str
-    url: Optional[str]
-    author: str
-    points: int
-    num_comments: int
-    created_at: str
-    
-    def to_dict(self) -> dict:
-        return {
-            "hn_id": self.hn_id,
-            "title": self.title,
-            "url": self.url,
-            "author": self.author,
-            "points": self.points,
-            "num_comments": self.num_comments,
-            "created_at": self.created_at,
-            "hn_url": f"https://news.ycombinator.com/item?id={self.hn_id}"
-        }
+import time
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from src.tools.algolia import (
+    ALGOLIA_MAX_HITS,
+    HN_SEARCH_URL,
+    HN_SEARCH_BY_DATE_URL,
+    fetch_algolia_json,
+    afetch_algolia_json,
+)
+from src.tools.hn_records import HNArticle, hit_to_article
+
+# first HN story is from Oct 2006, used as the lower bound when no window is given
+HN_EPOCH_TS = 1160418111
+
+ENDPOINTS = {
+    "search": HN_SEARCH_URL,   # relevance order
+    "search_by_date": HN_SEARCH_BY_DATE_URL,   # newest first
+}
 
 
 def search_hackernews(
@@ -37,31 +29,161 @@ def search_hackernews(
     max_results: int = 5,
     tags: str = "story", # filter by story online, also hv comment, poll, show_hn, ask_hn on the website
 ) -> list[HNArticle]:
-   
+
     params = {
         "query": query,
         "tags": tags,
         "hitsPerPage": max_results,
     }
-    
-    response = httpx.get(HN_SEARCH_URL, params=params, timeout=30.0)
-    response.raise_for_status()
-    
-    data = response.json()
-    articles = []
-    
-    for hit in data.get("hits", []):
-        articles.append(HNArticle(
-            hn_id=str(hit.get("objectID", "")),
-            title=hit.get("title", ""),
-            url=hit.get("url"),  
-            author=hit.get("author", ""),
-            points=hit.get("points", 0),
-            num_comments=hit.get("num_comments", 0),
-            created_at=hit.get("created_at", ""),
-        ))
-    
-    return articles
+
+    data = fetch_algolia_json(HN_SEARCH_URL, params=params, max_retries=1)
+
+    return [hit_to_article(hit) for hit in data.get("hits", [])]
+
+
+## Paginated scanning
+# Algolia caps every query at ALGOLIA_MAX_HITS, however many pages we ask for.
+# When a window has more hits than that, it is split in half on created_at_i
+# (newer half first) until each piece fits, so any number of stories can be walked.
+
+def _window_params(query: str, tags: str, lo: int, hi: int, page_size: int, page: int) -> dict:
+    return {
+        "query": query,
+        "tags": tags,
+        "numericFilters": f"created_at_i>={lo},created_at_i<={hi}",
+        "hitsPerPage": page_size,
+        "page": page,
+    }
+
+
+def _should_split(data: dict, lo: int, hi: int) -> bool:
+    return data.get("nbHits", 0) > ALGOLIA_MAX_HITS and hi > lo
+
+
+class _WindowScan:
+    '''
+    The paging / splitting / stopping decisions of iter_hackernews, without the I/O:
+    next_params() says which page to fetch next (None = done), handle() takes its
+    response and yields the articles to pass on. Shared by the sync and async scans.
+
+    A window with too many hits is split in two, but the first page already fetched for it
+    is still used: those are the newest (or most relevant) hits of the whole window, so they
+    come first either way, and the halves skip them when they show up again.
+    '''
+
+    def __init__(self, query: str, start_ts: Optional[int], end_ts: Optional[int], tags: str, page_size: int,
+                 max_results: Optional[int], max_requests: Optional[int], stop_when: Optional[Callable[[HNArticle], bool]]):
+        self.query = query
+        self.tags = tags
+        self.page_size = max(1, min(page_size, ALGOLIA_MAX_HITS))
+        self.max_results = max_results
+        self.max_requests = max_requests
+        self.stop_when = stop_when
+
+        self.windows = [(start_ts or HN_EPOCH_TS, end_ts or int(time.time()))]
+        self.window: Optional[tuple[int, int]] = None
+        self.page, self.n_pages = 0, 0
+        self.yielded = 0
+        self.requests = 0
+        self.done = False
+        self.seen: set[str] = set() # ids yielded from the first page of a split window
+
+    def next_params(self) -> Optional[dict]:
+        if self.page >= self.n_pages: # current window finished (or split), on to the next
+            if not self.windows:
+                self.done = True
+            else:
+                self.window = self.windows.pop()
+                self.page, self.n_pages = 0, 1
+
+        if self.done or (self.max_requests is not None and self.requests >= self.max_requests):
+            return None
+
+        lo, hi = self.window
+        self.requests += 1
+        return _window_params(self.query, self.tags, lo, hi, self.page_size, self.page)
+
+    def handle(self, data: dict) -> Iterator[HNArticle]:
+        lo, hi = self.window
+        if self.page == 0 and _should_split(data, lo, hi):
+            mid = (lo + hi) // 2
+            self.windows.append((lo, mid))
+            self.windows.append((mid + 1, hi)) # popped next, keeps newest-first order
+            self.n_pages = 0
+            yield from self._emit(data.get("hits", []), remember=True)
+            return
+
+        self.n_pages = data.get("nbPages", 0)
+        self.page += 1
+        yield from self._emit(data.get("hits", []), remember=False)
+
+    def _emit(self, hits: list[dict], remember: bool) -> Iterator[HNArticle]:
+        for hit in hits:
+            hit_id = str(hit.get("objectID", ""))
+            if hit_id in self.seen:
+                continue
+            if remember:
+                self.seen.add(hit_id)
+            article = hit_to_article(hit)
+            if self.stop_when is not None and self.stop_when(article):
+                self.done = True
+                return
+            yield article
+            self.yielded += 1
+            if self.max_results is not None and self.yielded >= self.max_results:
+                self.done = True
+                return
+
+
+def iter_hackernews(
+    query: str,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    endpoint: str = "search_by_date",
+    tags: str = "story",
+    page_size: int = 100,
+    max_results: Optional[int] = None,
+    max_requests: Optional[int] = None,
+    stop_when: Optional[Callable[[HNArticle], bool]] = None,
+) -> Iterator[HNArticle]:
+    """
+    Lazily pages through every matching story, one page in memory at a time.
+
+    Args:
+        start_ts / end_ts: created_at_i window (unix seconds), defaults to all of HN
+        endpoint: "search_by_date" (newest first) or "search" (relevance within each window)
+        max_results: stop after yielding this many stories
+        max_requests: stop after this many API calls
+        stop_when: stop (without yielding) at the first story this returns True for
+    """
+
+    url = ENDPOINTS[endpoint]
+    scan = _WindowScan(query, start_ts, end_ts, tags, page_size, max_results, max_requests, stop_when)
+
+    while (params := scan.next_params()) is not None:
+        yield from scan.handle(fetch_algolia_json(url, params))
+
+
+async def aiter_hackernews(
+    query: str,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    endpoint: str = "search_by_date",
+    tags: str = "story",
+    page_size: int = 100,
+    max_results: Optional[int] = None,
+    max_requests: Optional[int] = None,
+    stop_when: Optional[Callable[[HNArticle], bool]] = None,
+) -> AsyncIterator[HNArticle]:
+    # async twin of iter_hackernews, same arguments
+
+    url = ENDPOINTS[endpoint]
+    scan = _WindowScan(query, start_ts, end_ts, tags, page_size, max_results, max_requests, stop_when)
+
+    while (params := scan.next_params()) is not None:
+        for article in scan.handle(await afetch_algolia_json(url, params)):
+            yield article
+
 
 if __name__ == "__main__":
     print("Searching HackerNews...")
@@ -69,4 +191,8 @@ if __name__ == "__main__":
     for a in articles:
         print(f"\n{a.title}")
         print(f"  Points: {a.points} | Comments: {a.num_comments}")
-        print(f"  URL: {a.url or 'N/A'}")
\ No newline at end of file
+        print(f"  URL: {a.url or 'N/A'}")
+
+    print("\nScanning the first 250 'LLM' stories of Q1 2024...")
+    scanned = sum(1 for _ in iter_hackernews("LLM", start_ts=1704067200, end_ts=1711929599, max_results=250))
+    print(f"  Scanned {scanned} stories")
@@ -2,11 +2,27 @@
 Downloads the PDFs, extracts texts in chunks usig COA 
 '''
 
-import httpx
+import atexit
+import math
 import tempfile
+import threading
 import os
+import multiprocessing
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
-from src.config import CHUNK_OVERLAP_TOKENS, CHUNK_SIZE_TOKENS
+from itertools import accumulate, islice
+from typing import Iterable, Iterator, Optional
+from src.cache.pdf import CachedPDF, get_pdf_cache, normalize_arxiv_id, stream_to_file
+from src.aio import prefetch
+from src.config import (
+    CHUNK_OVERLAP_TOKENS,
+    CHUNK_SIZE_TOKENS,
+    PAPER_PIPELINE_CHUNKS_AHEAD,
+    PDF_EXTRACT_WORKERS,
+    PDF_PARALLEL_MIN_PAGES,
+)
+from src.llm.tokens import count_word_tokens, get_tokenizer
+from src.http_client import get_client
 
 @dataclass
 class PDFChunk: # any chunk of text form the PDF
@@ -17,131 +33,401 @@ class PDFChunk: # any chunk of text form the PDF
     page_end: int
 
 def download_arxiv_pdf(arxiv_id: str) -> bytes: 
+    '''
+    The PDF's bytes. Goes through the PDF cache like download_arxiv_pdf_cached, prefer that one
+    (and iter_pdf_pages) for large papers, it never holds the whole file in memory.
+    '''
 
-    arxiv_id = arxiv_id.replace("arxiv:","").strip()
+    pdf = download_arxiv_pdf_cached(arxiv_id)
+    try:
+        with open(pdf.path, "rb") as f:
+            return f.read()
+    finally:
+        if not pdf.cached:
+            os.remove(pdf.path) # temp file, cache is off
+
+def download_arxiv_pdf_cached(arxiv_id: str) -> CachedPDF: 
+    '''
+    Streams the PDF to disk (PDF cache, or a temp file when the cache is off) and returns where it is.
+    A PDF already in the cache isn't downloaded again. The caller removes the file when done
+    if it's a temp file (pdf.cached is False).
+    '''
+
+    arxiv_id = normalize_arxiv_id(arxiv_id)
     pdf_url = f"https://arxiv.org/pdf/{arxiv_id}.pdf"
 
-    response = httpx.get(pdf_url, timeout=60.0, follow_redirects = True)
-    response.raise_for_status()
+    cache = get_pdf_cache()
+    if cache is not None:
+        cached = cache.get(arxiv_id)
+        if cached is not None:
+            print(f"Using cached PDF for arxiv:{arxiv_id} ({cached.size / 1024:.1f} KB)")
+            return cached
 
-    return response.content
+    print(f"Downloading PDF for arxiv:{arxiv_id}...")
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> list[tuple[int,str]]: 
+    # PDFs are large, so allow a longer read timeout than the shared default
+    if cache is not None:
+        pdf = cache.download(arxiv_id, get_client(), pdf_url, timeout=60.0)
+    else:
+        with get_client().stream("GET", pdf_url, timeout=60.0) as response:
+            response.raise_for_status()
+            path, sha256, size = stream_to_file(response, tempfile.gettempdir())
+        pdf = CachedPDF(arxiv_id, path, sha256, size, cached=False)
 
-    '''
-    extracts text from PDF Bytes, returning list of (page_number, text) tuples
-    uses pymupdf(fitz) for extraction. 
-    '''
+    print(f"Downloaded {pdf.size / 1024:.1f} KB")
+    return pdf
 
+def _import_fitz():
     try: 
         import fitz # PyMuPDF
     except ImportError:
         raise ImportError("Please install PyMuPDF to extract text from PDFs: pip install pymupdf")
-    
+    return fitz
+
+def _iter_page_range(doc, first: int, last: int) -> Iterator[tuple[int,str]]:
+    # non-empty pages first..last-1 (0-based) of an open document, as (page_number, text)
+    for i in range(first, last):
+        text = doc[i].get_text()
+        if text.strip(): # if not empty
+            yield (i + 1, text)
+
+def _extract_page_range(path: str, first: int, last: int) -> list[tuple[int,str]]:
+    # runs in a pool process, which opens the PDF at path itself
+    with _import_fitz().open(path) as doc:
+        return list(_iter_page_range(doc, first, last))
+
+
+## Parallel extraction
+# one process pool for the whole run, started on the first big PDF (spawn, so workers don't
+# inherit our threads, HTTP clients or open MuPDF documents)
+
+MIN_PAGES_PER_TASK = 16 # below this a task costs more in process overhead than it saves
+
+_pool_lock = threading.Lock()
+_pool = None
+
+def _get_pool(workers: int):
+    global _pool
+    from concurrent.futures import ProcessPoolExecutor
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_shutdown_pool)
+        return _pool
+
+def _shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def _page_ranges(n_pages: int, n_tasks: int) -> list[tuple[int,int]]:
+    # n_tasks contiguous [first, last) ranges covering every page, sizes differing by at most one
+    size, extra = divmod(n_pages, n_tasks)
+    ranges, first = [], 0
+    for t in range(n_tasks):
+        last = first + size + (1 if t < extra else 0)
+        ranges.append((first, last))
+        first = last
+    return ranges
+
+def _iter_parallel(path: str, n_pages: int, workers: int) -> Iterator[tuple[int,str]]:
+    # pages in order, each range as soon as it (and every range before it) is done
+    # if the pool breaks, the pages not yielded yet are read serially
+    ranges = _page_ranges(n_pages, min(workers, n_pages // MIN_PAGES_PER_TASK))
+    futures, next_page = [], 0
+    try:
+        pool = _get_pool(workers)
+        futures = [pool.submit(_extract_page_range, path, first, last) for first, last in ranges]
+        for (first, last), future in zip(ranges, futures):
+            pages = future.result()
+            next_page = last
+            yield from pages
+        return
+    except Exception as e: # broken pool (worker killed, can't spawn...), the serial path still works
+        print(f"Parallel extraction failed ({e}), extracting serially...")
+        _shutdown_pool()
+    finally:
+        for future in futures:
+            future.cancel() # the consumer stopped early (or the pool broke), don't extract the rest
+
+    with _import_fitz().open(path) as doc:
+        yield from _iter_page_range(doc, next_page, n_pages)
+
+def iter_text_from_pdf(
+        pdf: str | bytes,
+        workers: int = PDF_EXTRACT_WORKERS,
+        min_parallel_pages: int = PDF_PARALLEL_MIN_PAGES
+        ) -> Iterator[tuple[int,str]]:
+    '''
+    Yields the (page_number, text) tuples of extract_text_from_pdf in page order, as they're extracted.
+    A file with at least min_parallel_pages pages is split into page ranges across a process pool
+    of `workers` processes, each opening the file itself; bytes and smaller PDFs are read serially.
+    '''
 
+    fitz = _import_fitz()
+
+    # from a path, MuPDF reads pages from the file as it needs them instead of a copy in memory
+    with (fitz.open(pdf) if isinstance(pdf, str) else fitz.open(stream=pdf, filetype="pdf")) as doc: 
+        n_pages = doc.page_count
+        parallel = isinstance(pdf, str) and workers > 1 and n_pages >= max(min_parallel_pages, 2 * MIN_PAGES_PER_TASK)
+        if not parallel:
+            yield from _iter_page_range(doc, 0, n_pages)
+            return
+
+    yield from _iter_parallel(pdf, n_pages, workers) # each worker opens its own copy
+
+def extract_text_from_pdf(
+        pdf: str | bytes,
+        workers: int = PDF_EXTRACT_WORKERS,
+        min_parallel_pages: int = PDF_PARALLEL_MIN_PAGES
+        ) -> list[tuple[int,str]]: 
+
+    '''
+    extracts text from a PDF file path (or PDF bytes), returning list of (page_number, text) tuples
+    uses pymupdf(fitz) for extraction. 
+    Big files are extracted in parallel, see iter_text_from_pdf.
+    '''
+
+    return list(iter_text_from_pdf(pdf, workers, min_parallel_pages))
+
+def iter_pdf_pages(pdf: CachedPDF) -> Iterator[tuple[int,str]]:
+    # page text from the cache (keyed by the PDF's sha256), or extracted page by page and
+    # stored once the last page is through
+    cache = get_pdf_cache()
+    if cache is not None:
+        pages = cache.get_pages(pdf.sha256)
+        if pages is not None:
+            print(f"Using cached text ({len(pages)} pages)")
+            yield from pages
+            return
+
+    print("Extracting text...")
     pages = []
+    for page in iter_text_from_pdf(pdf.path):
+        pages.append(page)
+        yield page
+    print(f"Extracted {len(pages)} pages")
 
-    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc: 
-        for page_num, page in enumerate(doc, start=1): 
-            text = page.get_text()
-            if text.strip(): # if not empty
-                pages.append((page_num, text))
+    if cache is not None:
+        cache.put_pages(pdf.sha256, pages)
 
-    return pages
+def load_pdf_pages(pdf: CachedPDF) -> list[tuple[int,str]]:
+    return list(iter_pdf_pages(pdf))
 
 
 ## Potentially we can improve this by chunking based on sections, 
 ## but definitely won't be that proportionatea cross sections/papers ***
 
-def chunk_text(
+@dataclass(slots=True)
+class _WordIndex:
+    # every word of the document: chunk text is a slice of `text` and the page of a word is
+    # a bisect into `page_starts`, so chunking is linear in document length
+    text: str  # all words joined by single spaces
+    offsets: list[int]  # char offset of each word in text (+ one past the end)
+    token_offsets: list[float]  # tokens before each word (+ the total), prefix sums of per-word token counts
+    page_starts: list[int]  # index of the first word of each page (prefix sums of words per page)
+    page_numbers: list[int]
+    max_word_tokens: Optional[float] = None  # longer words (base64 blobs, URLs, tables without spaces) are cut into pieces
+
+    @classmethod
+    def build(cls, pages: list[tuple[int,str]], model: Optional[str] = None, max_word_tokens: Optional[float] = None) -> "_WordIndex":
+        index = cls("", [0], [0], [], [], max_word_tokens)
+        index.extend(pages, model)
+        return index
+
+    def extend(self, pages: list[tuple[int,str]], model: Optional[str] = None) -> None:
+        # appends pages (the whole document at once, or a few pages at a time while streaming)
+        page_words = [text.split() for _, text in pages] # pages never share a word, so splitting per page = splitting the whole
+        costs = iter(count_word_tokens([w for ws in page_words for w in ws], model))
+
+        words, word_tokens = [], []
+        for (page_num, _), ws in zip(pages, page_words):
+            self.page_starts.append(len(self) + len(words))
+            self.page_numbers.append(page_num)
+            for word in ws:
+                n_tokens = next(costs)
+                if self.max_word_tokens and n_tokens > self.max_word_tokens:
+                    for piece, piece_tokens in _split_word(word, n_tokens, self.max_word_tokens, model):
+                        words.append(piece)
+                        word_tokens.append(piece_tokens)
+                else:
+                    words.append(word)
+                    word_tokens.append(n_tokens)
+        if not words:
+            return
+
+        # continuing from the old end (skipping it, accumulate repeats its initial value)
+        self.offsets.extend(islice(accumulate((len(w) + 1 for w in words), initial=self.offsets[-1]), 1, None))
+        self.token_offsets.extend(islice(accumulate(word_tokens, initial=self.token_offsets[-1]), 1, None))
+        joined = " ".join(words)
+        self.text = f"{self.text} {joined}" if self.text else joined
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def span(self, start: int, end: int) -> str:
+        # words[start:end] joined by spaces
+        return self.text[self.offsets[start]:self.offsets[end] - 1]
+
+    def tokens(self, start: int, end: int) -> int:
+        # estimated from the per-word counts, within a token or two of encoding the span
+        return self.token_offsets[end] - self.token_offsets[start]
+
+    def page_of(self, word: int) -> int:
+        # empty pages share their start with the next page, bisect_right skips past them
+        return self.page_numbers[bisect_right(self.page_starts, word) - 1]
+
+
+def _max_word_tokens(chunk_size: int, overlap: int) -> float:
+    # a word must fit in a chunk next to the overlap carried over from the chunk before
+    return max(chunk_size - overlap, 1)
+
+
+def _split_word(word: str, n_tokens: float, max_tokens: float, model: Optional[str]) -> list[tuple[str,float]]:
+    # -> (piece, tokens) cutting word by characters into pieces of at most max_tokens each
+    n_pieces = math.ceil(n_tokens / max_tokens)
+    size = max(math.ceil(len(word) / n_pieces), 1)
+    pieces = [word[i:i + size] for i in range(0, len(word), size)]
+
+    out = []
+    for piece, piece_tokens in zip(pieces, count_word_tokens(pieces, model)):
+        if piece_tokens > max_tokens and len(piece) > 1: # the tokenizer merged differently, cut again
+            out.extend(_split_word(piece, piece_tokens, max_tokens, model))
+        else:
+            out.append((piece, piece_tokens))
+    return out
+
+
+def _iter_spans(
+        index: _WordIndex,
+        chunk_size: int,
+        overlap: int,
+        model: Optional[str],
+        more_pages: Iterator[tuple[int,str]] = iter(())
+        ) -> Iterator[tuple[int,int]]:
+    # -> (start, end) word spans holding at most chunk_size tokens each, neighbours share ~overlap tokens
+    # index can start out partial: pages are pulled from more_pages only until the next span is complete
+    start, prev_end = 0, 0
+    tokenizer = get_tokenizer(model)
+    exhausted = False
+
+    while True:
+        # the span starting at `start` is complete once the index holds more tokens than fit in it
+        while not exhausted and index.token_offsets[-1] - index.token_offsets[start] <= chunk_size:
+            page = next(more_pages, None)
+            if page is None:
+                exhausted = True
+            else:
+                index.extend([page], model)
+
+        n_words = len(index)
+        if start >= n_words:
+            return # no words (left)
+
+        # as many words as fit by the per-word counts (at least one)...
+        end = max(bisect_right(index.token_offsets, index.token_offsets[start] + chunk_size) - 1, start + 1)
+
+        # ...then the exact count of the span, shrunk in the (rare) case the words merge differently
+        n_tokens = tokenizer.count_batch([index.span(start, end)])[0]
+        while n_tokens > chunk_size and end - start > 1:
+            end = start + max(int((end - start) * chunk_size / n_tokens), 1)
+            n_tokens = tokenizer.count_batch([index.span(start, end)])[0]
+
+        if end <= prev_end:
+            # the overlap leaves no room for the next word, this would repeat the previous chunk:
+            # start a fresh one at that word instead
+            start = prev_end
+            continue
+
+        yield (start, end)
+        prev_end = end
+        if end >= n_words:
+            if exhausted:
+                return
+            # the last word loaded so far filled the chunk, pull more pages
+            start = end
+            continue
+
+        # the next chunk starts at the first word whose tail up to `end` fits in the overlap
+        next_start = bisect_left(index.token_offsets, index.token_offsets[end] - overlap)
+        start = max(next_start, start + 1)
+
+
+def iter_chunks(
         pages: list[tuple[int,str]],
         chunk_size: int = CHUNK_SIZE_TOKENS,
-        overlap: int = CHUNK_OVERLAP_TOKENS
-        ) -> list[PDFChunk]:
-    
-
-    # COmbine all pages into a single text, w boundaries
-    combined_text = ""
-    page_boundaries = [] # char position, page_number 
+        overlap: int = CHUNK_OVERLAP_TOKENS,
+        model: Optional[str] = None
+        ) -> Iterator[PDFChunk]:
+    '''
+    Yields the chunks of chunk_text one at a time (each chunk's text is only built when it's reached).
+    Chunks are packed to chunk_size tokens of model's tokenizer (default: the configured
+    LLM_PROVIDER model, see src/llm/tokens.py), neighbouring chunks share about `overlap` tokens.
+    page_start / page_end are the pages of the chunk's first and last word.
+    '''
 
-    for page_num, text in pages: 
-        page_boundaries.append((len(combined_text),page_num)) # adds the current char as -> boundary
-        combined_text += text + "\n\n" # separate pages
+    index = _WordIndex.build(pages, model, _max_word_tokens(chunk_size, overlap))
+    if not len(index):
+        return
 
-    # Chunk based on word count, so we split based on word
-    # potentially improve here *** 
+    spans = list(_iter_spans(index, chunk_size, overlap, model)) # just word indices, cheap to hold for a whole document
 
-     # Simple word-based tokenization (approximate)
-    words = combined_text.split()
-    
-    # Approximate tokens (words * 1.3 is a rough estimate)
-    words_per_chunk = int(chunk_size / 1.3)
-    words_overlap = int(overlap / 1.3)
-    
-    chunks = []
-    start_idx = 0
-    chunk_index = 0
-
-    while start_idx < len(words):
-
-        # chunking the words
-        end_idx = min(start_idx + words_per_chunk, len(words))
-        chunk_words = words[start_idx:end_idx]
-        chunk_text = " ".join(chunk_words)
-
-        # Find which pages the chunk starts/ends at
-        chunk_char_start = len(" ".join(words[:start_idx]))
-        chunk_char_end = chunk_char_start + len(chunk_text)
-
-        page_start = 1
-        page_end = 1
-        
-        # simple iteration thru the pages
-        # char_pos is no. of characters up till the start of that page
-        # e.g. page 1 is "0" for char_pos
-
-        for char_pos, page_num in page_boundaries: 
-            if char_pos <= chunk_char_start: 
-                page_start = page_num
-            if char_pos <= chunk_char_end: 
-                page_end = page_num
-            else: 
-                break
-        
-        chunks.append(PDFChunk(
+    for chunk_index, (start_idx, end_idx) in enumerate(spans):
+        yield PDFChunk(
             chunk_index=chunk_index,
-            total_chunks=-1, # placeholder, will be set after all chunks created
-            text=chunk_text,
-            page_start=page_start,  
-            page_end=page_end
-        ))
+            total_chunks=len(spans),
+            text=index.span(start_idx, end_idx),
+            page_start=index.page_of(start_idx),
+            page_end=index.page_of(end_idx - 1)
+        )
 
-        chunk_index +=1 
-        start_idx = end_idx - words_overlap  # move back by overlap
 
-        if end_idx >= (len(words)):
-            break
-
-    # Update total_chunks for each chunk
-    total_chunks = len(chunks)
+def chunk_text(
+        pages: list[tuple[int,str]],
+        chunk_size: int = CHUNK_SIZE_TOKENS,
+        overlap: int = CHUNK_OVERLAP_TOKENS,
+        model: Optional[str] = None
+        ) -> list[PDFChunk]:
+    # Chunk to a token budget, with `overlap` tokens repeated between neighbouring chunks
+    return list(iter_chunks(pages, chunk_size, overlap, model))
 
-    for chunk in chunks:
-        chunk.total_chunks = total_chunks
+def stream_chunks(
+        pages: Iterable[tuple[int,str]],
+        chunk_size: int = CHUNK_SIZE_TOKENS,
+        overlap: int = CHUNK_OVERLAP_TOKENS,
+        model: Optional[str] = None
+        ) -> Iterator[PDFChunk]:
+    '''
+    Same chunks as iter_chunks, but pages are read as they come: each chunk is yielded as soon
+    as the pages under it are in, before later pages are extracted.
+    total_chunks is -1, the count isn't known until the last page.
+    '''
 
-    return chunks
+    index = _WordIndex.build([], model, _max_word_tokens(chunk_size, overlap))
+    spans = _iter_spans(index, chunk_size, overlap, model, more_pages=iter(pages))
+    for chunk_index, (start_idx, end_idx) in enumerate(spans):
+        yield PDFChunk(
+            chunk_index=chunk_index,
+            total_chunks=-1,
+            text=index.span(start_idx, end_idx),
+            page_start=index.page_of(start_idx),
+            page_end=index.page_of(end_idx - 1)
+        )
 
 def process_arxiv_pdf(arxiv_id: str) -> list[PDFChunk]:
     '''
     Downloads the arxiv PDF, extracts text, chunks it, and returns list of PDFChunk
     '''
 
-    print(f"Downloading PDF for arxiv:{arxiv_id}...")
-    pdf_bytes = download_arxiv_pdf(arxiv_id)
-    print(f"Downloaded {len(pdf_bytes) / 1024:.1f} KB")
-    
-    print("Extracting text...")
-    pages = extract_text_from_pdf(pdf_bytes)
-    print(f"Extracted {len(pages)} pages")
+    pdf = download_arxiv_pdf_cached(arxiv_id)
+    try:
+        pages = load_pdf_pages(pdf)
+    finally:
+        if not pdf.cached:
+            os.remove(pdf.path) # temp file, cache is off
     
     print("Chunking...")
     chunks = chunk_text(pages)
@@ -149,6 +435,33 @@ def process_arxiv_pdf(arxiv_id: str) -> list[PDFChunk]:
     
     return chunks
 
+PAGES_AHEAD = 32 # extracted pages allowed to wait for the chunker
+
+def iter_arxiv_chunks(arxiv_id: str, chunks_ahead: int = PAPER_PIPELINE_CHUNKS_AHEAD) -> Iterator[PDFChunk]:
+    '''
+    process_arxiv_pdf as a pipeline: pages are extracted and chunked in background threads
+    (bounded queues between the stages) while the caller works on the chunks already yielded,
+    so the first chunk is ready after a few pages instead of the whole document.
+    The download itself finishes first, MuPDF needs the complete file (the page table is at the end).
+    Chunks have total_chunks = -1 (see stream_chunks).
+    '''
+
+    pdf = download_arxiv_pdf_cached(arxiv_id)
+    pages = prefetch(iter_pdf_pages(pdf), PAGES_AHEAD, name="pdf-pages")
+    chunks = prefetch(stream_chunks(pages), chunks_ahead, name="pdf-chunks")
+    try:
+        n_chunks = 0
+        for chunk in chunks:
+            n_chunks += 1
+            yield chunk
+        print(f"Created {n_chunks} chunks")
+    finally:
+        # stop and join both stages (a no-op once they're done), nothing reads the file after this
+        chunks.close()
+        pages.close()
+        if not pdf.cached:
+            os.remove(pdf.path) # temp file, cache is off
+
 # Sanity test
 
 # Quick test
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# tests import the repo's modules as `src.*`
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
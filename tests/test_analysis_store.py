@@ -0,0 +1,92 @@
+import pytest
+
+from src import chain_of_agents
+from src.analysis_store import AnalysisStore, _key
+from src.cache.store import SQLiteCache
+from src.tools.hn_comments import CommentBatch
+from src.tools.hn_records import StoryBatch
+
+QUERY = "AI agents"
+JAN = {"start": "2024-01-01", "end": "2024-01-31", "label": "January 2024"}
+FEB = {"start": "2024-02-01", "end": "2024-02-29", "label": "February 2024"}
+MAR = {"start": "2024-03-01", "end": "2024-03-31", "label": "March 2024"}
+
+
+@pytest.fixture
+def store(tmp_path) -> AnalysisStore:
+    return AnalysisStore(SQLiteCache(str(tmp_path / "analyses.db"), namespace="analyses"))
+
+
+def _save_chain(store: AnalysisStore, periods: list[dict]) -> None:
+    prev = None
+    for period in periods:
+        store.save_period(QUERY, period, f"analysis {period['label']}", f"summary up to {period['label']}", prev)
+        prev = period
+
+
+def test_chain_is_walked_back_from_the_head(store):
+    _save_chain(store, [JAN, FEB])
+
+    chain = store.load_chain("  ai AGENTS ") # same topic, differently typed
+    assert [entry["period"]["label"] for entry in chain] == ["January 2024", "February 2024"]
+    assert chain[-1]["running_summary"] == "summary up to February 2024"
+    assert store.load_chain("LLMs") == []
+
+
+def test_extending_moves_the_head(store):
+    _save_chain(store, [JAN, FEB])
+    store.save_period(QUERY, MAR, "analysis March 2024", "summary up to March 2024", FEB)
+
+    assert [entry["period"] for entry in store.load_chain(QUERY)] == [JAN, FEB, MAR]
+
+
+def test_new_span_starts_a_new_chain(store):
+    _save_chain(store, [JAN, FEB])
+    store.save_period(QUERY, MAR, "analysis March 2024", "summary up to March 2024", None)
+
+    assert [entry["period"] for entry in store.load_chain(QUERY)] == [MAR]
+
+
+def test_cleared_step_and_forget(store):
+    _save_chain(store, [JAN, FEB, MAR])
+    store.store.delete(_key(QUERY, "2024-01-01:2024-01-31"))
+    assert [entry["period"] for entry in store.load_chain(QUERY)] == [FEB, MAR]
+
+    store.forget(QUERY)
+    assert store.load_chain(QUERY) == []
+
+
+def test_extend_run_only_analyses_new_periods(store, monkeypatch):
+    _save_chain(store, [JAN, FEB])
+    analysed = []
+
+    def fake_analyse(query, period, stories, comments, running_summary):
+        analysed.append((period["label"], running_summary))
+        return "results", f"analysis {period['label']}", f"summary up to {period['label']}", {}
+
+    monkeypatch.setattr(chain_of_agents, "get_analysis_store", lambda: store)
+    monkeypatch.setattr(chain_of_agents, "_analyse_period", fake_analyse)
+    monkeypatch.setattr(chain_of_agents, "_get_period_results", lambda state, period: (StoryBatch(query=QUERY), CommentBatch()))
+
+    state = chain_of_agents.restore_node({"query": QUERY, "time_periods": [JAN, FEB, MAR], "token_usage": []})
+    assert state["current_period_index"] == 2
+    assert state["running_summary"] == "summary up to February 2024"
+
+    while state["current_period_index"] < len(state["time_periods"]):
+        state = chain_of_agents.worker_node(state)
+
+    assert analysed == [("March 2024", "summary up to February 2024")] # Jan and Feb were reused, not re-analysed
+    assert state["period_summaries"] == ["January 2024: analysis January 2024", "February 2024: analysis February 2024",
+                                         "March 2024: analysis March 2024"]
+    assert [entry["period"] for entry in store.load_chain(QUERY)] == [JAN, FEB, MAR]
+
+
+def test_extend_without_periods_plans_only_after_the_stored_chain(store, monkeypatch):
+    _save_chain(store, [JAN, FEB])
+    planned = []
+    monkeypatch.setattr(chain_of_agents, "get_analysis_store", lambda: store)
+    monkeypatch.setattr(chain_of_agents, "plan_periods", lambda query, start, end, max_workers: planned.append((start, end)) or [MAR])
+
+    state = chain_of_agents.restore_node({"query": QUERY, "end_date": "2024-03-31"})
+    assert planned == [("2024-03-01", "2024-03-31")]
+    assert state["time_periods"] == [JAN, FEB, MAR]
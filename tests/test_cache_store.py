@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+
+from src.cache import store
+from src.cache.store import SQLiteCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(store, "time", clock)
+    return clock
+
+
+def _cache(tmp_path, max_bytes=None, namespace="test") -> SQLiteCache:
+    return SQLiteCache(str(tmp_path / "cache.db"), namespace=namespace, max_bytes=max_bytes)
+
+
+def _sum_sizes(cache: SQLiteCache) -> int:
+    return cache._conn().execute("SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?", (cache.namespace,)).fetchone()[0]
+
+
+def test_ttl_expiry(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.set("short", b"x", ttl=10)
+    cache.set("forever", b"y")
+
+    clock.now += 5
+    assert cache.get("short") == b"x"
+    clock.now += 10
+    assert cache.get("short") is None
+    assert cache.get("forever") == b"y"
+    assert cache.stats()["bytes"] == 1
+
+
+def test_lru_eviction_order(tmp_path, clock):
+    cache = _cache(tmp_path, max_bytes=30)
+    for key in ("a", "b", "c"):
+        clock.now += 1
+        cache.set(key, b"0123456789")
+
+    clock.now += 1
+    assert cache.get("a") is not None # a is now the most recently used, b the least
+
+    clock.now += 1
+    cache.set("d", b"0123456789")
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in ("a", "c", "d"))
+    assert cache.evictions == 1
+
+
+def test_expired_entries_are_evicted_before_lru(tmp_path, clock):
+    cache = _cache(tmp_path, max_bytes=30)
+    cache.set("old", b"0123456789")
+    clock.now += 1
+    cache.set("expiring", b"0123456789", ttl=5)
+    clock.now += 1
+    cache.set("new", b"0123456789")
+
+    clock.now += 10
+    cache.set("newest", b"0123456789")
+    assert cache.get("expiring") is None
+    assert cache.get("old") == b"0123456789"
+    assert cache.evictions == 0
+
+
+def test_running_total_matches_entries(tmp_path, clock):
+    cache = _cache(tmp_path)
+    other = _cache(tmp_path, namespace="other")
+    cache.set("a", b"12345")
+    cache.set("a", b"123") # replaced, not added
+    cache.set("b", b"1234567")
+    other.set("a", b"123456789")
+    cache.delete("b")
+    assert cache.stats()["bytes"] == _sum_sizes(cache) == 3
+    assert other.stats()["bytes"] == 9
+
+    cache.clear()
+    assert cache.stats()["bytes"] == 0
+    assert other.stats()["bytes"] == 9
+
+
+def test_existing_database_is_counted_once(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entries (namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                 "created_at REAL NOT NULL, expires_at REAL, accessed_at REAL NOT NULL, PRIMARY KEY (namespace, key))")
+    conn.execute("INSERT INTO entries VALUES ('test', 'a', x'00', 40, 0, NULL, 0)")
+    conn.commit()
+    conn.close()
+
+    cache = SQLiteCache(path, namespace="test")
+    assert cache.stats()["bytes"] == 40
+    assert SQLiteCache(path, namespace="test").stats()["bytes"] == 40 # reopening doesn't count again
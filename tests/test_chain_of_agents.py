@@ -0,0 +1,67 @@
+from src import chain_of_agents
+from src.tools.hn_comments import CommentBatch
+from src.tools.hn_records import StoryBatch
+
+PERIOD = {"start": "2024-01-01", "end": "2024-01-31", "label": "January 2024"}
+
+
+def _state(batch: StoryBatch) -> dict:
+    key = chain_of_agents.period_key(PERIOD)
+    return {"query": "AI agents", "prefetched_results": {key: batch}, "prefetched_comments": {}}
+
+
+def test_prefetched_period_is_used(monkeypatch):
+    monkeypatch.setattr(chain_of_agents, "_fetch_period", lambda query, period: (_ for _ in ()).throw(AssertionError("fetched")))
+    batch = StoryBatch(query="AI agents")
+    stories, comments = chain_of_agents._get_period_results(_state(batch), PERIOD)
+    assert stories is batch
+    assert isinstance(comments, CommentBatch)
+
+
+def test_failed_prefetch_is_fetched_again(monkeypatch):
+    fresh = (StoryBatch(query="AI agents"), CommentBatch())
+    calls = []
+    monkeypatch.setattr(chain_of_agents, "_fetch_period", lambda query, period: calls.append(period) or fresh)
+
+    result = chain_of_agents._get_period_results(_state(StoryBatch(query="AI agents", error="Error: timed out")), PERIOD)
+    assert result == fresh
+    assert calls == [PERIOD]
+
+
+class ScriptedGraph:
+    # replays the (stream mode, chunk) pairs LangGraph would emit, for both stream and astream
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+    def stream(self, state, config, stream_mode):
+        return iter(self.pairs)
+
+    async def astream(self, state, config, stream_mode):
+        for pair in self.pairs:
+            yield pair
+
+
+def test_sync_and_async_streams_emit_the_same_events(monkeypatch):
+    import asyncio
+
+    from langchain_core.messages import AIMessageChunk
+
+    pairs = [
+        ("updates", {"manager": {"time_periods": [PERIOD]}}),
+        ("messages", (AIMessageChunk(content="worker token"), {"langgraph_node": "worker"})),
+        ("messages", (AIMessageChunk(content="Agents "), {"langgraph_node": "synthesizer", "tags": []})),
+        ("messages", (AIMessageChunk(content="summary"), {"langgraph_node": "synthesizer", "tags": ["compress"]})),
+        ("messages", (AIMessageChunk(content="grew."), {"langgraph_node": "synthesizer", "tags": []})),
+        ("updates", {"synthesizer": {"final_answer": "Agents grew."}}),
+    ]
+    monkeypatch.setattr(chain_of_agents, "get_compiled_graph", lambda mode: ScriptedGraph(pairs))
+
+    sync_events = list(chain_of_agents.stream_hn_trends("AI agents"))
+
+    async def collect():
+        return [event async for event in chain_of_agents.astream_hn_trends("AI agents")]
+
+    assert asyncio.run(collect()) == sync_events
+    assert [e["content"] for e in sync_events if e["type"] == "token"] == ["Agents ", "grew."]
+    assert [e["node"] for e in sync_events if e["type"] == "progress"] == ["manager", "synthesizer"]
+    assert sync_events[-1] == {"type": "final", "answer": "Agents grew."}
@@ -0,0 +1,83 @@
+import random
+
+from src.llm.tokens import get_tokenizer
+from src.tools.pdf_processor import chunk_text, stream_chunks
+
+MODEL = "llama3.1:8b"
+
+
+def _blob(rng: random.Random, n_chars: int = 9000) -> str:
+    return "".join(rng.choice("0123456789abcdef") for _ in range(n_chars))
+
+
+def _random_pages(rng: random.Random, n_pages: int, oversized_at: tuple[int, ...] = ()) -> list[tuple[int, str]]:
+    vocab = ["model", "agent", "token", "attention", "layer", "the", "of", "a", "transformer", "x=1"]
+    pages = []
+    for page_num in range(1, n_pages + 1):
+        words = [rng.choice(vocab) for _ in range(rng.randint(0, 400))]
+        if page_num in oversized_at:
+            words.append(_blob(rng)) # one "word" over the whole chunk budget, e.g. a base64 blob, at the end of the page
+        pages.append((page_num, " ".join(words)))
+    return pages
+
+
+def _key(chunks) -> list[tuple]:
+    return [(c.chunk_index, c.text, c.page_start, c.page_end) for c in chunks]
+
+
+def test_stream_chunks_matches_chunk_text():
+    rng = random.Random(7)
+    for _ in range(20):
+        pages = _random_pages(rng, rng.randint(1, 12))
+        chunk_size = rng.choice([50, 120, 400])
+        overlap = rng.choice([0, 10, chunk_size // 4])
+        assert _key(stream_chunks(iter(pages), chunk_size, overlap, MODEL)) == _key(chunk_text(pages, chunk_size, overlap, MODEL))
+
+
+def test_stream_chunks_reads_past_an_oversized_word():
+    pages = [(1, "intro " * 300 + "q" * 9000), (2, "methods " * 300), (3, "results " * 300)]
+    batch = chunk_text(pages, 2000, 200, MODEL)
+    streamed = list(stream_chunks(iter(pages), 2000, 200, MODEL))
+
+    assert _key(streamed) == _key(batch)
+    assert streamed[-1].page_end == 3
+    assert all(c.total_chunks == -1 for c in streamed)
+
+
+def test_stream_chunks_random_pages_with_oversized_words():
+    rng = random.Random(11)
+    for _ in range(10):
+        n_pages = rng.randint(2, 8)
+        pages = _random_pages(rng, n_pages, oversized_at=tuple(rng.sample(range(1, n_pages + 1), 2)))
+        streamed = list(stream_chunks(iter(pages), 500, 50, MODEL))
+        assert _key(streamed) == _key(chunk_text(pages, 500, 50, MODEL))
+        last_page = max(p for p, text in pages if text.strip())
+        assert streamed[-1].page_end == last_page
+
+
+def test_empty_document():
+    assert chunk_text([(1, "   ")]) == []
+    assert list(stream_chunks(iter([(1, "   ")]))) == []
+
+
+def test_oversized_word_is_split_without_duplicate_chunks():
+    blob = _blob(random.Random(5))
+    pages = [(1, "intro " * 300 + blob), (2, "methods " * 300), (3, "results " * 300)]
+    chunks = chunk_text(pages, 2000, 200, MODEL)
+    tokenizer = get_tokenizer(MODEL)
+
+    assert all(tokenizer.count_batch([c.text])[0] <= 2000 for c in chunks)
+    assert len({c.text for c in chunks}) == len(chunks)
+    assert len(chunks) <= 5 # ~4900 tokens in all, 2000-token chunks with 200 overlap
+    assert blob in "".join(c.text.replace(" ", "") for c in chunks) # every piece of the word is kept, in order
+
+
+def test_chunks_stay_within_budget_and_advance():
+    rng = random.Random(3)
+    tokenizer = get_tokenizer(MODEL)
+    for _ in range(10):
+        n_pages = rng.randint(2, 8)
+        pages = _random_pages(rng, n_pages, oversized_at=(n_pages,))
+        chunks = chunk_text(pages, 300, 100, MODEL)
+        assert all(tokenizer.count_batch([c.text])[0] <= 300 for c in chunks)
+        assert len({c.text for c in chunks}) == len(chunks)
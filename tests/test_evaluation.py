@@ -3,8 +3,9 @@ import os
 
 # go back one folder > then to src 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from chain_of_agents import analyse_hn_trends
+from src.batch import run_batch
 from datetime import datetime
 import json
 
@@ -62,7 +63,10 @@ def run_evaluation_suite():
     
     results = []
 
-    for i, test_case in enumerate(test_cases, 1):
+    # all test cases are analysed concurrently, then evaluated in order
+    answers = run_batch([{"query": test_case["query"]} for test_case in test_cases])
+
+    for i, (test_case, outcome) in enumerate(zip(test_cases, answers), 1):
         query = test_case["query"]
 
         print(f"\n{'='*70}")
@@ -70,7 +74,9 @@ def run_evaluation_suite():
         print(f"{'='*70}")
 
         try: 
-            answer = analyse_hn_trends(query)
+            if "error" in outcome:
+                raise RuntimeError(outcome["error"])
+            answer = outcome["final_answer"]
             metrics = evaluate_answer_quality(query, answer)    
 
             print("\n Evaluation results:")
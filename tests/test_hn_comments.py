@@ -0,0 +1,50 @@
+from src.llm.tokens import count_tokens
+from src.tools.hn_comments import HNComment, sample_comments
+
+
+def _comment(comment_id: str, story_id: str, text: str, n_replies: int = 0) -> HNComment:
+    return HNComment(comment_id=comment_id, story_id=story_id, author="a", text=text, depth=1, n_replies=n_replies)
+
+
+def test_long_comment_does_not_stop_sampling():
+    long_top = _comment("1", "s1", "word " * 2000, n_replies=50) # ranked first, over the whole budget
+    short = [_comment(str(i), "s1", f"short comment {i}") for i in range(2, 5)]
+    other_story = [_comment("9", "s2", "another short comment")]
+
+    sampled = sample_comments({"s1": [long_top, *short], "s2": other_story}, token_budget=100)
+
+    ids = {c.comment_id for c in sampled}
+    assert "1" not in ids
+    assert ids == {"2", "3", "4", "9"}
+    assert sum(count_tokens(c.text) for c in sampled) <= 100
+
+
+def test_budget_is_respected():
+    comments = [_comment(str(i), "s1", "some words here " * 5) for i in range(50)]
+    sampled = sample_comments({"s1": comments}, token_budget=60)
+    assert 0 < len(sampled) < 50
+    assert sum(count_tokens(c.text) for c in sampled) <= 60
+
+
+def test_budget_is_counted_with_the_callers_model(monkeypatch):
+    from src.tools import hn_comments
+
+    models = []
+    monkeypatch.setattr(hn_comments, "count_tokens", lambda text, model=None: models.append(model) or 1)
+
+    sample_comments({"s1": [_comment("1", "s1", "a comment")]}, token_budget=10, model="gemini-2.5-flash")
+    assert models == ["gemini-2.5-flash"]
+
+
+def test_chain_samples_comments_for_its_model(monkeypatch):
+    from src import chain_of_agents
+    from src.config import ChainConfig
+    from src.tools.hn_records import StoryBatch
+
+    models = []
+    monkeypatch.setattr(chain_of_agents, "HN_COMMENTS_TOP_K", 3)
+    monkeypatch.setattr(chain_of_agents, "fetch_hn_by_date_range", lambda **kwargs: StoryBatch(query="q"))
+    monkeypatch.setattr(chain_of_agents, "prefetch_period_comments", lambda batches, model=None: models.append(model) or {"period": None})
+
+    chain_of_agents._fetch_period("q", {"start": "2024-01-01", "end": "2024-01-31", "label": "January 2024"})
+    assert models == [ChainConfig.MODEL_NAME]
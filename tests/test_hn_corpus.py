@@ -0,0 +1,27 @@
+import pytest
+
+from src.tools.algolia import HNSearchError
+from src.tools.hn_corpus import ingest_hits, search_corpus
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = str(tmp_path / "corpus.db")
+    ingest_hits([
+        {"objectID": "1", "title": "AI agents in production", "author": "pg", "points": 10, "created_at_i": 1700000000},
+        {"objectID": "2", "title": "Building AI agents", "author": "dang", "points": 5, "created_at_i": 1700000100},
+    ], path=path)
+    return path
+
+
+def test_story_and_author_tags(corpus):
+    assert search_corpus({"query": "agents", "tags": "story"}, path=corpus)["nbHits"] == 2
+
+    data = search_corpus({"query": "agents", "tags": "story,author_pg"}, path=corpus)
+    assert [hit["objectID"] for hit in data["hits"]] == ["1"]
+
+
+@pytest.mark.parametrize("tags", ["comment", "front_page", "story,ask_hn", ["story", ["author_pg", "author_dang"]]])
+def test_unsupported_tags_raise(corpus, tags):
+    with pytest.raises(HNSearchError):
+        search_corpus({"query": "agents", "tags": tags}, path=corpus)
@@ -0,0 +1,77 @@
+import asyncio
+import math
+import re
+
+import pytest
+
+from src.tools import hn_search
+
+MAX_HITS = 10 # stands in for ALGOLIA_MAX_HITS, so a few dozen stories are enough to force splits
+START, END = 1_700_000_000, 1_700_100_000
+
+
+class FakeAlgolia:
+    # search_by_date over `stories`: newest first, at most MAX_HITS reachable per query like the real API
+    def __init__(self, n_stories: int):
+        step = (END - START) // n_stories
+        self.stories = [{"objectID": str(i), "title": f"story {i}", "created_at_i": START + i * step} for i in range(n_stories)]
+        self.calls = []
+
+    def fetch(self, url: str, params: dict) -> dict:
+        self.calls.append(params)
+        lo, hi = map(int, re.findall(r"\d+", params["numericFilters"].replace("created_at_i", "")))
+        hits = sorted((s for s in self.stories if lo <= s["created_at_i"] <= hi), key=lambda s: -s["created_at_i"])
+        per_page, page = params["hitsPerPage"], params["page"]
+        reachable = hits[:MAX_HITS]
+        return {
+            "hits": reachable[page * per_page:(page + 1) * per_page],
+            "nbHits": len(hits),
+            "nbPages": math.ceil(len(reachable) / per_page),
+        }
+
+    async def afetch(self, url: str, params: dict) -> dict:
+        return self.fetch(url, params)
+
+
+@pytest.fixture
+def algolia(monkeypatch):
+    fake = FakeAlgolia(47)
+    monkeypatch.setattr(hn_search, "ALGOLIA_MAX_HITS", MAX_HITS)
+    monkeypatch.setattr(hn_search, "fetch_algolia_json", fake.fetch)
+    monkeypatch.setattr(hn_search, "afetch_algolia_json", fake.afetch)
+    return fake
+
+
+def _ids(articles) -> list[str]:
+    return [a.hn_id for a in articles]
+
+
+def _aids(**kwargs) -> list[str]:
+    async def collect():
+        return [a.hn_id async for a in hn_search.aiter_hackernews("q", START, END, page_size=4, **kwargs)]
+    return asyncio.run(collect())
+
+
+def test_splits_yield_every_story_once_newest_first(algolia):
+    ids = _ids(hn_search.iter_hackernews("q", START, END, page_size=4))
+    assert ids == [str(i) for i in reversed(range(47))]
+    assert any(params["page"] == 0 for params in algolia.calls[1:]) # it did split
+
+
+def test_sync_and_async_agree(algolia):
+    for kwargs in ({}, {"max_results": 13}, {"max_requests": 5}, {"stop_when": lambda a: a.hn_id == "20"}):
+        assert _ids(hn_search.iter_hackernews("q", START, END, page_size=4, **kwargs)) == _aids(**kwargs)
+
+
+def test_request_budget_keeps_the_split_window_first_page(algolia):
+    ids = _ids(hn_search.iter_hackernews("q", START, END, page_size=4, max_requests=2))
+    assert len(algolia.calls) == 2
+    assert ids[:4] == ["46", "45", "44", "43"] # the busy window's first page, not thrown away by the split
+    assert len(ids) == len(set(ids))
+
+
+def test_max_results_and_stop_when(algolia):
+    assert len(_ids(hn_search.iter_hackernews("q", START, END, page_size=4, max_results=13))) == 13
+
+    ids = _ids(hn_search.iter_hackernews("q", START, END, page_size=4, stop_when=lambda a: a.hn_id == "20"))
+    assert ids == [str(i) for i in range(46, 20, -1)]
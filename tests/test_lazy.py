@@ -0,0 +1,22 @@
+import sys
+import types
+
+import pytest
+
+from src._lazy import lazy_exports
+
+
+def test_exports_load_on_first_access(monkeypatch):
+    package = types.ModuleType("fake_pkg")
+    monkeypatch.setitem(sys.modules, "fake_pkg", package)
+    package.__all__, package.__getattr__, package.__dir__ = lazy_exports("fake_pkg", {"dumps": "json"})
+
+    assert package.__all__ == ["dumps"]
+    assert "dumps" in dir(package) and "dumps" not in vars(package)
+
+    import json
+    assert package.dumps is json.dumps
+    assert vars(package)["dumps"] is json.dumps # cached, __getattr__ isn't called again
+
+    with pytest.raises(AttributeError, match="has no attribute 'loads'"):
+        package.loads
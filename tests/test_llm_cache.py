@@ -0,0 +1,40 @@
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.load import dumps
+from langchain_core.messages import ChatMessage, HumanMessage, SystemMessage
+
+from src.cache.llm import LLMResponseCache, llm_cache_key
+from src.cache.store import SQLiteCache
+
+LLM_STRING = '{"id": ["x", "ChatModel"], "kwargs": {"model": "m", "temperature": 0.1}, "lc": 1, "type": "constructor"}---[(\'stop\', None)]'
+
+
+def _key(messages, llm_string: str = LLM_STRING) -> str:
+    return llm_cache_key(dumps(messages), llm_string)
+
+
+def test_equivalent_prompts_share_a_key():
+    base = _key([SystemMessage(content="Be brief."), HumanMessage(content="Trends in AI agents\nfor 2024")])
+    assert _key([SystemMessage(content="  Be brief.\n"), HumanMessage(content="Trends in AI   agents\n    for 2024", id="run-1")]) == base
+    assert _key([ChatMessage(role="system", content="Be brief."), ChatMessage(role="user", content="Trends in AI agents for 2024")]) == base
+
+
+def test_params_are_order_and_none_insensitive():
+    reordered = '{"type": "constructor", "lc": 1, "kwargs": {"temperature": 0.1, "model": "m"}, "id": ["x", "ChatModel"]}---[]'
+    assert _key([HumanMessage(content="hi")], reordered) == _key([HumanMessage(content="hi")])
+
+
+def test_different_prompts_or_settings_miss():
+    base = _key([HumanMessage(content="hi")])
+    assert _key([HumanMessage(content="hello")]) != base
+    assert _key([SystemMessage(content="hi")]) != base
+    assert _key([HumanMessage(content="hi")], LLM_STRING.replace("0.1", "0.7")) != base
+    assert _key([HumanMessage(content="hi")], LLM_STRING.replace("None", "['END']")) != base
+
+
+def test_reformatted_prompt_is_served_from_cache(tmp_path):
+    cache = LLMResponseCache(SQLiteCache(str(tmp_path / "llm.db"), namespace="llm:test"))
+    llm = FakeListChatModel(responses=["first", "second"], cache=cache)
+
+    assert llm.invoke("Summarise AI agents\n  in 2024").content == "first"
+    assert llm.invoke("Summarise AI agents in 2024 ").content == "first"
+    assert llm.invoke("Summarise LLMs in 2024").content == "second"
@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+from src.cache.pdf import CachedPDF
+from src.tools import pdf_processor
+
+
+@pytest.mark.parametrize("cached", [True, False])
+def test_download_arxiv_pdf_still_returns_bytes(tmp_path, monkeypatch, cached):
+    path = tmp_path / "1706.03762.pdf"
+    path.write_bytes(b"%PDF-1.4 fake")
+    monkeypatch.setattr(pdf_processor, "download_arxiv_pdf_cached",
+                        lambda arxiv_id: CachedPDF(arxiv_id, str(path), "sha", 13, cached=cached))
+
+    assert pdf_processor.download_arxiv_pdf("arxiv:1706.03762") == b"%PDF-1.4 fake"
+    assert os.path.exists(path) == cached # a temp file (cache off) is removed, a cached one kept
@@ -0,0 +1,45 @@
+from datetime import date, datetime, timezone
+
+from src.planner import _split_evenly
+from src.tools.algolia import date_range_filter
+
+
+def _bounds(numeric_filters: str) -> tuple[int, int]:
+    # "created_at_i>=A,created_at_i<B" -> (A, B)
+    lower, upper = numeric_filters.split(",")
+    assert lower.startswith("created_at_i>=") and upper.startswith("created_at_i<")
+    assert not upper.startswith("created_at_i<=")
+    return int(lower[len("created_at_i>="):]), int(upper[len("created_at_i<"):])
+
+
+def _ts(*args) -> int:
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp())
+
+
+def test_single_day_covers_the_whole_day():
+    lower, upper = _bounds(date_range_filter("2024-01-05", "2024-01-05"))
+    assert lower == _ts(2024, 1, 5)
+    assert upper == _ts(2024, 1, 6)
+    assert lower <= _ts(2024, 1, 5, 23, 59, 59) < upper
+
+
+def test_split_windows_tile_the_span_without_gaps_or_overlaps():
+    start, end = date(2024, 1, 1), date(2024, 12, 30)
+    windows = _split_evenly(start, end, 24)
+
+    assert len(windows) == 24
+    assert windows[0][0] == start and windows[-1][1] == end
+
+    bounds = [_bounds(date_range_filter(w_start.isoformat(), w_end.isoformat())) for w_start, w_end in windows]
+    assert bounds[0][0] == _ts(2024, 1, 1)
+    assert bounds[-1][1] == _ts(2024, 12, 31) # the last day is included
+    for (_, upper), (next_lower, _) in zip(bounds, bounds[1:]):
+        assert upper == next_lower # each window ends exactly where the next one starts
+
+
+def test_more_windows_than_days_gives_one_day_windows():
+    windows = _split_evenly(date(2024, 3, 1), date(2024, 3, 3), 10)
+    assert windows == [(date(2024, 3, d), date(2024, 3, d)) for d in (1, 2, 3)]
+    for w_start, w_end in windows:
+        lower, upper = _bounds(date_range_filter(w_start.isoformat(), w_end.isoformat()))
+        assert upper - lower == 86400
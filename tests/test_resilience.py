@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import pytest
+
+from src.llm import resilience
+from src.llm.provider import llm_limit
+from src.llm.resilience import LLMDeadlineExceeded, LLMTimeoutError, call_llm, run_deadline
+
+
+class FakeLLM:
+    # answers after `delays[i]` seconds (or raises `errors[i]`) on its i-th call, remembers cancelled calls
+    def __init__(self, delays=(), errors=()):
+        self.delays = list(delays)
+        self.errors = list(errors)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def ainvoke(self):
+        n = self.calls
+        self.calls += 1
+        if n < len(self.errors) and self.errors[n] is not None:
+            raise self.errors[n]
+        try:
+            await asyncio.sleep(self.delays[n] if n < len(self.delays) else 0)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"answer {n}"
+
+
+def _free_slots() -> int:
+    n = 0
+    while llm_limit.acquire(timeout=0):
+        n += 1
+    for _ in range(n):
+        llm_limit.release()
+    return n
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 0)
+
+
+def test_timeout_cancels_the_call_and_frees_its_slot():
+    llm = FakeLLM(delays=[5])
+    started = time.monotonic()
+    with pytest.raises(LLMTimeoutError):
+        call_llm(llm.ainvoke, timeout=0.1, max_retries=0, hedge=False)
+    assert time.monotonic() - started < 2
+    assert llm.cancelled == 1
+    assert _free_slots() == llm_limit.max_concurrency
+
+
+def test_transient_errors_are_retried():
+    llm = FakeLLM(errors=[ConnectionError("reset"), TimeoutError()])
+    assert call_llm(llm.ainvoke, max_retries=2, hedge=False) == "answer 2"
+    assert llm.calls == 3
+
+
+def test_other_errors_are_not_retried():
+    llm = FakeLLM(errors=[ValueError("bad prompt")])
+    with pytest.raises(ValueError):
+        call_llm(llm.ainvoke, max_retries=2, hedge=False)
+    assert llm.calls == 1
+
+
+def test_passed_deadline_skips_the_call():
+    llm = FakeLLM()
+    with pytest.raises(LLMDeadlineExceeded):
+        call_llm(llm.ainvoke, deadline=time.monotonic() - 1, hedge=False)
+    assert llm.calls == 0
+
+
+def test_deadline_cuts_the_attempt_and_stops_retries():
+    llm = FakeLLM(delays=[5, 5, 5])
+    started = time.monotonic()
+    with pytest.raises((LLMDeadlineExceeded, LLMTimeoutError)):
+        call_llm(llm.ainvoke, timeout=10, deadline=run_deadline(0.2), max_retries=2, hedge=False)
+    assert time.monotonic() - started < 2
+    assert _free_slots() == llm_limit.max_concurrency
+
+
+def test_hedge_wins_and_the_loser_is_cancelled(monkeypatch):
+    monkeypatch.setattr(resilience, "hedge_delay", lambda label: 0.05)
+    llm = FakeLLM(delays=[5, 0])
+
+    started = time.monotonic()
+    assert call_llm(llm.ainvoke, label="hedge-test", hedge=True) == "answer 1"
+    assert time.monotonic() - started < 2
+    assert llm.calls == 2
+    assert llm.cancelled == 1 # the slow first request, not left running until its HTTP timeout
+    assert _free_slots() == llm_limit.max_concurrency
+
+
+def test_no_hedge_when_the_first_request_is_fast(monkeypatch):
+    monkeypatch.setattr(resilience, "hedge_delay", lambda label: 0.5)
+    llm = FakeLLM(delays=[0])
+    assert call_llm(llm.ainvoke, label="hedge-test", hedge=True) == "answer 0"
+    assert llm.calls == 1
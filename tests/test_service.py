@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+import pytest
+
+from src.batch import read_jobs
+from src.service import AnalysisService, _route
+
+
+def _post(body) -> tuple[int, dict]:
+    service = AnalysisService(workers=1, queue_size=4)
+    return asyncio.run(_route(service, "POST", "/jobs", json.dumps(body).encode()))
+
+
+@pytest.mark.parametrize("body", [
+    {"query": 5},
+    {"query": "   "},
+    {"query": ["AI"]},
+    {"query": "AI agents", "start_date": 20240101},
+    {"query": "AI agents", "end_date": "last week"},
+    {"query": "AI agents", "mode": "fast"},
+    {"query": "AI agents", "time_periods": "2024"},
+    {"query": "AI agents", "time_periods": [{"start": "2024-01-01", "end": "2024-01-31"}]},
+    ["AI agents"],
+])
+def test_bad_jobs_are_rejected(body):
+    status, payload = _post(body)
+    assert status == 400
+    assert "error" in payload
+
+
+def test_valid_job_is_queued():
+    status, payload = _post({
+        "query": "AI agents", "start_date": "2024-01-01", "end_date": "2024-02-29", "mode": "parallel",
+        "time_periods": [{"start": "2024-01-01", "end": "2024-01-31", "label": "January 2024"}],
+    })
+    assert status == 202
+    assert payload["status"] == "queued"
+
+
+def test_batch_input_is_validated_too():
+    assert read_jobs(["AI agents", '{"query": "LLMs", "mode": "tree"}'])[1]["mode"] == "tree"
+    with pytest.raises(ValueError, match="Line 2"):
+        read_jobs(["AI agents", '{"query": 5}'])
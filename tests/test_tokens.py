@@ -0,0 +1,38 @@
+import sys
+import types
+
+import pytest
+
+from src.llm import provider, tokens
+
+
+class FakeTokenizer:
+    def __init__(self, path: str):
+        self.path = path
+
+    @classmethod
+    def from_file(cls, path: str) -> "FakeTokenizer":
+        return cls(path)
+
+
+@pytest.fixture
+def custom_tokenizer(monkeypatch):
+    # TOKENIZER_PATH configured for a mixed-case model name, `tokenizers` stubbed (it may not be installed)
+    monkeypatch.setitem(sys.modules, "tokenizers", types.SimpleNamespace(Tokenizer=FakeTokenizer))
+    monkeypatch.setattr(tokens, "TOKENIZER_PATH", "/models/custom/tokenizer.json")
+    monkeypatch.setattr(tokens, "TOKENIZER_BACKEND", "auto")
+    monkeypatch.setattr(provider, "resolve_model", lambda provider=None, model=None: ("ollama", "My-Custom-Llama"))
+    tokens._tokenizer_for.cache_clear()
+    yield
+    tokens._tokenizer_for.cache_clear()
+
+
+@pytest.mark.parametrize("model", ["My-Custom-Llama", "my-custom-llama", None])
+def test_tokenizer_path_is_used_for_a_mixed_case_model(custom_tokenizer, model):
+    tokenizer = tokens.get_tokenizer(model)
+    assert isinstance(tokenizer, tokens.HFTokenizer)
+    assert tokenizer.tokenizer.path == "/models/custom/tokenizer.json"
+
+
+def test_tokenizer_path_is_not_used_for_other_models(custom_tokenizer):
+    assert tokens._load_hf("gemini-2.5-flash") is None